@@ -1,9 +1,10 @@
-from setuptools import setup
+from setuptools import find_packages, setup
 
 setup(
     name="swd2",
     version="1.0.0",
-    packages=["swd2"],
+    packages=find_packages(include=["swd2", "swd2.*"]),
+    package_data={"swd2.translator": ["charmaps/*.json"]},
     install_requires=[
         'Click',
         'pyfiglet',
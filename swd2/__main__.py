@@ -1,5 +1,4 @@
 import sys
 from swd2 import swd2_cli
-from swd2.translator import  translator_cli
 
 sys.exit(swd2_cli.cli())
\ No newline at end of file
@@ -0,0 +1,109 @@
+import json
+from pathlib import Path
+
+import click
+from swd2.swd2_cli import cli, stored_config, Swd2Config
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.bench import benchmark, corpus
+
+
+@cli.group()
+@stored_config
+def bench(config):
+    '''
+    Benchmark group
+    '''
+    LogTemplates.title('Benchmark utility')
+
+
+@bench.command()
+@click.option('--dst',
+              type=click.types.Path(),
+              help="Target dir",
+              default="corpus"
+              )
+@click.option('--size-mb',
+              type=click.FloatRange(min=0, min_open=True),
+              help="Total size of generated csv files in MB",
+              default=8
+              )
+@click.option('--density',
+              type=click.FloatRange(0, 1),
+              help="Fraction of polish characters in translated column",
+              default=0.1
+              )
+@click.option('--files',
+              type=click.IntRange(min=1),
+              help="Number of generated files",
+              default=8
+              )
+@click.option('--seed',
+              type=int,
+              help="Random seed",
+              default=0
+              )
+@stored_config
+def generate(config: Swd2Config, dst: str, size_mb: float, density: float, files: int, seed: int):
+    '''
+    Generates synthetic *.csv and *.csv.z corpus
+    '''
+    data = corpus.generate(config.working_dir / dst, size_mb, density, files, seed)
+    ExtLogger.info(f'Generated {LogTemplates.variable(len(data.csv_files))} files, '
+                   f'csv: {LogTemplates.variable(data.csv_bytes)} bytes, csv.z: {LogTemplates.variable(data.z_bytes)} bytes '
+                   f'in {LogTemplates.variable(data.directory)}')
+
+
+@bench.command()
+@click.option('--size-mb',
+              type=click.FloatRange(min=0, min_open=True),
+              help="Total size of generated csv files in MB",
+              default=8
+              )
+@click.option('--density',
+              type=click.FloatRange(0, 1),
+              help="Fraction of polish characters in translated column",
+              default=0.1
+              )
+@click.option('--files',
+              type=click.IntRange(min=1),
+              help="Number of generated files",
+              default=8
+              )
+@click.option('--repeat',
+              type=click.IntRange(min=1),
+              help="Number of repeats, the best one is reported",
+              default=3
+              )
+@click.option('--output',
+              type=click.types.Path(),
+              help="Write results as json"
+              )
+@click.option('--baseline',
+              type=click.types.Path(exists=True, dir_okay=False),
+              help="Compare results with saved json, fails on regression"
+              )
+@click.option('--tolerance',
+              type=click.FloatRange(min=0),
+              help="Allowed slowdown against baseline (fraction)",
+              default=0.1
+              )
+@stored_config
+@click.pass_context
+def run(ctx, config: Swd2Config, size_mb: float, density: float, files: int, repeat: int, output: str, baseline: str, tolerance: float):
+    '''
+    Measures throughput of translator pipeline stages
+    '''
+    result = benchmark.run(size_mb, density, files, repeat)
+    click.echo(json.dumps(result, indent=1, sort_keys=True))
+
+    if output:
+        benchmark.save(result, Path(output))
+        ExtLogger.info(f'Results saved: {LogTemplates.variable(output)}')
+
+    if baseline:
+        regressions = benchmark.compare(result, benchmark.load(Path(baseline)), tolerance)
+        for regression in regressions:
+            ExtLogger.error(f'Regression: {regression}')
+        if regressions:
+            ctx.exit(1)
+        ExtLogger.info(f'No regressions against baseline {LogTemplates.variable(baseline)}')
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from swd2.bench import corpus
+from swd2.core.extlogging import ExtLogger, ExtLogFormatter, LogConfig, LogTemplates
+from swd2.core.profiling import percentile
+from swd2.translator import charmap, compressor
+
+RESULT_VERSION = 1
+LOG_MESSAGES = 2000
+STARTUP_RUNS = 5
+STARTUP_COMMAND = [sys.executable, '-m', 'swd2', '--no-banner', 'working-dir']
+
+
+def peak_rss_kb() -> int:
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Stage:
+    '''
+    Collects per-file latencies of one pipeline stage, the best of all repeats is reported.
+    '''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.runs = []
+
+    def measure(self, items: list, action: callable, size: callable) -> None:
+        latencies = []
+        processed = 0
+        for item in items:
+            start = time.perf_counter()
+            action(item)
+            latencies.append(time.perf_counter() - start)
+            processed += size(item)
+        self.runs.append((sum(latencies), latencies, processed))
+
+    def result(self) -> dict:
+        seconds, latencies, processed = min(self.runs, key=lambda run: run[0])
+        return {
+            'seconds': round(seconds, 6),
+            'mb_per_s': round(processed / (1024 * 1024) / seconds, 3) if seconds and processed else None,
+            'ops_per_s': round(len(latencies) / seconds, 1) if seconds else None,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        }
+
+
+def _startup():
+    subprocess.run(STARTUP_COMMAND, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+
+def _null_console() -> logging.Handler:
+    out = logging.StreamHandler(open(os.devnull, 'w'))
+    out.setLevel(LogConfig.getLevel())
+    out.setFormatter(ExtLogFormatter(LogConfig.format))
+    return out
+
+
+def run(size_mb: float = 8, density: float = 0.1, files: int = 8, repeat: int = 3, directory: Path = None) -> dict:
+    '''
+    Generates a synthetic corpus and times every stage of the translator pipeline on its own,
+    including startup of the swd2 command. Log output produced by the measured code is formatted as usual but discarded.
+    '''
+    with tempfile.TemporaryDirectory(prefix='swd2-bench-') as temp_dir:
+        work_dir = directory or Path(temp_dir)
+        data = corpus.generate(work_dir / 'corpus', size_mb, density, files)
+        out_dir = work_dir / 'out'
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        table = charmap.load().table
+        texts = [file.read_text(encoding='utf-8') for file in data.csv_files]
+        stages = {name: Stage(name) for name in ['translate', 'compress', 'decompress', 'logging', 'startup']}
+
+        null_console = _null_console()
+        console = LogConfig.use(null_console)
+        try:
+            for _ in range(repeat):
+                stages['translate'].measure(texts, lambda text: text.translate(table), lambda text: len(text.encode('utf-8')))
+                stages['compress'].measure(data.csv_files,
+                                           lambda file: compressor.compress(file, out_dir / f'{file.name}.z', True),
+                                           lambda file: file.stat().st_size)
+                stages['decompress'].measure(data.z_files,
+                                             lambda file: compressor.decompress(file, out_dir / file.stem, True),
+                                             lambda file: file.stat().st_size)
+                stages['logging'].measure(range(LOG_MESSAGES),
+                                          lambda index: ExtLogger.info(f'Message {LogTemplates.variable(index)}'),
+                                          lambda index: 0)
+                stages['startup'].measure(range(STARTUP_RUNS), lambda index: _startup(), lambda index: 0)
+        finally:
+            LogConfig.use(console)
+            null_console.close()
+            null_console.stream.close()
+
+        return {
+            'version': RESULT_VERSION,
+            'corpus': {'size_mb': size_mb, 'density': density, 'files': files, 'csv_bytes': data.csv_bytes, 'z_bytes': data.z_bytes},
+            'stages': {name: stage.result() for name, stage in stages.items()},
+            'peak_rss_kb': peak_rss_kb(),
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+        }
+
+
+def compare(result: dict, baseline: dict, tolerance: float = 0.1) -> list[str]:
+    '''
+    Returns descriptions of stages slower than baseline by more than tolerance (fraction).
+    '''
+    regressions = []
+    for name, stage in baseline.get('stages', {}).items():
+        current = result['stages'].get(name)
+        if current is None:
+            continue
+        metric = 'mb_per_s' if stage.get('mb_per_s') else 'ops_per_s'
+        if not stage.get(metric) or not current.get(metric):
+            continue
+        change = current[metric] / stage[metric] - 1
+        if change < -tolerance:
+            regressions.append(f'{name}: {metric} {current[metric]} vs baseline {stage[metric]} ({change:+.1%})')
+    return regressions
+
+
+def load(file: Path) -> dict:
+    with open(file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save(result: dict, file: Path):
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=1, sort_keys=True)
@@ -0,0 +1,70 @@
+import random
+from pathlib import Path
+
+from swd2.translator.codec import CsvZWriter
+
+POLISH_LETTERS = 'ąćęłńóśźżĄĆĘŁŃÓŚŹŻ'
+LATIN_LETTERS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPRSTUWYZ'
+HEADER = 'ID,English,Polish'
+
+
+class Corpus:
+    def __init__(self, directory: Path, csv_files: list[Path], z_files: list[Path]):
+        self.directory = directory
+        self.csv_files = csv_files
+        self.z_files = z_files
+
+    @property
+    def csv_bytes(self) -> int:
+        return sum(file.stat().st_size for file in self.csv_files)
+
+    @property
+    def z_bytes(self) -> int:
+        return sum(file.stat().st_size for file in self.z_files)
+
+
+def _word(rnd: random.Random, density: float) -> str:
+    return ''.join(rnd.choice(POLISH_LETTERS) if rnd.random() < density else rnd.choice(LATIN_LETTERS)
+                   for _ in range(rnd.randint(2, 10)))
+
+
+def _sentence(rnd: random.Random, density: float) -> str:
+    return ' '.join(_word(rnd, density) for _ in range(rnd.randint(3, 15)))
+
+
+def rows(size: int, density: float, seed: int = 0):
+    '''
+    Yields csv lines of a synthetic language file until size (in bytes, utf-8) is reached.
+    density is the fraction of letters replaced by polish characters.
+    '''
+    rnd = random.Random(seed)
+    produced = 0
+    index = 0
+    line = HEADER
+    while produced < size:
+        encoded = f'{line}\r\n'.encode('utf-8')
+        produced += len(encoded)
+        yield encoded
+        line = f'KEY_{index:06d},"{_sentence(rnd, 0.0)}","{_sentence(rnd, density)}"'
+        index += 1
+
+
+def generate(directory: Path, size_mb: float, density: float, files: int = 1, seed: int = 0) -> Corpus:
+    '''
+    Generates files * (*.csv, *.csv.z) pairs of together about size_mb megabytes of csv.
+    *.csv.z files contain the same text, already translated with the charmap, as the game expects.
+    '''
+    directory.mkdir(parents=True, exist_ok=True)
+    file_size = int(size_mb * 1024 * 1024 / files)
+    csv_files = []
+    z_files = []
+    for index in range(files):
+        csv_file = directory / f'lang{index:03d}.csv'
+        z_file = directory / f'lang{index:03d}.csv.z'
+        with open(csv_file, 'wb') as csv_out, open(z_file, 'wb', buffering=0) as z_out, CsvZWriter(z_out) as writer:
+            for line in rows(file_size, density, seed + index):
+                csv_out.write(line)
+                writer.write(line)
+        csv_files.append(csv_file)
+        z_files.append(z_file)
+    return Corpus(directory, csv_files, z_files)
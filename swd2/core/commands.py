@@ -1,5 +1,7 @@
-import subprocess
+import collections
 import os
+import shlex
+import subprocess
 
 from swd2.core.exttypes import ExtEnum, ExtObject
 from swd2.core.extlogging import LogLevel, ExtLogger, LogTemplates
@@ -11,6 +13,9 @@ COL_GREEN = '\033[92m'
 COL_RED = '\x1b[38;5;196m'
 COL_YELLOW = '\x1b[33m'
 COL_RESET = '\033[0m'
+# last lines of output kept in CmdResult of streamed commands
+OUTPUT_TAIL_LINES = 200
+STREAM_LIMIT = 1024 * 1024
 
 
 class CmdStatus(ExtEnum):
@@ -42,18 +47,14 @@ class CmdStatus(ExtEnum):
 
 
 class CmdResult(ExtObject):
-    cmd: str = None
-    path: str = None
-    output: str = None
-    status: CmdStatus = None
-    result_code: int = None
+    __slots__ = ('cmd', 'path', 'output', 'status', 'result_code')
 
     def __init__(self, cmd: str, path: str, output: str, result_code: int, status: CmdStatus):
         self.cmd = cmd
         self.path = path
         self.output = output
         self.status = status
-        self.result_code = result_code;
+        self.result_code = result_code
 
     @property
     def is_ok(self):
@@ -78,23 +79,33 @@ class CmdResult(ExtObject):
 class CmdResults(ExtObject):
     def __init__(self,
                  cmd: str,
-                 results: list[CmdResult] = []
+                 results: list[CmdResult] = None
                  ):
         self.cmd = cmd
-        self.results = results
+        self.results = results if results is not None else []
 
     @property
     def isOk(self) -> bool:
-        return all(result for result in self.results if result.is_ok is True)
+        return all(result.is_ok for result in self.results)
 
     @property
     def status(self) -> CmdStatus:
-        return CmdStatus.SUCCESS if self.is_ok else CmdStatus.ERROR
+        return CmdStatus.SUCCESS if self.isOk else CmdStatus.ERROR
+
+
+def _split(cmd) -> tuple:
+    return tuple(shlex.split(cmd)) if isinstance(cmd, str) else tuple(str(arg) for arg in cmd)
+
+
+def _display(cmd) -> str:
+    return cmd if isinstance(cmd, str) else shlex.join(str(arg) for arg in cmd)
 
 
 def execute(cmd, path: str = os.path.curdir) -> CmdResult:
     LogTemplates.subtitle(f'Run command {LogTemplates.variable(cmd)} in dir: {LogTemplates.variable(path)}', logLevel=LogLevel.DEBUG)
-    resolved_cmd = tuple(cmd.split(' '))
+    # strings are split on spaces only (no quoting), as callers of execute expect
+    resolved_cmd = tuple(cmd.split(' ')) if isinstance(cmd, str) else _split(cmd)
+    cmd = _display(cmd)
 
     result = None
     try:
@@ -111,6 +122,79 @@ def execute(cmd, path: str = os.path.curdir) -> CmdResult:
     return result
 
 
+def execute_many(cmds: list, path: str = os.path.curdir, jobs: int = 4, timeout: float = None,
+                 log_level: LogLevel = LogLevel.INFO, name: str = None) -> CmdResults:
+    '''
+    Runs commands (strings or argument lists) concurrently, at most jobs at once, each killed after timeout seconds.
+    Output is logged line by line as it comes, results keep only the last OUTPUT_TAIL_LINES lines.
+    '''
+    # imported here, asyncio is slow to import and most commands never run subprocesses
+    import asyncio
+
+    return asyncio.run(_execute_many(cmds, path, jobs, timeout, log_level, name))
+
+
+async def _execute_many(cmds: list, path: str, jobs: int, timeout: float, log_level: LogLevel, name: str) -> CmdResults:
+    import asyncio
+
+    semaphore = asyncio.Semaphore(jobs)
+    results = await asyncio.gather(*(_execute_async(cmd, path, semaphore, timeout, log_level) for cmd in cmds))
+    return CmdResults(name if name is not None else ', '.join(_display(cmd) for cmd in cmds), list(results))
+
+
+async def _execute_async(cmd, path: str, semaphore: 'asyncio.Semaphore', timeout: float, log_level: LogLevel) -> CmdResult:
+    import asyncio
+
+    async with semaphore:
+        LogTemplates.subtitle(f'Run command {LogTemplates.variable(_display(cmd))} in dir: {LogTemplates.variable(path)}', logLevel=LogLevel.DEBUG)
+        args = _split(cmd)
+        tail = collections.deque(maxlen=OUTPUT_TAIL_LINES)
+        try:
+            process = await asyncio.create_subprocess_exec(*args, cwd=path, limit=STREAM_LIMIT,
+                                                           stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        except OSError as err:
+            return CmdResult(cmd=_display(cmd), path=path, result_code=1, status=CmdStatus.ERROR, output=str(err))
+
+        prefix = f'{LOG_INDENT}[{COL_BLUE}{os.path.basename(args[0])}:{process.pid}{COL_RESET}] '
+        try:
+            await asyncio.wait_for(asyncio.gather(_stream(process.stdout, prefix, tail, log_level),
+                                                  _stream(process.stderr, prefix, tail, log_level),
+                                                  process.wait()), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            tail.append(f'Timed out after {timeout}s')
+            return CmdResult(cmd=_display(cmd), path=path, result_code=process.returncode, status=CmdStatus.ERROR, output='\n'.join(tail))
+        return CmdResult(cmd=_display(cmd), path=path, result_code=process.returncode, status=CmdStatus.of(process.returncode), output='\n'.join(tail))
+
+
+async def _stream(stream: 'asyncio.StreamReader', prefix: str, tail: collections.deque, log_level: LogLevel):
+    import asyncio
+
+    def log(line: bytes):
+        text = line.decode('utf-8', errors='replace').rstrip('\r\n')
+        tail.append(text)
+        ExtLogger.log(prefix + text, log_level=log_level)
+
+    continued = False
+    while True:
+        try:
+            line = await stream.readuntil(b'\n')
+        except asyncio.IncompleteReadError as err:
+            # last line without line break, empty at the end of output
+            line = err.partial
+        except asyncio.LimitOverrunError as err:
+            # line longer than STREAM_LIMIT is logged in pieces, the rest of it stays in the stream
+            log(await stream.read(err.consumed))
+            continued = True
+            continue
+        if not line:
+            break
+        if not (continued and line in (b'\n', b'\r\n')):
+            log(line)
+        continued = False
+
+
 def log_summary(cmd: str, cmd_results):
     status = _get_status(cmd_results)
     LogTemplates.subtitle(f'Summary of executing {LogTemplates.variable(cmd)} : {format_status(status)}')
@@ -1,10 +1,14 @@
-import copy
-import inspect
+import atexit
 import logging
+import logging.handlers
+import queue
+import re
+import sys
 
+from collections import OrderedDict
 from pathlib import Path
 
-from swd2.core.exttypes import ExtEnum
+from swd2.core.exttypes import ExtEnum, Objects
 from swd2.core.extcolors import Color
 
 
@@ -32,11 +36,11 @@ class LogLevel(ExtEnum):
 
     @classmethod
     def ofValue(cls, value):
-        for key, el in cls.elements().items():
-            if el.value == value:
-                return el
-        return None
-        # raise NoSuchElementException(f'Element [{value}] not exists for [{cls}]. Possible values are [{str(cls.elements().values())}]')
+        return _LEVELS_BY_VALUE.get(value)
+
+
+# first defined element wins (WARN before WARNING)
+_LEVELS_BY_VALUE = {el.value: el for el in reversed(list(LogLevel.elements().values()))}
 
 
 class ExtLogger:
@@ -61,36 +65,40 @@ class ExtLogger:
 
     @staticmethod
     def getLogger(level=1):
-        stack = inspect.stack()
-        frame = stack[level]
-        file = inspect.getfile(frame[0])
-        line_no = frame.lineno
-        return ExtLogger(file, line_no)
+        frame = sys._getframe(level)
+        return LogConfig.logger(frame.f_code.co_filename, frame.f_lineno)
 
     @staticmethod
     def resetColor(message: str, level: LogLevel) -> str:
         return message.replace(f'{Color.RESET}', level.color)
 
     @staticmethod
-    def log(message: str = ' ', log_level: LogLevel = LogLevel.INFO, stack: int = 2):
-        ExtLogger.getLogger(stack).logger.log(log_level.value, ExtLogger.resetColor(str(message), log_level))
+    def extra(fields: dict) -> dict:
+        '''
+        Structured fields of an event (file, path, stage, bytes, duration...), written by the json log format.
+        '''
+        return {'fields': fields} if fields else None
+
+    @staticmethod
+    def log(message: str = ' ', log_level: LogLevel = LogLevel.INFO, stack: int = 2, fields: dict = None):
+        ExtLogger.getLogger(stack).logger.log(log_level.value, ExtLogger.resetColor(str(message), log_level), extra=ExtLogger.extra(fields))
 
     @staticmethod
-    def debug(message: str = ' ', stack: int = 2):
-        ExtLogger.getLogger(stack).logger.debug(ExtLogger.resetColor(str(message), LogLevel.DEBUG))
+    def debug(message: str = ' ', stack: int = 2, fields: dict = None):
+        ExtLogger.getLogger(stack).logger.debug(ExtLogger.resetColor(str(message), LogLevel.DEBUG), extra=ExtLogger.extra(fields))
 
     @staticmethod
-    def info(message: str = ' ', stack: int = 2):
-        ExtLogger.getLogger(stack).logger.info(ExtLogger.resetColor(str(message), LogLevel.INFO))
+    def info(message: str = ' ', stack: int = 2, fields: dict = None):
+        ExtLogger.getLogger(stack).logger.info(ExtLogger.resetColor(str(message), LogLevel.INFO), extra=ExtLogger.extra(fields))
 
     @staticmethod
-    def warn(message: str = ' ', stack: int = 2):
-        ExtLogger.getLogger(stack).logger.warning(ExtLogger.resetColor(str(message), LogLevel.WARNING))
+    def warn(message: str = ' ', stack: int = 2, fields: dict = None):
+        ExtLogger.getLogger(stack).logger.warning(ExtLogger.resetColor(str(message), LogLevel.WARNING), extra=ExtLogger.extra(fields))
 
     @staticmethod
-    def error(message: str, stack: int = 2, error: Exception = None):
+    def error(message: str, stack: int = 2, error: Exception = None, fields: dict = None):
         ExtLogger.getLogger(stack).logger.error(
-            msg=ExtLogger.resetColor(message, LogLevel.ERROR)
+            msg=ExtLogger.resetColor(message, LogLevel.ERROR), extra=ExtLogger.extra(fields)
         )
 
     @staticmethod
@@ -99,46 +107,132 @@ class ExtLogger:
 
 
 class ExtLogFormatter(logging.Formatter):
+    ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
 
-    def __init__(self, fmt):
+    def __init__(self, fmt, colors: bool = True):
         super().__init__()
         self.fmt = fmt
-        self.FORMATS = {
-            logging.DEBUG: f'{LogLevel.DEBUG.color}{fmt}{Color.RESET}',
-            logging.INFO: f'{LogLevel.INFO.color}{fmt}{Color.RESET}',
-            logging.WARNING: f'{LogLevel.WARNING.color}{fmt}{Color.RESET}',
-            logging.ERROR: f'{LogLevel.ERROR.color}{fmt}{Color.RESET}',
-            logging.CRITICAL: f'{LogLevel.CRITICAL.color}{fmt}{Color.RESET}'
-        }
+        self.colors = colors
+        if colors:
+            self.FORMATS = {
+                logging.DEBUG: f'{LogLevel.DEBUG.color}{fmt}{Color.RESET}',
+                logging.INFO: f'{LogLevel.INFO.color}{fmt}{Color.RESET}',
+                logging.WARNING: f'{LogLevel.WARNING.color}{fmt}{Color.RESET}',
+                logging.ERROR: f'{LogLevel.ERROR.color}{fmt}{Color.RESET}',
+                logging.CRITICAL: f'{LogLevel.CRITICAL.color}{fmt}{Color.RESET}'
+            }
+        else:
+            self.FORMATS = {level: fmt for level in [logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL]}
+        self.formatters = {level: logging.Formatter(log_fmt) for level, log_fmt in self.FORMATS.items()}
+        self.default = logging.Formatter(fmt)
 
     def format(self, record):
-        logLevel = LogLevel.ofValue(record.levelno)
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
+        formatter = self.formatters.get(record.levelno, self.default)
+        msg = record.msg
+        text = str(msg)
+        text = text.replace(str(Color.RESET), '') if self.colors else self.ANSI_ESCAPE.sub('', text)
 
+        # every line gets its own prefix, the record is reused instead of copied
         records = []
-        for line in record.msg.splitlines():
-            cur_record = copy.deepcopy(record)
-            line = line.replace(str(Color.RESET), str(''))
-            cur_record.msg = line
-            records.append(formatter.format(cur_record))
-
+        try:
+            for line in text.splitlines():
+                record.msg = line
+                records.append(formatter.format(record))
+        finally:
+            record.msg = msg
         return "\n".join(records)
 
 
+class ExtJsonFormatter(logging.Formatter):
+    '''
+    One compact json object per record (json lines) without colors, multi-line messages stay in one event.
+    Structured fields given to the logger are merged into the event.
+    '''
+    ANSI_ESCAPE = ExtLogFormatter.ANSI_ESCAPE
+
+    def format(self, record):
+        text = str(record.msg)
+        event = {'time': round(record.created, 3), 'level': record.levelname, 'source': record.name,
+                 'msg': self.ANSI_ESCAPE.sub('', text) if '\x1b' in text else text}
+        fields = getattr(record, 'fields', None)
+        if fields:
+            event.update(fields)
+        return Objects.toCompactJson(event)
+
+
+class BufferedRotatingFileHandler(logging.handlers.MemoryHandler):
+    '''
+    Rotating log file written in batches: records are flushed when capacity is reached, on errors and on close.
+    '''
+
+    def __init__(self, file: Path, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3, capacity: int = 256):
+        target = logging.handlers.RotatingFileHandler(file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        super().__init__(capacity, flushLevel=logging.ERROR, target=target, flushOnClose=True)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def close(self):
+        target = self.target
+        try:
+            super().close()
+        finally:
+            if target is not None:
+                target.close()
+
+
+class LogCapture(logging.Handler):
+    '''
+    Collects records instead of printing them, so they can be replayed later as one block (e.g. from worker processes).
+    '''
+
+    def __init__(self, level: int = logging.DEBUG):
+        super().__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def drain(self) -> list:
+        records = self.records
+        self.records = []
+        return records
+
+
 class LogConfig:
     __DEFAULT_FORMAT = '%(asctime)s [%(levelname)-8s] %(name)-20s : %(message)s'
     format: str = __DEFAULT_FORMAT
-    loggers = {}
+    # 'text' (colored console lines) or 'json' (one json object per event)
+    output_format: str = 'text'
+    loggers = OrderedDict()
+    max_loggers = 1024
     console = None
+    listener = None
 
     @staticmethod
     def console_output():
         out = logging.StreamHandler()
         out.setLevel(logging.DEBUG)
-        out.setFormatter(ExtLogFormatter(LogConfig.format))
+        out.setFormatter(LogConfig.formatter(colors=True))
         return out
 
+    @classmethod
+    def formatter(cls, colors: bool) -> logging.Formatter:
+        if cls.output_format == 'json':
+            return ExtJsonFormatter()
+        return ExtLogFormatter(cls.format, colors=colors)
+
+    @classmethod
+    def useJson(cls):
+        '''
+        Switches console (and later created outputs) to json lines, templates stop adding colors and separator lines.
+        '''
+        cls.output_format = 'json'
+        LogTemplates.plain = True
+        cls.cfg()
+        cls.console.setFormatter(cls.formatter(colors=False))
+
     @staticmethod
     def register(ext: ExtLogger):
         LogConfig.cfg()
@@ -146,7 +240,21 @@ class LogConfig:
         ext.logger.handlers = []
         ext.logger.addHandler(LogConfig.console)
         ext.logger.setLevel(LogConfig.console.level)
-        LogConfig.loggers[ext.id] = ext
+        LogConfig.loggers[(ext.file, ext.line)] = ext
+        if len(LogConfig.loggers) > LogConfig.max_loggers:
+            LogConfig.loggers.popitem(last=False)
+
+    @classmethod
+    def logger(cls, file: str, line: int) -> ExtLogger:
+        '''
+        Returns cached logger of the given call site, the least recently used ones are dropped.
+        '''
+        key = (file, line)
+        ext = cls.loggers.get(key)
+        if ext is None:
+            return ExtLogger(file, line)
+        cls.loggers.move_to_end(key)
+        return ext
 
     @classmethod
     def cfg(cls):
@@ -157,6 +265,78 @@ class LogConfig:
     def setLevel(cls, level: LogLevel):
         cls.cfg()
         cls.console.level = level.value
+        for ext in cls.loggers.values():
+            ext.logger.setLevel(level.value)
+
+    @classmethod
+    def getLevel(cls) -> int:
+        cls.cfg()
+        return cls.console.level
+
+    @classmethod
+    def use(cls, handler: logging.Handler) -> logging.Handler:
+        '''
+        Replaces console output of all loggers, returns the previous one.
+        '''
+        previous = cls.console
+        cls.console = handler
+        for ext in cls.loggers.values():
+            ext.logger.handlers = [handler]
+        return previous
+
+    @classmethod
+    def file_output(cls, file: Path) -> logging.Handler:
+        out = BufferedRotatingFileHandler(file)
+        out.setLevel(logging.DEBUG)
+        out.setFormatter(cls.formatter(colors=False))
+        return out
+
+    @classmethod
+    def enableQueue(cls, file: Path = None):
+        '''
+        Loggers only put records into a queue, a background thread writes them to console (and the log file),
+        so callers never block on terminal or file I/O.
+        '''
+        cls.cfg()
+        if cls.listener is not None:
+            return
+        outputs = [cls.console]
+        if file is not None:
+            outputs.append(cls.file_output(file))
+
+        records = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(records)
+        handler.setLevel(cls.console.level)
+        cls.listener = logging.handlers.QueueListener(records, *outputs, respect_handler_level=True)
+        cls.listener.start()
+        cls.use(handler)
+        atexit.register(cls.disableQueue)
+
+    @classmethod
+    def disableQueue(cls):
+        if cls.listener is None:
+            return
+        listener = cls.listener
+        cls.listener = None
+        listener.stop()
+        console = listener.handlers[0]
+        console.setLevel(cls.console.level)
+        cls.use(console)
+        for handler in listener.handlers[1:]:
+            handler.close()
+
+    @classmethod
+    def capture(cls, level: int = logging.DEBUG) -> LogCapture:
+        capture = LogCapture(level)
+        cls.use(capture)
+        return capture
+
+    @classmethod
+    def replay(cls, records: list):
+        cls.cfg()
+        for record in records:
+            if record.levelno >= cls.console.level:
+                cls.console.handle(record)
 
     @staticmethod
     def printLoggers():
@@ -169,10 +349,12 @@ class LogTemplates:
     LINE_1 = '============================================================'
     LINE_2 = '------------------------------------------------------------'
     VARIABLE_COLOR = Color.ORANGE
+    # no colors and separator lines (json log format)
+    plain = False
 
     @classmethod
     def section(cls, title: str, line: str, color: Color, logLevel: LogLevel = LogLevel.INFO):
-        msg = color.format(f'{line}\n{title}\n{line}')
+        msg = title if cls.plain else color.format(f'{line}\n{title}\n{line}')
         ExtLogger.log(msg, log_level=logLevel, stack=4)
 
     @classmethod
@@ -185,6 +367,8 @@ class LogTemplates:
 
     @classmethod
     def variable(cls, value) -> str:
+        if cls.plain:
+            return f'[{value}]'
         return f'[{cls.VARIABLE_COLOR.format(str(value))}]'
 
 
@@ -1,5 +1,6 @@
 import enum
 import json
+import os
 
 
 class Objects:
@@ -9,10 +10,41 @@ class Objects:
             return Objects.toJson(list(value))
         if isinstance(value, enum.Enum):
             return value.name
-        return json.dumps(value, default=lambda o: o.__dict__ if hasattr(o, '__dict__') else {}, sort_keys=True, indent=1, check_circular=True)
+        return json.dumps(value, default=Objects.toDict, sort_keys=True, indent=1, check_circular=True)
+
+    @staticmethod
+    def toDict(value):
+        '''
+        Plain value of an object for json: enums by name, paths and sets as strings and lists, objects by their __dict__ or __slots__.
+        '''
+        if isinstance(value, enum.Enum):
+            return value.name
+        if isinstance(value, os.PathLike):
+            return os.fspath(value)
+        if isinstance(value, (set, frozenset, tuple)):
+            return list(value)
+        if hasattr(value, '__dict__'):
+            return value.__dict__
+        slots = getattr(type(value), '__slots__', None)
+        if slots:
+            return {name: getattr(value, name, None) for name in slots}
+        return str(value)
+
+    @staticmethod
+    def toCompactJson(value) -> str:
+        '''
+        Single line json without sorting and indentation, e.g. for log events.
+        '''
+        return _COMPACT_ENCODER.encode(value)
+
+
+_COMPACT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), check_circular=True, default=Objects.toDict)
 
 
 class ExtObject:
+    # allows compact subclasses declaring their own __slots__
+    __slots__ = ()
+
     # def __eq__(self, other) -> bool:
     #     return Objects.equals(self, other)
     #
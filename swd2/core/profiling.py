@@ -0,0 +1,134 @@
+import json
+import logging
+import time
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogConfig, LogTemplates
+
+# Profiler collecting metrics, None when profiling is off; instrumented code checks it once per file, not per chunk
+ACTIVE = None
+MB = 1024 * 1024
+STAGE_ORDER = ['read', 'translate', 'deflate', 'inflate', 'write', 'replace', 'logging']
+
+
+class StageMetrics:
+    __slots__ = ('ns', 'bytes', 'calls')
+
+    def __init__(self, ns: int = 0, bytes: int = 0, calls: int = 0):
+        self.ns = ns
+        self.bytes = bytes
+        self.calls = calls
+
+
+class Profiler:
+    '''
+    Per-stage timers and byte counters plus per-file latencies of the compressor.
+    '''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.files = []
+
+    def add(self, stage: str, ns: int, size: int = 0):
+        metrics = self.stages.get(stage)
+        if metrics is None:
+            metrics = self.stages[stage] = StageMetrics()
+        metrics.ns += ns
+        metrics.bytes += size
+        metrics.calls += 1
+
+    def file(self, seconds: float, size: int):
+        self.files.append((seconds, size))
+
+    def drain(self) -> dict:
+        '''
+        Returns collected metrics as plain data (e.g. to send them from a worker process) and resets them.
+        '''
+        data = {'stages': {name: (m.ns, m.bytes, m.calls) for name, m in self.stages.items()}, 'files': self.files}
+        self.stages = {}
+        self.files = []
+        return data
+
+    def merge(self, data: dict):
+        for name, (ns, size, calls) in data['stages'].items():
+            metrics = self.stages.setdefault(name, StageMetrics())
+            metrics.ns += ns
+            metrics.bytes += size
+            metrics.calls += calls
+        self.files.extend(data['files'])
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        latencies = [seconds for seconds, _ in self.files]
+        size = sum(size for _, size in self.files)
+        names = sorted(self.stages, key=lambda name: STAGE_ORDER.index(name) if name in STAGE_ORDER else len(STAGE_ORDER))
+        return {
+            'elapsed_s': round(elapsed, 4),
+            'files': len(self.files),
+            'bytes': size,
+            'files_per_s': round(len(self.files) / elapsed, 2) if elapsed else 0,
+            'mb_per_s': round(size / MB / elapsed, 2) if elapsed else 0,
+            'latency_p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'latency_p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'stages': {name: {
+                'seconds': round(self.stages[name].ns / 1e9, 4),
+                'bytes': self.stages[name].bytes,
+                'calls': self.stages[name].calls,
+                'mb_per_s': round(self.stages[name].bytes / MB / (self.stages[name].ns / 1e9), 2) if self.stages[name].ns else 0,
+            } for name in names},
+        }
+
+    def log_summary(self, report: dict = None):
+        report = report or self.report()
+        LogTemplates.subtitle('Profile')
+        ExtLogger.info(f'{"stage":<10} {"calls":>8} {"time [s]":>10} {"MB":>10} {"MB/s":>10}')
+        for name, stage in report['stages'].items():
+            ExtLogger.info(f'{name:<10} {stage["calls"]:>8} {stage["seconds"]:>10.3f} {stage["bytes"] / MB:>10.2f} {stage["mb_per_s"]:>10.2f}')
+        elapsed = f'{report["elapsed_s"]:.2f}s'
+        p50 = f'{report["latency_p50_ms"]}ms'
+        p95 = f'{report["latency_p95_ms"]}ms'
+        ExtLogger.info(f'Files: {LogTemplates.variable(report["files"])} in {LogTemplates.variable(elapsed)}, '
+                       f'{LogTemplates.variable(report["files_per_s"])} files/s, {LogTemplates.variable(report["mb_per_s"])} MB/s, '
+                       f'latency p50 {LogTemplates.variable(p50)} p95 {LogTemplates.variable(p95)}')
+
+
+class TimedHandler(logging.Handler):
+    '''
+    Measures time callers spend in logging, delegates records to the wrapped handler.
+    '''
+
+    def __init__(self, handler: logging.Handler, profiler: Profiler):
+        super().__init__(handler.level)
+        self.handler = handler
+        self.profiler = profiler
+
+    def handle(self, record) -> bool:
+        started = time.perf_counter_ns()
+        result = self.handler.handle(record)
+        self.profiler.add('logging', time.perf_counter_ns() - started)
+        return result
+
+
+def percentile(values: list, p: float) -> float:
+    '''
+    Nearest-rank p-th percentile (0-100) of unsorted values, 0.0 when there are none.
+    '''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def enable(timed_logging: bool = True) -> Profiler:
+    global ACTIVE
+    ACTIVE = Profiler()
+    if timed_logging:
+        LogConfig.cfg()
+        LogConfig.use(TimedHandler(LogConfig.console, ACTIVE))
+    return ACTIVE
+
+
+def save(report: dict, file: Path):
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
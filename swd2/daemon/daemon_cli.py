@@ -0,0 +1,207 @@
+import logging
+
+import click
+from swd2.swd2_cli import cli, stored_config, Swd2Config
+from swd2.core.extlogging import ExtLogger, LogTemplates, LogConfig
+from swd2.daemon import protocol
+from swd2.translator import charmap as charmaps
+
+
+def socket_option(f):
+    return click.option('--socket', 'socket_path',
+                        type=click.types.Path(dir_okay=False),
+                        help="Unix socket of the daemon",
+                        default=str(protocol.default_socket()),
+                        show_default=True
+                        )(f)
+
+
+@cli.command()
+@socket_option
+@click.option('--jobs',
+              type=click.IntRange(min=1),
+              help="Number of worker processes (default: CPU count)",
+              default=None
+              )
+@stored_config
+@click.pass_context
+def serve(ctx, config: Swd2Config, socket_path: str, jobs: int):
+    '''
+    Keep a warm process serving compress/decompress/verify requests on a unix socket
+    '''
+    from swd2.daemon.server import Server
+    from swd2.translator import batch, compressor
+
+    # requested files may be rewritten while being read, a truncated mapped file would kill the worker
+    compressor.USE_MMAP = False
+    LogTemplates.title('Daemon')
+    try:
+        Server(config.working_dir / socket_path, jobs or batch.default_jobs()).run()
+    except OSError as err:
+        ExtLogger.error(f'Cannot serve on {LogTemplates.variable(socket_path)}: {err}')
+        ctx.exit(1)
+
+
+@cli.group()
+def client():
+    '''
+    Send requests to swd2 serve, files are processed locally when it is not running
+    '''
+
+
+def send(ctx, config: Swd2Config, socket_path: str, request: dict):
+    '''
+    Sends request to the daemon and prints its log records as if the operation ran here.
+    '''
+    for key in ('src', 'dst', 'source'):
+        if request.get(key) is not None:
+            request[key] = str((config.working_dir / request[key]).absolute())
+    for key in ('charmap', 'reverse_charmap'):
+        if request.get(key) is not None:
+            request[key] = charmaps.resolve(request[key], config.working_dir.absolute())
+    try:
+        with protocol.Client(config.working_dir / socket_path) as connection:
+            response = connection.request(request)
+    except (FileNotFoundError, ConnectionRefusedError):
+        ExtLogger.debug('Daemon is not running, processing locally')
+        response = execute_locally(request)
+    except (OSError, protocol.ProtocolError) as err:
+        ExtLogger.error(f'Request to daemon failed: {err}')
+        ctx.exit(1)
+    LogConfig.replay([logging.makeLogRecord(record) for record in response.get('records', [])])
+    if response.get('error'):
+        ExtLogger.error(response['error'])
+    if not response.get('ok'):
+        ctx.exit(1)
+    return response
+
+
+def execute_locally(request: dict) -> dict:
+    from swd2.daemon.server import task
+
+    try:
+        function, batch_task = task(request)
+    except (ValueError, KeyError, TypeError, OSError) as err:
+        return {'ok': False, 'error': str(err)}
+    return {'ok': bool(function(batch_task.source, batch_task.target, **batch_task.options))}
+
+
+@client.command('compress')
+@click.option('--src',
+              type=click.types.Path(),
+              required=True,
+              help="Source file location"
+              )
+@click.option('--dst',
+              type=click.types.Path(),
+              required=True,
+              help="Target file location"
+              )
+@click.option('--force',
+              is_flag=True,
+              help="Force overwrite file"
+              )
+@click.option('--profile', help="Compression profile", default='release', show_default=True)
+@click.option('--level', type=click.IntRange(0, 9), help="Deflate level (custom profile)")
+@click.option('--mem-level', type=click.IntRange(1, 9), help="Deflate memory level (custom profile)")
+@click.option('--strategy', help="Deflate strategy (custom profile)")
+@click.option('--charmap', help="Charmap locale or path to *.json file", default='pl', show_default=True)
+@socket_option
+@stored_config
+@click.pass_context
+def client_compress(ctx, config: Swd2Config, src: str, dst: str, force: bool, profile: str, level: int, mem_level: int,
+                    strategy: str, charmap: str, socket_path: str):
+    '''
+    Compress *.csv to *.csv.z
+    '''
+    request = {'operation': 'compress', 'src': src, 'dst': dst, 'overwrite': force, 'profile': profile, 'charmap': charmap}
+    for name, value in (('level', level), ('mem_level', mem_level), ('strategy', strategy)):
+        if value is not None:
+            request[name] = value
+    send(ctx, config, socket_path, request)
+
+
+@client.command('decompress')
+@click.option('--src',
+              type=click.types.Path(),
+              required=True,
+              help="Source file location"
+              )
+@click.option('--dst',
+              type=click.types.Path(),
+              required=True,
+              help="Target file location"
+              )
+@click.option('--force',
+              is_flag=True,
+              help="Force overwrite file"
+              )
+@click.option('--reverse-charmap', help="Apply reverse mapping of charmap (locale or *.json file) to output")
+@socket_option
+@stored_config
+@click.pass_context
+def client_decompress(ctx, config: Swd2Config, src: str, dst: str, force: bool, reverse_charmap: str, socket_path: str):
+    '''
+    Decompress *.csv.z to *.csv
+    '''
+    request = {'operation': 'decompress', 'src': src, 'dst': dst, 'overwrite': force}
+    if reverse_charmap:
+        request['reverse_charmap'] = reverse_charmap
+    send(ctx, config, socket_path, request)
+
+
+@client.command('verify')
+@click.option('--src',
+              type=click.types.Path(),
+              required=True,
+              help="Compressed file location"
+              )
+@click.option('--source',
+              type=click.types.Path(),
+              help="Also check that it contains this *.csv after charmap"
+              )
+@click.option('--charmap', help="Charmap locale or path to *.json file", default='pl', show_default=True)
+@socket_option
+@stored_config
+@click.pass_context
+def client_verify(ctx, config: Swd2Config, src: str, source: str, charmap: str, socket_path: str):
+    '''
+    Verify integrity of compressed file
+    '''
+    send(ctx, config, socket_path, {'operation': 'verify', 'src': src, 'source': source, 'charmap': charmap})
+
+
+@client.command('status')
+@socket_option
+@stored_config
+@click.pass_context
+def client_status(ctx, config: Swd2Config, socket_path: str):
+    '''
+    Show whether the daemon is running
+    '''
+    try:
+        with protocol.Client(config.working_dir / socket_path, timeout=5) as connection:
+            status = connection.request({'operation': 'status'})
+    except (OSError, protocol.ProtocolError):
+        ExtLogger.info(f'Daemon is not running on {LogTemplates.variable(socket_path)}')
+        ctx.exit(1)
+    ExtLogger.info(f'Daemon {LogTemplates.variable(status["pid"])} is running for {LogTemplates.variable(status["uptime"])}s '
+                   f'with {LogTemplates.variable(status["workers"])} workers, served {LogTemplates.variable(status["served"])} requests',
+                   fields=status)
+
+
+@client.command('stop')
+@socket_option
+@stored_config
+@click.pass_context
+def client_stop(ctx, config: Swd2Config, socket_path: str):
+    '''
+    Stop the daemon
+    '''
+    try:
+        with protocol.Client(config.working_dir / socket_path, timeout=5) as connection:
+            connection.request({'operation': 'stop'})
+    except (OSError, protocol.ProtocolError):
+        ExtLogger.info(f'Daemon is not running on {LogTemplates.variable(socket_path)}')
+        ctx.exit(1)
+    ExtLogger.info('Daemon stopped')
@@ -0,0 +1,159 @@
+import getpass
+import json
+import logging
+import os
+import socket
+import struct
+import tempfile
+from pathlib import Path
+
+# every message is a json object prefixed by its length (4 bytes, big endian)
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME = 64 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def default_socket() -> Path:
+    '''
+    Socket in the runtime dir of the user or in a private dir of the user inside the temp dir, never directly
+    in a dir other users can write to.
+    '''
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return Path(runtime_dir) / 'swd2.sock'
+    user = os.getuid() if hasattr(os, 'getuid') else getpass.getuser()
+    return Path(tempfile.gettempdir()) / f'swd2-{user}' / 'swd2.sock'
+
+
+def private_dir(directory: Path):
+    '''
+    Creates directory accessible only by the current user, raises PermissionError when it exists and belongs to
+    another user or others can access it (e.g. created first by another user of a shared temp dir).
+    '''
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        return
+    directory_stat = os.stat(directory)
+    if directory_stat.st_uid != os.getuid() or directory_stat.st_mode & 0o077:
+        raise PermissionError(f'Socket dir {directory} must belong to the current user and be accessible only by them')
+
+
+def check_owner(socket_path: Path):
+    '''
+    Raises PermissionError when the socket was not created by the current user, its replies could not be trusted.
+    '''
+    if hasattr(os, 'getuid') and os.stat(socket_path).st_uid != os.getuid():
+        raise PermissionError(f'Socket {socket_path} belongs to another user')
+
+
+def encode(message: dict) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    if len(payload) > MAX_FRAME:
+        raise ProtocolError(f'Message of {len(payload)} bytes exceeds {MAX_FRAME} bytes')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def decode(payload: bytes) -> dict:
+    try:
+        message = json.loads(payload)
+    except ValueError as err:
+        raise ProtocolError(f'Invalid message: {err}')
+    if not isinstance(message, dict):
+        raise ProtocolError('Message is not a json object')
+    return message
+
+
+def frame_size(header: bytes) -> int:
+    size, = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ProtocolError(f'Message of {size} bytes exceeds {MAX_FRAME} bytes')
+    return size
+
+
+async def read_message(reader) -> dict:
+    '''
+    Reads one message from asyncio stream, returns None when the peer closed the connection between messages.
+    '''
+    import asyncio
+
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError as err:
+        if err.partial:
+            raise ProtocolError('Connection closed inside message header')
+        return None
+    try:
+        return decode(await reader.readexactly(frame_size(header)))
+    except asyncio.IncompleteReadError:
+        raise ProtocolError('Connection closed inside message')
+
+
+def record_data(record: logging.LogRecord) -> dict:
+    '''
+    Log record as json-ready data, arguments are merged into the message. Restored by logging.makeLogRecord.
+    '''
+    return dict(record.__dict__, msg=record.getMessage(), args=None, exc_info=None, exc_text=None)
+
+
+class Client:
+    '''
+    Blocking connection to swd2 serve, several requests can be sent over one connection.
+    Connecting raises FileNotFoundError or ConnectionRefusedError when the daemon is not running
+    and PermissionError when the socket belongs to another user.
+    '''
+
+    def __init__(self, socket_path: Path, timeout: float = None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.sock = None
+
+    def connect(self) -> 'Client':
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ConnectionRefusedError('Unix domain sockets are not available on this platform')
+        check_owner(self.socket_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        try:
+            self.sock.connect(str(self.socket_path))
+        except OSError:
+            self.close()
+            raise
+        return self
+
+    def request(self, message: dict) -> dict:
+        self.sock.sendall(encode(message))
+        response = self._receive(FRAME_HEADER.size)
+        return decode(self._receive(frame_size(response)))
+
+    def _receive(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(min(size - len(data), 1024 * 1024))
+            if not chunk:
+                raise ProtocolError('Daemon closed the connection')
+            data += chunk
+        return bytes(data)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self) -> 'Client':
+        return self.connect()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def running(socket_path: Path) -> bool:
+    try:
+        with Client(socket_path, timeout=1) as client:
+            return client.request({'operation': 'status'}).get('ok', False)
+    except (OSError, ProtocolError):
+        return False
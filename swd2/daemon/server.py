@@ -0,0 +1,146 @@
+import asyncio
+import os
+import signal
+import time
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.daemon import protocol
+from swd2.translator import batch, jobs, verifier, charmap as charmaps
+
+OPERATIONS = ['compress', 'decompress', 'verify', 'status', 'stop']
+
+
+def task(request: dict) -> tuple[callable, batch.BatchTask]:
+    '''
+    Resolves request of a compress/decompress (same fields as entries of run-jobs files) or verify operation.
+    Paths must be absolute. Raises ValueError describing an invalid request.
+    '''
+    operation = request.get('operation')
+    for key in ('src', 'dst', 'source'):
+        if request.get(key) is not None and not Path(request[key]).is_absolute():
+            raise ValueError(f'Path {key} must be absolute: {request[key]}')
+    if operation == 'verify':
+        source = request.get('source')
+        options = {'charmap': charmaps.load(request.get('charmap', charmaps.DEFAULT_LOCALE))} if source else {}
+        return verifier.verify, batch.BatchTask(Path(request['src']), Path(source) if source else None, options)
+    if operation not in jobs.OPERATIONS:
+        raise ValueError(f'Unknown operation {LogTemplates.variable(operation)} (available: {", ".join(OPERATIONS)})')
+    parsed, violations = jobs.parse({'jobs': [request]}, Path('/'))
+    if violations:
+        raise ValueError(violations[0])
+    job = parsed[0]
+    return jobs.execute, batch.BatchTask(job.source, job.target, {'operation': job.operation, **job.options})
+
+
+def _warm(_):
+    charmaps.load()
+
+
+class Server:
+    '''
+    Warm process accepting requests on a unix domain socket. Conversions run concurrently on a pool of worker
+    processes, which keep loaded charmaps and profiles between requests.
+    '''
+
+    def __init__(self, socket_path: Path, workers: int):
+        self.socket_path = socket_path
+        self.workers = workers
+        self.pool = None
+        self.stopping = None
+        self.served = 0
+        self.started = time.time()
+
+    def run(self):
+        if self.socket_path == protocol.default_socket():
+            protocol.private_dir(self.socket_path.parent)
+        if self.socket_path.exists():
+            if protocol.running(self.socket_path):
+                raise OSError(f'Daemon is already running on {self.socket_path}')
+            self.socket_path.unlink()
+        self.pool = self._start_pool()
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self.pool.shutdown()
+
+    def _start_pool(self):
+        pool = batch.executor(self.workers)
+        # workers are started and warmed before the first request is submitted
+        for _ in range(self.workers):
+            pool.submit(_warm, None)
+        return pool
+
+    def _restart_pool(self, broken):
+        # requests running on the broken pool all fail together, the first one replaces it
+        if self.pool is not broken:
+            return
+        ExtLogger.warn('Worker pool is broken (a worker died), starting a new one')
+        self.pool = self._start_pool()
+        broken.shutdown(wait=False)
+
+    async def _serve(self):
+        self.stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stopping.set)
+        # the socket is created accessible only by the owner, chmod after bind would leave a window for other users
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._handle, path=str(self.socket_path))
+        finally:
+            os.umask(umask)
+        ExtLogger.info(f'Serving on {LogTemplates.variable(self.socket_path)} with {LogTemplates.variable(self.workers)} workers',
+                       fields={'stage': 'serve', 'path': str(self.socket_path), 'workers': self.workers})
+        try:
+            async with server:
+                await self.stopping.wait()
+        finally:
+            self.socket_path.unlink(missing_ok=True)
+        ExtLogger.info(f'Daemon stopped after {LogTemplates.variable(self.served)} requests')
+
+    async def _handle(self, reader, writer):
+        try:
+            while not self.stopping.is_set():
+                request = await protocol.read_message(reader)
+                if request is None:
+                    break
+                writer.write(protocol.encode(await self._respond(request)))
+                await writer.drain()
+        except protocol.ProtocolError as err:
+            ExtLogger.warn(f'Invalid request: {err.message}')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request: dict) -> dict:
+        operation = request.get('operation')
+        if operation == 'status':
+            return {'ok': True, 'pid': os.getpid(), 'workers': self.workers, 'served': self.served,
+                    'uptime': round(time.time() - self.started, 1)}
+        if operation == 'stop':
+            self.stopping.set()
+            return {'ok': True}
+        try:
+            function, batch_task = task(request)
+        except (ValueError, KeyError, TypeError, OSError) as err:
+            return {'ok': False, 'error': str(err)}
+
+        started = time.perf_counter()
+        pool = self.pool
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, batch.execute, function, batch_task)
+        except BrokenProcessPool as err:
+            self._restart_pool(pool)
+            return {'ok': False, 'error': f'Worker of {operation} {batch_task.source.name} died: {err}'}
+        except Exception as err:
+            ExtLogger.error(f'{operation} {LogTemplates.variable(batch_task.source.name)} failed: {err}')
+            return {'ok': False, 'error': f'{operation} {batch_task.source.name} failed: {err}'}
+        self.served += 1
+        duration = time.perf_counter() - started
+        ExtLogger.info(f'{operation} {LogTemplates.variable(batch_task.source.name)}: {"ok" if result.ok else "failed"} '
+                       f'in {LogTemplates.variable(f"{duration * 1000:.1f}ms")}',
+                       fields={'stage': operation, 'file': batch_task.source.name, 'ok': result.ok, 'duration': round(duration, 4)})
+        return {'ok': result.ok, 'records': [protocol.record_data(record) for record in result.records]}
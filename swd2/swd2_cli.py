@@ -1,5 +1,7 @@
+import importlib
+import sys
+
 import click
-import pyfiglet
 
 from pathlib import Path
 
@@ -19,13 +21,68 @@ class Swd2Config(ExtObject):
 stored_config = click.make_pass_decorator(Swd2Config, ensure=True)
 
 
-@click.group()
+class LazyGroup(click.Group):
+    '''
+    Command group importing its subcommand modules only when they are used. Lazy commands are given as
+    name: (module, help), so listing them in --help imports nothing.
+    '''
+
+    def __init__(self, *args, lazy_commands: dict = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            # the module registers its group on import
+            importlib.import_module(self.lazy_commands[cmd_name][0])
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        names = [name for name in self.list_commands(ctx) if name in self.lazy_commands or not self.commands[name].hidden]
+        if not names:
+            return
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = []
+        for name in names:
+            if name in self.commands:
+                rows.append((name, self.commands[name].get_short_help_str(limit)))
+            else:
+                rows.append((name, click.utils.make_default_short_help(self.lazy_commands[name][1], limit)))
+        with formatter.section('Commands'):
+            formatter.write_dl(rows)
+
+
+def banner():
+    import pyfiglet
+    click.secho(f'{Color.BLUE.format(pyfiglet.figlet_format("SteamWorldDig2", font="doom"))}')
+
+
+@click.group(cls=LazyGroup, lazy_commands={
+    'translator': ('swd2.translator.translator_cli', 'Translator group'),
+    'bench': ('swd2.bench.bench_cli', 'Benchmark group'),
+    'serve': ('swd2.daemon.daemon_cli', 'Keep a warm process serving compress/decompress/verify requests on a unix socket'),
+    'client': ('swd2.daemon.daemon_cli', 'Send requests to swd2 serve, files are processed locally when it is not running'),
+})
 @click.option('-v', '--verbose', is_flag=True)
 @click.option('--working-dir', type=click.types.Path(), default='.', help="working directory")
 @click.option('--log-level', help='Logging level', default='INFO')
+@click.option('--log-queue', is_flag=True, help='Write logs from a background thread')
+@click.option('--log-file', type=click.types.Path(dir_okay=False), help='Also write logs to rotating file (enables --log-queue)')
+@click.option('--log-format', type=click.Choice(['text', 'json']), default='text', help='Colored text or one json object per event')
+@click.option('--no-banner', is_flag=True, help='Do not print banner (always skipped when output is not a terminal or with json logs)')
+@click.option('--profile', is_flag=True, help='Measure stages of compression and print summary at the end')
+@click.option('--profile-dump', type=click.types.Path(dir_okay=False), help='Write cProfile stats of main process to file (enables --profile)')
+@click.option('--metrics', type=click.types.Path(dir_okay=False), help='Write profile metrics to json file (enables --profile)')
 @stored_config
-def cli(config: Swd2Config, verbose, working_dir, log_level):
-    click.secho(f'{Color.BLUE.format(pyfiglet.figlet_format("SteamWorldDig2", font="doom"))}')
+@click.pass_context
+def cli(ctx, config: Swd2Config, verbose, working_dir, log_level, log_queue, log_file, log_format, no_banner, profile, profile_dump, metrics):
+    if log_format == 'json':
+        LogConfig.useJson()
+    elif not no_banner and sys.stdout.isatty():
+        banner()
 
     if verbose:
         ExtLogger.info(f'Use verbose mode {LogTemplates.variable(verbose)}')
@@ -42,6 +99,36 @@ def cli(config: Swd2Config, verbose, working_dir, log_level):
         config.login_level = parsed_level
         LogConfig.setLevel(parsed_level)
 
+    if log_queue or log_file:
+        LogConfig.enableQueue(Path(log_file) if log_file else None)
+
+    if profile or profile_dump or metrics:
+        start_profiling(ctx, profile_dump, metrics)
+
+
+def start_profiling(ctx, profile_dump: str = None, metrics: str = None):
+    from swd2.core import profiling
+
+    profiler = profiling.enable()
+    stats = None
+    if profile_dump:
+        import cProfile
+        stats = cProfile.Profile()
+        stats.enable()
+
+    def finish():
+        if stats is not None:
+            stats.disable()
+            stats.dump_stats(profile_dump)
+            ExtLogger.info(f'cProfile stats saved to {LogTemplates.variable(profile_dump)}')
+        report = profiler.report()
+        profiler.log_summary(report)
+        if metrics:
+            profiling.save(report, Path(metrics))
+            ExtLogger.info(f'Metrics saved to {LogTemplates.variable(metrics)}')
+
+    ctx.call_on_close(finish)
+
 
 @cli.command
 @stored_config
@@ -0,0 +1,141 @@
+import hashlib
+import time
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+from swd2.translator import charmap as charmaps, compressor
+from swd2.translator.charmap import Charmap
+from swd2.translator.compressor import CompressionProfile, StreamEncoder, StreamDecoder, HEADER_SIZE
+
+CANDIDATES = [
+    compressor.FAST,
+    CompressionProfile('level-6', level=6),
+    compressor.RELEASE,
+    CompressionProfile('release-mem-9', level=9, mem_level=9),
+    CompressionProfile('release-filtered', level=9, strategy='filtered'),
+]
+# outputs at most this much larger than the smallest one count as equal, the fastest of them wins
+SIZE_TOLERANCE = 0.01
+
+
+class Measurement(ExtObject):
+    def __init__(self, profile: CompressionProfile, size: int, seconds: float, violation: str = None):
+        self.profile = profile
+        self.size = size
+        self.seconds = seconds
+        self.violation = violation
+
+    @property
+    def is_ok(self) -> bool:
+        return self.violation is None
+
+
+class _Checker:
+    '''
+    Inflates produced stream on the fly, so every candidate is verified against the header-plus-zlib format
+    that decompress reads, without keeping the output in memory.
+    '''
+
+    def __init__(self):
+        self.decoder = StreamDecoder(expected_size=-1)
+        self.digest = hashlib.blake2b(digest_size=16)
+        self.size = HEADER_SIZE
+
+    def feed(self, data: bytes):
+        self.size += len(data)
+        for chunk in self.decoder.feed(data):
+            self.digest.update(chunk)
+
+    def finish(self, expected_size: int) -> str:
+        self.digest.update(self.decoder.finish())
+        self.decoder.expected_size = expected_size
+        return self.decoder.violation()
+
+
+def measure(file: Path, profile: CompressionProfile, translation_table: dict) -> tuple[Measurement, str]:
+    encoder = StreamEncoder(translation_table, profile)
+    checker = _Checker()
+    elapsed = 0.0
+    with compressor.open_view(file) as view:
+        for chunk in compressor.iter_view(view):
+            start = time.perf_counter()
+            data = encoder.feed(chunk)
+            elapsed += time.perf_counter() - start
+            checker.feed(data)
+    start = time.perf_counter()
+    data = encoder.finish()
+    elapsed += time.perf_counter() - start
+    checker.feed(data)
+    violation = checker.finish(encoder.size)
+    return Measurement(profile, checker.size, elapsed, violation), checker.digest.hexdigest()
+
+
+def fastest_of_smallest(items: list, size, seconds):
+    '''
+    Returns the fastest of items whose size is within SIZE_TOLERANCE of the smallest one, so a slightly smaller
+    but much slower candidate does not win.
+    '''
+    if not items:
+        return None
+    limit = min(size(item) for item in items) * (1 + SIZE_TOLERANCE)
+    return min((item for item in items if size(item) <= limit), key=lambda item: (seconds(item), size(item)))
+
+
+def best(measurements: list[Measurement]) -> Measurement:
+    return fastest_of_smallest([m for m in measurements if m.is_ok], lambda m: m.size, lambda m: m.seconds)
+
+
+def sample(files: list[Path], size: int) -> list[Path]:
+    '''
+    The largest files dominate build time and output size, so they are tuned first.
+    '''
+    return sorted(files, key=lambda file: (-file.stat().st_size, file.name))[:size]
+
+
+def tune(files: list[Path], charmap: Charmap = None, candidates: list[CompressionProfile] = None, measured: dict = None) -> dict:
+    '''
+    Compresses every file in memory with every candidate and returns the best settings per file name (see best).
+    The '*' key holds the best candidate by total size and time, used for files outside the sample.
+    When measured is given, size and seconds of every candidate are stored there per file name.
+    '''
+    candidates = candidates or CANDIDATES
+    translation_table = (charmap or charmaps.load()).table
+    totals = {candidate.name: [0, 0.0] for candidate in candidates}
+    rejected = set()
+    tuned = {}
+
+    LogTemplates.subtitle(f'Autotune of {LogTemplates.variable(len(files))} files')
+    for file in files:
+        measurements = []
+        digests = set()
+        for candidate in candidates:
+            measurement, digest = measure(file, candidate, translation_table)
+            if measurement.is_ok:
+                digests.add(digest)
+                totals[candidate.name][0] += measurement.size
+                totals[candidate.name][1] += measurement.seconds
+            else:
+                rejected.add(candidate.name)
+                ExtLogger.warn(f'Profile {LogTemplates.variable(candidate)} rejected for {LogTemplates.variable(file.name)}: {measurement.violation}')
+            measurements.append(measurement)
+        if measured is not None:
+            measured[file.name] = {m.profile.name: {'size': m.size, 'seconds': round(m.seconds, 6)} if m.is_ok else {'violation': m.violation}
+                                   for m in measurements}
+
+        winner = best(measurements)
+        if winner is None or len(digests) != 1:
+            ExtLogger.error(f'Autotune failed for {LogTemplates.variable(file.name)}, candidates produced different content')
+            continue
+        tuned[file.name] = winner.profile.settings()
+        ExtLogger.info(f'{LogTemplates.variable(file.name)} : {LogTemplates.variable(winner.profile)} '
+                       f'size: {LogTemplates.variable(winner.size)} time: {LogTemplates.variable(f"{winner.seconds * 1000:.1f}ms")}')
+
+    for name, (size, seconds) in totals.items():
+        ExtLogger.info(f'Profile {LogTemplates.variable(name)} total size: {LogTemplates.variable(size)} time: {LogTemplates.variable(f"{seconds * 1000:.1f}ms")}')
+    accepted = [candidate for candidate in candidates if candidate.name not in rejected]
+    if tuned and accepted:
+        overall = fastest_of_smallest(accepted, lambda candidate: totals[candidate.name][0], lambda candidate: totals[candidate.name][1])
+        tuned['*'] = overall.settings()
+        ExtLogger.info(f'Best overall profile: {LogTemplates.variable(overall)}')
+    return tuned
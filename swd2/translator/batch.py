@@ -0,0 +1,127 @@
+import os
+from pathlib import Path
+
+from swd2.core import commands, profiling
+from swd2.core.commands import CmdResult, CmdStatus
+from swd2.core.extlogging import ExtLogger, LogConfig, LogTemplates
+from swd2.core.exttypes import ExtObject
+
+_capture = None
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+class BatchTask(ExtObject):
+    def __init__(self, source: Path, target: Path, options: dict = None):
+        self.source = source
+        self.target = target
+        self.options = options if options is not None else {}
+
+
+class BatchResult(ExtObject):
+    def __init__(self, task: BatchTask, ok: bool, records: list = None, metrics: dict = None, value=None):
+        self.task = task
+        self.ok = ok
+        # result of operations returning more than success (e.g. a report), its truth value is ok
+        self.value = value
+        self.records = records if records is not None else []
+        # profiler metrics collected in a worker process
+        self.metrics = metrics
+
+    def to_cmd_result(self, name: str) -> CmdResult:
+        status = CmdStatus.SUCCESS if self.ok else CmdStatus.ERROR
+        return CmdResult(cmd=name, path=str(self.task.source), output='', result_code=0 if self.ok else 1, status=status)
+
+
+def run(name: str, operation: callable, tasks: list[BatchTask], jobs: int = None) -> list[BatchResult]:
+    '''
+    Runs operation(source, target, **options) for every task. With more than one job the tasks are executed
+    on a process pool; log records of every file are collected in the worker and printed as one block.
+    '''
+    jobs = jobs or default_jobs()
+    if jobs <= 1 or len(tasks) <= 1:
+        results = [_run_inline(operation, task) for task in tasks]
+    else:
+        results = _run_pool(operation, tasks, min(jobs, len(tasks)))
+
+    log_summary(name, results)
+    return results
+
+
+def _run_inline(operation: callable, task: BatchTask) -> BatchResult:
+    ExtLogger.info(f'File: {LogTemplates.variable(task.source.name)}')
+    value = _call(operation, task)
+    return BatchResult(task, bool(value), value=_value(value))
+
+
+def _run_pool(operation: callable, tasks: list[BatchTask], jobs: int) -> list[BatchResult]:
+    from concurrent.futures import as_completed
+
+    ExtLogger.info(f'Processing {LogTemplates.variable(len(tasks))} files using {LogTemplates.variable(jobs)} jobs')
+    results = []
+    with executor(jobs) as pool:
+        futures = [pool.submit(execute, operation, task) for task in tasks]
+        for future in as_completed(futures):
+            result = future.result()
+            LogConfig.replay(result.records)
+            result.records = []
+            if result.metrics is not None:
+                profiling.ACTIVE.merge(result.metrics)
+                result.metrics = None
+            results.append(result)
+    return results
+
+
+def executor(jobs: int):
+    '''
+    Process pool whose workers capture their log records; tasks are submitted as execute(operation, task).
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+
+    from swd2.translator import compressor
+
+    initargs = (LogConfig.getLevel(), profiling.ACTIVE is not None, compressor.USE_MMAP)
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=initargs)
+
+
+def _init_worker(level: int, profile: bool = False, use_mmap: bool = True):
+    from swd2.translator import compressor
+
+    global _capture
+    _capture = LogConfig.capture(level)
+    compressor.USE_MMAP = use_mmap
+    if profile:
+        # logging in workers is only captured, its cost is measured when replayed
+        profiling.enable(timed_logging=False)
+
+
+def execute(operation: callable, task: BatchTask) -> BatchResult:
+    _capture.drain()
+    ExtLogger.info(f'File: {LogTemplates.variable(task.source.name)}')
+    value = _call(operation, task)
+    metrics = profiling.ACTIVE.drain() if profiling.ACTIVE is not None else None
+    return BatchResult(task, bool(value), _capture.drain(), metrics, _value(value))
+
+
+def _value(value):
+    return None if isinstance(value, bool) or value is None else value
+
+
+def _call(operation: callable, task: BatchTask):
+    try:
+        return operation(task.source, task.target, **task.options)
+    except Exception as err:
+        ExtLogger.error(f'Processing of file {LogTemplates.variable(task.source)} failed! {err}')
+        return False
+
+
+def log_summary(name: str, results: list[BatchResult]):
+    cmd_results = [result.to_cmd_result(name) for result in sorted(results, key=lambda r: str(r.task.source))]
+    commands.log_summary(name, cmd_results)
+    failed = sum(1 for result in results if not result.ok)
+    ExtLogger.info(f'Processed: {LogTemplates.variable(len(results))}, '
+                   f'succeeded: {LogTemplates.variable(len(results) - failed)}, '
+                   f'failed: {LogTemplates.variable(failed)}',
+                   fields={'stage': name, 'files': len(results), 'failed': failed})
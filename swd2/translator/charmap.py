@@ -0,0 +1,74 @@
+import bisect
+import functools
+import json
+from pathlib import Path
+
+from swd2.core.exttypes import ExtObject
+
+CHARMAPS_DIR = Path(__file__).parent / 'charmaps'
+DEFAULT_LOCALE = 'pl'
+
+
+class Charmap(ExtObject):
+    '''
+    Replaces characters missing in the game font by ones it can render. Translation tables are compiled once.
+    '''
+
+    def __init__(self, locale: str, version: int, mapping: dict, font: list):
+        self.locale = locale
+        self.version = version
+        self.mapping = mapping
+        self.font = sorted((start, end) for start, end in font)
+        self.table = str.maketrans(mapping)
+        self.reverse_table = str.maketrans({target: source for source, target in mapping.items()})
+        self._font_starts = [start for start, _ in self.font]
+
+    @property
+    def id(self) -> str:
+        return f'{self.locale}@{self.version}'
+
+    def translate(self, text: str) -> str:
+        return text.translate(self.table)
+
+    def reverse(self, text: str) -> str:
+        return text.translate(self.reverse_table)
+
+    def renders(self, char: str) -> bool:
+        code = ord(char)
+        index = bisect.bisect_right(self._font_starts, code) - 1
+        return index >= 0 and code <= self.font[index][1]
+
+    def unrenderable(self, chars) -> set:
+        '''
+        Returns characters the game font cannot render. Accepts text or a set of already collected characters.
+        '''
+        return {char for char in set(chars) if not self.renders(char)}
+
+    def __str__(self) -> str:
+        return self.id
+
+
+def resolve(name: str, base_dir: Path = None) -> str:
+    '''
+    Joins path of a *.json charmap to base_dir (working dir, as other path options); locale names are kept.
+    '''
+    if base_dir is None or Path(name).suffix != '.json':
+        return name
+    return str(Path(base_dir) / name)
+
+
+def available() -> list[str]:
+    return sorted(file.stem for file in CHARMAPS_DIR.glob('*.json'))
+
+
+@functools.lru_cache(maxsize=None)
+def load(name: str = DEFAULT_LOCALE) -> Charmap:
+    '''
+    Loads charmap by locale name (bundled in charmaps dir) or by path to json file. Cached per process.
+    '''
+    file = Path(name)
+    if file.suffix != '.json':
+        file = CHARMAPS_DIR / f'{name}.json'
+    with open(file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return Charmap(data['locale'], data['version'], data['mapping'], data['font'])
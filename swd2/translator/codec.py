@@ -0,0 +1,400 @@
+import codecs
+import io
+import itertools
+import os
+import zlib
+
+from swd2.core.exttypes import ExtObject
+from swd2.translator import charmap as charmaps
+from swd2.translator.charmap import Charmap
+
+HEADER_SIZE = 4
+CHUNK_SIZE = 256 * 1024
+WBITS = 15
+
+STRATEGIES = {
+    'default': zlib.Z_DEFAULT_STRATEGY,
+    'filtered': zlib.Z_FILTERED,
+    'huffman': zlib.Z_HUFFMAN_ONLY,
+    'rle': zlib.Z_RLE,
+    'fixed': zlib.Z_FIXED
+}
+
+
+class CompressionProfile(ExtObject):
+    '''
+    Deflate parameters. Window bits are fixed, the game reads only zlib streams with a 32K window.
+    '''
+
+    def __init__(self, name: str, level: int = 9, mem_level: int = zlib.DEF_MEM_LEVEL, strategy: str = 'default'):
+        self.name = name
+        self.level = level
+        self.mem_level = mem_level
+        self.strategy = strategy
+
+    def settings(self) -> dict:
+        '''
+        Compression settings that influence the bytes produced by compress, recorded in the build manifest.
+        '''
+        return {'level': self.level, 'mem_level': self.mem_level, 'strategy': self.strategy, 'wbits': WBITS}
+
+    def compressobj(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, WBITS, self.mem_level, STRATEGIES[self.strategy])
+
+    @staticmethod
+    def of_settings(settings: dict, name: str = 'custom') -> 'CompressionProfile':
+        return CompressionProfile(name, settings['level'], settings['mem_level'], settings['strategy'])
+
+    def __str__(self) -> str:
+        return f'{self.name}(level={self.level}, mem_level={self.mem_level}, strategy={self.strategy})'
+
+
+FAST = CompressionProfile('fast', level=1)
+RELEASE = CompressionProfile('release', level=9)
+PROFILES = {profile.name: profile for profile in [FAST, RELEASE]}
+
+
+def resolve_profile(name: str = RELEASE.name, level: int = None, mem_level: int = None, strategy: str = None) -> CompressionProfile:
+    '''
+    Resolves named profile, any explicitly given parameter turns it into a custom one.
+    '''
+    base = PROFILES.get(name, RELEASE)
+    if level is None and mem_level is None and strategy is None and name in PROFILES:
+        return base
+    return CompressionProfile(
+        'custom',
+        level=base.level if level is None else level,
+        mem_level=base.mem_level if mem_level is None else mem_level,
+        strategy=base.strategy if strategy is None else strategy
+    )
+
+
+class CodecError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class CompressedFileError(CodecError):
+    '''
+    Missing header, corrupted or truncated zlib stream, size not matching the header or data after the stream.
+    '''
+
+
+class SourceEncodingError(CodecError):
+    '''
+    Content is not valid utf-8.
+    '''
+
+
+class TextTranslator:
+    '''
+    Applies translation table to chunks of utf-8 bytes, characters split between chunks are handled.
+    '''
+
+    def __init__(self, translation_table: dict, characters: set = None):
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.translation_table = translation_table
+        # when given, collects all produced characters (e.g. to check them against the game font)
+        self.characters = characters
+
+    def feed(self, chunk) -> bytes:
+        return self._translate(self.decoder.decode(chunk))
+
+    def finish(self) -> bytes:
+        return self._translate(self.decoder.decode(b'', final=True))
+
+    def _translate(self, text: str) -> bytes:
+        text = text.translate(self.translation_table)
+        if self.characters is not None:
+            self.characters.update(text)
+        return text.encode('utf-8')
+
+
+class StreamEncoder:
+    '''
+    Translates utf-8 text and deflates it chunk by chunk. Counts the produced uncompressed bytes for the size header.
+    '''
+
+    def __init__(self, translation_table: dict, profile: CompressionProfile = RELEASE, characters: set = None):
+        self.translator = TextTranslator(translation_table, characters)
+        self.compressor = profile.compressobj()
+        self.size = 0
+
+    def feed(self, chunk) -> bytes:
+        return self._compress(self.translator.feed(chunk))
+
+    def feed_text(self, text: str) -> bytes:
+        '''
+        Same as feed for already decoded text (e.g. shared by encoders of several locales).
+        '''
+        return self._compress(self.translator._translate(text))
+
+    def finish(self) -> bytes:
+        return self._compress(self.translator.finish()) + self.compressor.flush()
+
+    def header(self) -> bytes:
+        return self.size.to_bytes(HEADER_SIZE, 'little')
+
+    def _compress(self, data: bytes) -> bytes:
+        self.size += len(data)
+        return self.compressor.compress(data)
+
+
+class StreamDecoder:
+    '''
+    Inflates the zlib stream chunk by chunk, never producing more than CHUNK_SIZE bytes at once.
+    '''
+
+    def __init__(self, expected_size: int):
+        self.decompressor = zlib.decompressobj()
+        self.expected_size = expected_size
+        self.size = 0
+
+    def feed(self, chunk):
+        data = self.decompressor.decompress(chunk, CHUNK_SIZE)
+        while data:
+            self.size += len(data)
+            yield data
+            data = self.decompressor.decompress(self.decompressor.unconsumed_tail, CHUNK_SIZE)
+
+    def finish(self) -> bytes:
+        data = self.decompressor.flush()
+        self.size += len(data)
+        return data
+
+    def violation(self) -> str:
+        if not self.decompressor.eof:
+            return 'Compressed stream is truncated'
+        if self.size != self.expected_size:
+            return f'Header declares {self.expected_size} bytes but stream produced {self.size} bytes'
+        if self.decompressor.unused_data:
+            return f'Unexpected {len(self.decompressor.unused_data)} bytes after compressed stream'
+        return None
+
+
+def iter_view(view: memoryview, size: int = CHUNK_SIZE):
+    for offset in range(0, len(view), size):
+        # released right after use, otherwise the mmap cannot be closed
+        with view[offset:offset + size] as chunk:
+            yield chunk
+
+
+class VectoredWriter:
+    '''
+    Gathers output buffers and writes them with a single os.writev call instead of concatenating them.
+    Falls back to sequential writes where writev is not available (Windows) or f is not an unbuffered file.
+    '''
+    MAX_BUFFERS = 512
+
+    def __init__(self, f, limit: int = CHUNK_SIZE):
+        self.f = f
+        self.limit = limit
+        self.buffers = []
+        self.pending = 0
+        # writev bypasses buffers of the file object, so it is used only for raw files
+        self.fd = f.fileno() if hasattr(os, 'writev') and isinstance(f, io.FileIO) else None
+
+    def write(self, data):
+        if not data:
+            return
+        self.buffers.append(data)
+        self.pending += len(data)
+        if self.pending >= self.limit or len(self.buffers) >= self.MAX_BUFFERS:
+            self.flush()
+
+    def flush(self):
+        buffers = self.buffers
+        self.buffers = []
+        self.pending = 0
+        if self.fd is not None:
+            while buffers:
+                written = os.writev(self.fd, buffers)
+                while buffers and written >= len(buffers[0]):
+                    written -= len(buffers[0])
+                    buffers.pop(0)
+                if written:
+                    buffers[0] = memoryview(buffers[0])[written:]
+        else:
+            for data in buffers:
+                self.f.write(data)
+
+
+class CsvZWriter:
+    '''
+    Streaming writer of the *.csv.z format: utf-8 text written to it is translated by charmap, deflated and written
+    to binary file object f (default charmap when not given, as by compress). The size header is filled in on close,
+    by seeking back or, when f is not seekable, by holding the compressed output until then.
+    '''
+
+    def __init__(self, f, charmap: Charmap = None, profile: CompressionProfile = RELEASE, characters: set = None,
+                 encoder: StreamEncoder = None, sink: VectoredWriter = None):
+        self.f = f
+        # encoder and sink replace the default ones, e.g. by instrumented ones
+        self.encoder = encoder or StreamEncoder((charmap or charmaps.load()).table, profile, characters)
+        self.held = None if f.seekable() else []
+        self.start = f.tell() if self.held is None else None
+        self.sink = sink or VectoredWriter(f)
+        self.closed = False
+        self._emit(bytes(HEADER_SIZE))
+
+    @property
+    def size(self) -> int:
+        return self.encoder.size
+
+    def write(self, data) -> int:
+        self._emit(self._encode(self.encoder.feed, data))
+        return len(data)
+
+    def write_text(self, text: str) -> int:
+        self._emit(self.encoder.feed_text(text))
+        return len(text)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._emit(self._encode(lambda _: self.encoder.finish(), b''))
+        if self.held is None:
+            self.sink.flush()
+            end = self.f.seek(0, io.SEEK_CUR)
+            self.f.seek(self.start)
+            self.f.write(self.encoder.header())
+            self.f.seek(end)
+        else:
+            self.held[0] = self.encoder.header()
+            for data in self.held:
+                self.f.write(data)
+            self.held = None
+
+    def _encode(self, function, data) -> bytes:
+        try:
+            return function(data)
+        except UnicodeDecodeError as err:
+            raise SourceEncodingError(f'Content is not valid utf-8: {err}') from err
+
+    def _emit(self, data):
+        if self.held is not None:
+            self.held.append(data)
+        else:
+            self.sink.write(data)
+
+    def __enter__(self) -> 'CsvZWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.closed = True
+
+
+class CsvZReader(io.RawIOBase):
+    '''
+    Readable stream of decompressed content of *.csv.z bytes or binary file object. Header is checked when the end
+    is reached.
+    '''
+
+    def __init__(self, f):
+        super().__init__()
+        self.f = io.BytesIO(f) if isinstance(f, (bytes, bytearray, memoryview)) else f
+        header = self.f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            self.f.close()
+            raise CompressedFileError('Missing header')
+        self.decoder = StreamDecoder(int.from_bytes(header, 'little'))
+        self.outputs = self._outputs()
+        self.pending = b''
+        self.offset = 0
+
+    def _outputs(self):
+        try:
+            for chunk in iter(lambda: self.f.read(CHUNK_SIZE), b''):
+                yield from self.decoder.feed(chunk)
+            yield self.decoder.finish()
+        except zlib.error as err:
+            raise CompressedFileError(f'Corrupted stream: {err}') from err
+        violation = self.decoder.violation()
+        if violation is not None:
+            raise CompressedFileError(violation)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self.offset >= len(self.pending):
+            self.pending = next(self.outputs, None)
+            self.offset = 0
+            if self.pending is None:
+                self.pending = b''
+                return 0
+        size = min(len(buffer), len(self.pending) - self.offset)
+        buffer[:size] = self.pending[self.offset:self.offset + size]
+        self.offset += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.f.close()
+        super().close()
+
+
+def iter_decoded(data, charmap: Charmap = None, decoder_type=StreamDecoder):
+    '''
+    Yields decompressed content of *.csv.z bytes (or memoryview of a mapped file) chunk by chunk, reverse mapping
+    of charmap is applied when given. decoder_type is called with the size declared in the header.
+    '''
+    with memoryview(data) as view:
+        yield from iter_decoded_chunks(iter_view(view), charmap, decoder_type)
+
+
+def iter_decoded_chunks(chunks, charmap: Charmap = None, decoder_type=StreamDecoder):
+    '''
+    Same as iter_decoded for *.csv.z content given as chunks of bytes, e.g. buffered reads of a file.
+    '''
+    chunks = iter(chunks)
+    header = b''
+    body = b''
+    for chunk in chunks:
+        needed = HEADER_SIZE - len(header)
+        header += bytes(chunk[:needed])
+        if len(header) == HEADER_SIZE:
+            # copied, slices of a mapped file must not outlive the chunk
+            body = bytes(chunk[needed:])
+            break
+    if len(header) < HEADER_SIZE:
+        raise CompressedFileError('Missing header')
+    decoder = decoder_type(int.from_bytes(header, 'little'))
+    reverse = TextTranslator(charmap.reverse_table) if charmap is not None else None
+    try:
+        for chunk in itertools.chain((body,), chunks):
+            for output in decoder.feed(chunk):
+                yield reverse.feed(output) if reverse else output
+        output = decoder.finish()
+        yield reverse.feed(output) + reverse.finish() if reverse else output
+    except zlib.error as err:
+        raise CompressedFileError(f'Corrupted stream: {err}') from err
+    except UnicodeDecodeError as err:
+        raise SourceEncodingError(f'Content is not valid utf-8: {err}') from err
+    violation = decoder.violation()
+    if violation is not None:
+        raise CompressedFileError(violation)
+
+
+def encode_csv_z(data, charmap: Charmap = None, profile: CompressionProfile = RELEASE, characters: set = None) -> bytes:
+    '''
+    Compresses utf-8 csv content to the *.csv.z format: size header followed by the zlib stream. Characters are
+    replaced by charmap, the default one when not given.
+    '''
+    output = io.BytesIO()
+    with CsvZWriter(output, charmap, profile, characters) as writer, memoryview(data) as view:
+        for chunk in iter_view(view):
+            writer.write(chunk)
+    return output.getvalue()
+
+
+def decode_csv_z(data, charmap: Charmap = None) -> bytes:
+    '''
+    Decompresses *.csv.z content, when charmap is given its reverse mapping is applied.
+    '''
+    return b''.join(iter_decoded(data, charmap))
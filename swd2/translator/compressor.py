@@ -1,8 +1,23 @@
+import filecmp
+import functools
+import io
+import mmap
 import os
-import zlib
+import stat as stat_module
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+from swd2.core import profiling
 from swd2.core.extlogging import LogTemplates, ExtLogger
+from swd2.translator import charmap as charmaps
+from swd2.translator.charmap import Charmap
+# in-memory format layer, re-exported for the file level API below
+from swd2.translator.codec import (HEADER_SIZE, CHUNK_SIZE, STRATEGIES, CompressionProfile, FAST, RELEASE, PROFILES,
+                                   resolve_profile, CodecError, CompressedFileError, SourceEncodingError, TextTranslator,
+                                   StreamEncoder, StreamDecoder, iter_view, VectoredWriter, CsvZWriter, CsvZReader,
+                                   iter_decoded, iter_decoded_chunks)
+
 
 def check_files(source_file:Path, target_file:Path, overwrite:bool) -> bool:
     input_violation = check_source_file(source_file)
@@ -15,97 +30,273 @@ def check_files(source_file:Path, target_file:Path, overwrite:bool) -> bool:
         return False
     return True
 
+
+def stat(file: Path) -> os.stat_result:
+    '''
+    Returns os.stat of file or None when it does not exist. Checks below use a single stat call per path.
+    '''
+    try:
+        return os.stat(file)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _identity() -> tuple:
+    return os.geteuid(), set(os.getgroups()) | {os.getegid()}
+
+
+def permitted(file_stat: os.stat_result, write: bool) -> bool:
+    '''
+    Permission check from already fetched stat (like os.access, without another system call).
+    '''
+    if not hasattr(os, 'geteuid'):
+        return not write or bool(file_stat.st_mode & stat_module.S_IWRITE)
+    uid, groups = _identity()
+    if uid == 0:
+        return True
+    if file_stat.st_uid == uid:
+        mask = stat_module.S_IWUSR if write else stat_module.S_IRUSR
+    elif file_stat.st_gid in groups:
+        mask = stat_module.S_IWGRP if write else stat_module.S_IRGRP
+    else:
+        mask = stat_module.S_IWOTH if write else stat_module.S_IROTH
+    return bool(file_stat.st_mode & mask)
+
+
 def check_source_file(file:Path) -> str:
-    if not file.exists():
+    return check_source_stat(file, stat(file))
+
+
+def check_source_stat(file: Path, file_stat: os.stat_result) -> str:
+    if file_stat is None:
         return f'Source not exists: {LogTemplates.variable(file)} !'
-    elif not file.is_file():
+    elif not stat_module.S_ISREG(file_stat.st_mode):
         return f'It is not a file: {LogTemplates.variable(file)} !'
-    elif not os.access(file, os.W_OK):
+    elif not permitted(file_stat, write=False):
         return f'No permission to source file: {LogTemplates.variable(file)} !'
     else:
-        return None;
+        return None
 
 
 def check_target_file(file:Path, overwrite:bool) -> str:
-    if file.exists():
-        if not overwrite:
-            return f'Target already exists and cannot be overwritten: {LogTemplates.variable(file)} !'
-        elif not file.is_file():
-            return f'It is not a file: {LogTemplates.variable(file)} !'
-        elif not os.access(file, os.W_OK):
-            return f'No permission to target file: {LogTemplates.variable(file)} !'
-    else:
-        return None;
+    return check_target_stat(file, stat(file), overwrite)
+
+
+def check_target_stat(file: Path, file_stat: os.stat_result, overwrite: bool) -> str:
+    if file_stat is None:
+        return None
+    elif not overwrite:
+        return f'Target already exists and cannot be overwritten: {LogTemplates.variable(file)} !'
+    elif not stat_module.S_ISREG(file_stat.st_mode):
+        return f'It is not a file: {LogTemplates.variable(file)} !'
+    elif not permitted(file_stat, write=True):
+        return f'No permission to target file: {LogTemplates.variable(file)} !'
+    return None
+
+
+# Mapped files are read without copying, but when another process truncates a mapped file, touching the lost pages
+# kills the process with SIGBUS. Long-running processes (watch, serve) turn it off and read files into buffers.
+USE_MMAP = True
+
+
+@contextmanager
+def open_view(file: Path):
+    '''
+    Yields a read-only memoryview of the file content. The file is memory mapped, so slices are passed to zlib without
+    copying, or read into memory when USE_MMAP is off.
+    '''
+    with open(file, 'rb') as f:
+        if not USE_MMAP or os.fstat(f.fileno()).st_size == 0:
+            with memoryview(f.read()) as view:
+                yield view
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                yield view
+
+
+@contextmanager
+def open_chunks(file: Path):
+    '''
+    Yields iterator of CHUNK_SIZE chunks of the file content: slices of the mapped file or, when USE_MMAP is off,
+    buffered reads.
+    '''
+    if USE_MMAP:
+        with open_view(file) as view:
+            yield iter_view(view)
+        return
+    with open(file, 'rb') as f:
+        yield iter(lambda: f.read(CHUNK_SIZE), b'')
+
+
+class ProfiledStreamEncoder(StreamEncoder):
+    '''
+    StreamEncoder recording time and bytes of reading (utf-8 decoding touches the mapped pages first),
+    translation and deflate. Used only when profiling is on, so the plain encoder has no timing overhead.
+    '''
 
+    def __init__(self, translation_table: dict, profile: CompressionProfile, characters: set, profiler: profiling.Profiler):
+        super().__init__(translation_table, profile, characters)
+        self.profiler = profiler
 
-def decompress(input_file: Path, output_file: Path, overwrite: bool = False):
+    def feed(self, chunk) -> bytes:
+        return self._profiled(chunk, False)
+
+    def finish(self) -> bytes:
+        return self._profiled(b'', True)
+
+    def _profiled(self, chunk, final: bool) -> bytes:
+        started = time.perf_counter_ns()
+        text = self.translator.decoder.decode(chunk, final)
+        decoded = time.perf_counter_ns()
+        data = self.translator._translate(text)
+        translated = time.perf_counter_ns()
+        compressed = self._compress(data)
+        if final:
+            compressed += self.compressor.flush()
+        self.profiler.add('read', decoded - started, len(chunk))
+        self.profiler.add('translate', translated - decoded, len(data))
+        self.profiler.add('deflate', time.perf_counter_ns() - translated, len(data))
+        return compressed
+
+
+class ProfiledStreamDecoder(StreamDecoder):
+    def __init__(self, expected_size: int, profiler: profiling.Profiler):
+        super().__init__(expected_size)
+        self.profiler = profiler
+
+    def feed(self, chunk):
+        started = time.perf_counter_ns()
+        for data in super().feed(chunk):
+            self.profiler.add('inflate', time.perf_counter_ns() - started, len(data))
+            yield data
+            started = time.perf_counter_ns()
+
+
+class ProfiledVectoredWriter(VectoredWriter):
+    def __init__(self, f, profiler: profiling.Profiler, limit: int = CHUNK_SIZE):
+        super().__init__(f, limit)
+        self.profiler = profiler
+
+    def flush(self):
+        started = time.perf_counter_ns()
+        size = self.pending
+        super().flush()
+        self.profiler.add('write', time.perf_counter_ns() - started, size)
+
+
+def replace_if_changed(temp_file: Path, target_file: Path) -> bool:
+    '''
+    Moves temp_file to target_file unless target already has the same content. Returns True when target was written.
+    '''
+    if target_file.is_file() and filecmp.cmp(temp_file, target_file, shallow=False):
+        temp_file.unlink()
+        return False
+    os.replace(temp_file, target_file)
+    return True
+
+
+def open_text(file: Path) -> io.TextIOWrapper:
+    '''
+    Opens *.csv or compressed *.csv.z / *.z file as utf-8 text stream suitable for the csv module.
+    '''
+    if file.suffix == '.z':
+        return io.TextIOWrapper(io.BufferedReader(CsvZReader(open(file, 'rb')), CHUNK_SIZE), encoding='utf-8', newline='')
+    return open(file, 'r', encoding='utf-8', newline='')
+
+
+def decompress(input_file: Path, output_file: Path, overwrite: bool = False, charmap: Charmap = None) -> bool:
+    '''
+    Decompresses *.csv.z, when charmap is given its reverse mapping is applied to the output.
+    '''
     if not check_files(input_file, output_file, overwrite):
         ExtLogger.error(f'Decompression of file {LogTemplates.variable(input_file)} failed!')
-        return
+        return False
 
+    # a corrupted input must not leave a partial target or destroy the existing one
+    temp_file = output_file.with_name(f'{output_file.name}.tmp')
     try:
         ExtLogger.info(f'Reading source file: {LogTemplates.variable(input_file)}')
-        with open(input_file, 'rb') as f:
-            compressed_data = f.read()
-
-        # Skip the custom header (first 4 bytes) and decompress the rest
-        decompressed_data = zlib.decompress(compressed_data[4:])
+        profiler = profiling.ACTIVE
+        started = time.perf_counter()
+        decoder_type = StreamDecoder if profiler is None else functools.partial(ProfiledStreamDecoder, profiler=profiler)
+        size = 0
+        with open_chunks(input_file) as chunks:
+            ExtLogger.info(f'Write decompressed file: {LogTemplates.variable(output_file)}')
+            with open(temp_file, 'wb', buffering=0) as dst:
+                writer = VectoredWriter(dst) if profiler is None else ProfiledVectoredWriter(dst, profiler)
+                for data in iter_decoded_chunks(chunks, charmap, decoder_type):
+                    size += len(data)
+                    writer.write(data)
+                writer.flush()
+        os.replace(temp_file, output_file)
 
-        ExtLogger.info(f'Write decompressed file: {LogTemplates.variable(output_file)}')
-        with open(output_file, 'wb') as f:
-            f.write(decompressed_data)
-        ExtLogger.info(f'Decompression completed. Output file: {LogTemplates.variable(output_file)}')
+        duration = time.perf_counter() - started
+        if profiler is not None:
+            profiler.file(duration, size)
+        ExtLogger.info(f'Decompression completed. Output file: {LogTemplates.variable(output_file)}',
+                       fields={'stage': 'decompress', 'file': input_file.name, 'path': str(output_file),
+                               'bytes': size, 'duration': round(duration, 4)})
+        return True
     except FileNotFoundError:
         ExtLogger.error(f'Decompression failed! File not exists: {LogTemplates.variable(input_file)} !')
     except PermissionError:
         ExtLogger.error(f'Decompression failed! Lack permission to source file: {LogTemplates.variable(input_file)} !')
+    except CodecError as err:
+        ExtLogger.error(f'Decompression failed! {err.message}: {LogTemplates.variable(input_file)} !')
+    finally:
+        temp_file.unlink(missing_ok=True)
+    return False
 
 
-def compress(input_file: Path, output_file: Path, overwrite: bool = False):
+def compress(input_file: Path, output_file: Path, overwrite: bool = False, profile: CompressionProfile = RELEASE,
+             charmap: Charmap = None) -> bool:
     if not check_files(input_file, output_file, overwrite):
         ExtLogger.error(f'Compression of file {LogTemplates.variable(input_file)} failed!')
-        return
+        return False
 
+    temp_file = output_file.with_name(f'{output_file.name}.tmp')
     try:
-        mapping = {
-            'ą': 'à',
-            'Ą': 'À',
-            'ę': 'è',
-            'Ę': 'È',
-            'ż': 'å',
-            'Ż': 'Å',
-            'ź': 'á',
-            'Ź': 'Á',
-            'ń': 'ñ',
-            'Ń': 'Ñ',
-            'ć': 'é',
-            'Ć': 'É',
-            'ś': 'ö',
-            'Ś': 'Ö',
-            'Ł': 'Г'
-        }
-        translation_table = str.maketrans(mapping)
+        charmap = charmap or charmaps.load()
+        characters = set()
+        profiler = profiling.ACTIVE
+        started = time.perf_counter()
+        if profiler is None:
+            encoder = StreamEncoder(charmap.table, profile, characters)
+        else:
+            encoder = ProfiledStreamEncoder(charmap.table, profile, characters, profiler)
 
         ExtLogger.info(f'Reading source file: {LogTemplates.variable(input_file)}')
-        with open(input_file, 'rb') as f:
-            content = f.read()
-
-        text = content.decode("utf-8")
-        translated_text = text.translate(translation_table)
-        modified_content = translated_text.encode("utf-8")
-
-        compressor = zlib.compressobj(9, zlib.DEFLATED, 15)
-        new_compressed = compressor.compress(modified_content)
-        new_compressed += compressor.flush()
-
-        new_header = len(modified_content).to_bytes(4, 'little')
-        new_file_data = new_header + new_compressed
-
-        ExtLogger.info(f'Writing target file: {LogTemplates.variable(input_file)}')
-        with open(output_file, "wb") as f:
-            f.write(new_file_data)
-        ExtLogger.info(f'Compression completed. Output file: {LogTemplates.variable(output_file)}')
+        ExtLogger.info(f'Writing target file: {LogTemplates.variable(output_file)} using profile {LogTemplates.variable(profile)}')
+        size = 0
+        with open_chunks(input_file) as chunks, open(temp_file, 'wb', buffering=0) as dst:
+            sink = None if profiler is None else ProfiledVectoredWriter(dst, profiler)
+            with CsvZWriter(dst, encoder=encoder, sink=sink) as writer:
+                for chunk in chunks:
+                    size += len(chunk)
+                    writer.write(chunk)
+        unrenderable = charmap.unrenderable(characters)
+        if unrenderable:
+            ExtLogger.warn(f'Characters not available in game font (charmap {LogTemplates.variable(charmap)}): '
+                           f'{LogTemplates.variable("".join(sorted(unrenderable)))} in {LogTemplates.variable(input_file)}')
+        replacing = time.perf_counter_ns()
+        if not replace_if_changed(temp_file, output_file):
+            ExtLogger.info(f'Target content unchanged, write skipped: {LogTemplates.variable(output_file)}')
+        duration = time.perf_counter() - started
+        if profiler is not None:
+            profiler.add('replace', time.perf_counter_ns() - replacing)
+            profiler.file(duration, size)
+        ExtLogger.info(f'Compression completed. Output file: {LogTemplates.variable(output_file)}',
+                       fields={'stage': 'compress', 'file': input_file.name, 'path': str(output_file),
+                               'bytes': size, 'duration': round(duration, 4)})
+        return True
     except FileNotFoundError:
         ExtLogger.error(f'Compression failed! Source file not exists: {LogTemplates.variable(input_file)} !')
     except PermissionError:
-        ExtLogger.error(f'Compression failed! Lack permission to source file: {LogTemplates.variable(input_file)} !')
\ No newline at end of file
+        ExtLogger.error(f'Compression failed! Lack permission to source file: {LogTemplates.variable(input_file)} !')
+    except SourceEncodingError as err:
+        ExtLogger.error(f'Compression failed! Source file {LogTemplates.variable(input_file)}: {err.message} !')
+    finally:
+        temp_file.unlink(missing_ok=True)
+    return False
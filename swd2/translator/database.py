@@ -0,0 +1,121 @@
+import csv
+import sqlite3
+import zlib
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+from swd2.translator import compressor
+from swd2.translator.charmap import Charmap
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    charmap TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    key TEXT NOT NULL,
+    "column" TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_file ON entries (file);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+    text, content='entries', content_rowid='id', tokenize='unicode61 remove_diacritics 0'
+);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+'''
+
+
+class Match(ExtObject):
+    def __init__(self, file: str, key: str, column: str, text: str):
+        self.file = file
+        self.key = key
+        self.column = column
+        self.text = text
+
+
+def connect(db_file: Path) -> sqlite3.Connection:
+    connection = sqlite3.connect(db_file)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def rows(file: Path, charmap: Charmap = None):
+    '''
+    Yields (key, column, text) of every non-empty cell; first row is the header, first column the key.
+    '''
+    with compressor.open_text(file) as text:
+        reader = csv.reader(text)
+        header = next(reader, [])
+        for row in reader:
+            if not row:
+                continue
+            key = row[0]
+            for index, value in enumerate(row[1:], start=1):
+                if value:
+                    column = header[index] if index < len(header) else str(index)
+                    yield key, column, charmap.reverse(value) if charmap else value
+
+
+def export(db_file: Path, files: list[Path], charmap: Charmap = None) -> tuple[int, int]:
+    '''
+    Imports changed files (by size and mtime) into database, entries of removed files are dropped.
+    Returns number of (imported, skipped) files.
+    '''
+    imported = 0
+    skipped = 0
+    charmap_id = charmap.id if charmap else None
+    with connect(db_file) as connection:
+        known = {file: (size, mtime_ns, known_charmap) for file, size, mtime_ns, known_charmap
+                 in connection.execute('SELECT file, size, mtime_ns, charmap FROM files')}
+        names = set()
+        for file in files:
+            names.add(file.name)
+            stat = file.stat()
+            if known.get(file.name) == (stat.st_size, stat.st_mtime_ns, charmap_id):
+                skipped += 1
+                continue
+            try:
+                entries = [(file.name, key, column, text) for key, column, text in rows(file, charmap)]
+            except (compressor.CompressedFileError, zlib.error, UnicodeDecodeError, csv.Error) as err:
+                ExtLogger.error(f'Export of file {LogTemplates.variable(file.name)} failed: {err}')
+                continue
+            connection.execute('DELETE FROM entries WHERE file = ?', (file.name,))
+            connection.executemany('INSERT INTO entries (file, key, "column", text) VALUES (?, ?, ?, ?)', entries)
+            connection.execute('INSERT OR REPLACE INTO files (file, size, mtime_ns, charmap) VALUES (?, ?, ?, ?)',
+                               (file.name, stat.st_size, stat.st_mtime_ns, charmap_id))
+            ExtLogger.info(f'Exported {LogTemplates.variable(len(entries))} entries of {LogTemplates.variable(file.name)}')
+            imported += 1
+
+        for removed in set(known) - names:
+            connection.execute('DELETE FROM entries WHERE file = ?', (removed,))
+            connection.execute('DELETE FROM files WHERE file = ?', (removed,))
+            ExtLogger.info(f'Removed entries of {LogTemplates.variable(removed)}')
+    return imported, skipped
+
+
+def search(db_file: Path, query: str, limit: int = 50, column: str = None, raw: bool = False) -> list[Match]:
+    '''
+    Full-text search, query is matched as a phrase unless raw (FTS5 query syntax) is requested.
+    '''
+    if not raw:
+        query = '"' + query.replace('"', '""') + '"'
+    sql = ('SELECT e.file, e.key, e."column", e.text FROM entries_fts f JOIN entries e ON e.id = f.rowid '
+           'WHERE entries_fts MATCH ?')
+    params = [query]
+    if column is not None:
+        sql += ' AND e."column" = ?'
+        params.append(column)
+    sql += ' ORDER BY f.rank LIMIT ?'
+    params.append(limit)
+    with connect(db_file) as connection:
+        return [Match(*row) for row in connection.execute(sql, params)]
@@ -0,0 +1,185 @@
+import csv
+import json
+import zlib
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+from swd2.translator import compressor, verifier
+
+DELTA_VERSION = 1
+EXTENSIONS = ('.csv', '.csv.z', '.z')
+READ_ERRORS = (OSError, compressor.CompressedFileError, zlib.error, UnicodeDecodeError, csv.Error)
+
+
+def source_files(directory: Path) -> dict:
+    '''
+    Language files of directory by their *.csv name; plain *.csv is preferred to a compressed file of the same name.
+    '''
+    files = {}
+    for ext in reversed(EXTENSIONS):
+        for file in directory.glob(f'*{ext}'):
+            files[verifier.source_name(file) if ext != '.csv' else file.name] = file
+    return dict(sorted(files.items()))
+
+
+def read_rows(file: Path):
+    '''
+    Yields header and then rows of csv or compressed csv file, empty lines are skipped.
+    '''
+    with compressor.open_text(file) as text:
+        for row in csv.reader(text):
+            if row:
+                yield row
+
+
+def index_rows(file: Path, columns: list[str] = None) -> tuple[list, dict]:
+    '''
+    Returns (header, key -> row). Only the given columns are kept in rows when columns are selected.
+    '''
+    rows = read_rows(file)
+    header = next(rows, [])
+    if columns is None:
+        return header, {row[0]: tuple(row) for row in rows}
+    indexes = [header.index(column) for column in columns]
+    return header, {row[0]: tuple(row[index] if index < len(row) else '' for index in indexes) for row in rows}
+
+
+class FileDelta(ExtObject):
+    def __init__(self, file: str, status: str, header: list = None):
+        self.file = file
+        self.status = status
+        self.header = header
+        self.added = {}
+        self.removed = []
+        self.changed = {}
+
+    @property
+    def modified(self) -> bool:
+        return self.status != 'unchanged'
+
+
+def _columns(header: list, row) -> dict:
+    return {column: row[index] if index < len(row) else '' for index, column in enumerate(header)}
+
+
+def diff_file(name: str, old_file: Path, new_file: Path) -> FileDelta:
+    '''
+    Old rows are indexed by key, new rows are streamed against the index, so each file is read once.
+    '''
+    if new_file is None:
+        return FileDelta(name, 'removed')
+    old_header, old_rows = index_rows(old_file) if old_file is not None else ([], {})
+    rows = read_rows(new_file)
+    header = next(rows, [])
+    delta = FileDelta(name, 'added' if old_file is None else 'unchanged', header)
+    for row in rows:
+        old = old_rows.pop(row[0], None)
+        if old is None:
+            delta.added[row[0]] = _columns(header, row)
+        elif old != tuple(row) or old_header != header:
+            old_columns = _columns(old_header, old)
+            changes = {column: [old_columns.get(column), value] for column, value in _columns(header, row).items()
+                       if old_columns.get(column) != value}
+            if changes:
+                delta.changed[row[0]] = changes
+    delta.removed = list(old_rows)
+    if old_file is not None and (delta.added or delta.removed or delta.changed or old_header != header):
+        delta.status = 'changed'
+    return delta
+
+
+def diff(old_dir: Path, new_dir: Path) -> list[FileDelta]:
+    old_files = source_files(old_dir)
+    new_files = source_files(new_dir)
+    deltas = []
+    for name in sorted(old_files.keys() | new_files.keys()):
+        try:
+            delta = diff_file(name, old_files.get(name), new_files.get(name))
+        except READ_ERRORS as err:
+            ExtLogger.error(f'Diff of file {LogTemplates.variable(name)} failed: {err}')
+            delta = FileDelta(name, 'error')
+        if delta.modified:
+            ExtLogger.info(f'{LogTemplates.variable(name)} {delta.status}: added {LogTemplates.variable(len(delta.added))}, '
+                           f'removed {LogTemplates.variable(len(delta.removed))}, changed {LogTemplates.variable(len(delta.changed))}')
+        deltas.append(delta)
+    return deltas
+
+
+def save(deltas: list[FileDelta], old_dir: Path, new_dir: Path, output_file: Path):
+    data = {
+        'version': DELTA_VERSION,
+        'old': str(old_dir),
+        'new': str(new_dir),
+        'files': {delta.file: {'status': delta.status, 'added': delta.added, 'removed': delta.removed, 'changed': delta.changed}
+                  for delta in deltas if delta.modified},
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+
+
+class MergeResult(ExtObject):
+    def __init__(self, file: str, applied: int = 0, missing: int = 0, stale: int = 0):
+        self.file = file
+        self.applied = applied
+        self.missing = missing
+        self.stale = stale
+
+
+def merge_file(translated_file: Path, new_file: Path, output_file: Path, columns: list[str],
+               source_column: str = None) -> MergeResult:
+    '''
+    Copies translated columns onto rows of new file by key. Only translated columns are indexed,
+    the new file is streamed into the output. Translations whose source_column text differs in new file
+    are stale and not applied.
+    '''
+    indexed = list(columns) + ([source_column] if source_column else [])
+    _, translations = index_rows(translated_file, indexed)
+    result = MergeResult(output_file.name)
+    temp_file = output_file.with_name(f'{output_file.name}.tmp')
+    try:
+        rows = read_rows(new_file)
+        header = next(rows, [])
+        targets = [header.index(column) for column in columns]
+        source_index = header.index(source_column) if source_column else None
+        with open(temp_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in rows:
+                translation = translations.get(row[0])
+                if translation is None:
+                    result.missing += 1
+                elif source_index is not None and translation[-1] != row[source_index]:
+                    result.stale += 1
+                else:
+                    row += [''] * (len(header) - len(row))
+                    for index, value in zip(targets, translation):
+                        if value:
+                            row[index] = value
+                    result.applied += 1
+                writer.writerow(row)
+        compressor.replace_if_changed(temp_file, output_file)
+    finally:
+        temp_file.unlink(missing_ok=True)
+    return result
+
+
+def merge(translated_dir: Path, new_dir: Path, out_dir: Path, columns: list[str], source_column: str = None) -> list[MergeResult]:
+    translated_files = source_files(translated_dir)
+    results = []
+    for name, new_file in source_files(new_dir).items():
+        if name not in translated_files:
+            ExtLogger.warn(f'No translation for {LogTemplates.variable(name)}, skipped')
+            continue
+        try:
+            result = merge_file(translated_files[name], new_file, out_dir / name, columns, source_column)
+        except READ_ERRORS as err:
+            ExtLogger.error(f'Merge of file {LogTemplates.variable(name)} failed: {err}')
+            continue
+        except ValueError as err:
+            ExtLogger.error(f'Merge of file {LogTemplates.variable(name)} failed, missing column: {err}')
+            continue
+        ExtLogger.info(f'{LogTemplates.variable(name)}: applied {LogTemplates.variable(result.applied)}, '
+                       f'untranslated {LogTemplates.variable(result.missing)}, stale {LogTemplates.variable(result.stale)}')
+        results.append(result)
+    return results
@@ -0,0 +1,117 @@
+import json
+import os
+import statistics
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+from swd2.translator.compressor import HEADER_SIZE
+
+# deflate cannot expand data more than about 1032 times
+MAX_RATIO = 1032
+OUTLIER_IQR = 1.5
+
+
+class FileInfo(ExtObject):
+    def __init__(self, path: str, compressed: int, uncompressed: int, violation: str = None):
+        self.path = path
+        self.compressed = compressed
+        self.uncompressed = uncompressed
+        self.violation = violation
+
+    @property
+    def ratio(self) -> float:
+        return self.uncompressed / self.compressed if self.compressed else 0.0
+
+
+def find(directory: Path, ext: str, recursive: bool = False) -> list:
+    '''
+    Returns os.DirEntry of matching files, the size comes from the same scandir pass.
+    '''
+    found = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(ext):
+                found.append(entry)
+            elif recursive and entry.is_dir(follow_symlinks=False):
+                found.extend(find(Path(entry.path), ext, recursive))
+    return found
+
+
+def read_info(entry: os.DirEntry, root: Path) -> FileInfo:
+    '''
+    Reads only the size header, the content is not decompressed.
+    '''
+    path = os.path.relpath(entry.path, root)
+    try:
+        size = entry.stat().st_size
+        with open(entry.path, 'rb', buffering=0) as f:
+            header = f.read(HEADER_SIZE)
+    except OSError as err:
+        return FileInfo(path, 0, 0, f'Cannot read: {err}')
+    if len(header) < HEADER_SIZE:
+        return FileInfo(path, size, 0, 'Missing header')
+    info = FileInfo(path, size, int.from_bytes(header, 'little'))
+    if info.ratio > MAX_RATIO:
+        info.violation = f'Declared size {info.uncompressed} is not possible for {size} compressed bytes'
+    return info
+
+
+def scan(directory: Path, ext: str = '.csv.z', recursive: bool = False, jobs: int = 1) -> list[FileInfo]:
+    entries = find(directory, ext, recursive)
+    if jobs > 1 and len(entries) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            infos = list(pool.map(lambda entry: read_info(entry, directory), entries))
+    else:
+        infos = [read_info(entry, directory) for entry in entries]
+    return sorted(infos, key=lambda info: info.path)
+
+
+def outliers(infos: list[FileInfo]) -> list[FileInfo]:
+    '''
+    Files whose compression ratio lies outside OUTLIER_IQR interquartile ranges (Tukey's fences).
+    '''
+    ratios = [info.ratio for info in infos if info.violation is None]
+    if len(ratios) < 4:
+        return []
+    q1, _, q3 = statistics.quantiles(ratios, n=4)
+    low = q1 - OUTLIER_IQR * (q3 - q1)
+    high = q3 + OUTLIER_IQR * (q3 - q1)
+    return [info for info in infos if info.violation is None and not low <= info.ratio <= high]
+
+
+def report(infos: list[FileInfo]) -> dict:
+    valid = [info for info in infos if info.violation is None]
+    compressed = sum(info.compressed for info in valid)
+    uncompressed = sum(info.uncompressed for info in valid)
+    return {
+        'files': len(infos),
+        'compressed': compressed,
+        'uncompressed': uncompressed,
+        'ratio': round(uncompressed / compressed, 3) if compressed else 0,
+        'largest': max(valid, key=lambda info: info.uncompressed).path if valid else None,
+        'entries': [{'path': info.path, 'compressed': info.compressed, 'uncompressed': info.uncompressed,
+                     'ratio': round(info.ratio, 3), 'violation': info.violation} for info in infos],
+        'outliers': [info.path for info in outliers(infos)],
+        'invalid': [info.path for info in infos if info.violation is not None],
+    }
+
+
+def log_report(infos: list[FileInfo], data: dict, details: bool = True):
+    if details:
+        for info in infos:
+            if info.violation is None:
+                ExtLogger.info(f'{info.path:<40} {info.compressed:>12} {info.uncompressed:>12} {info.ratio:>8.2f}')
+    for info in infos:
+        if info.violation is not None:
+            ExtLogger.error(f'{LogTemplates.variable(info.path)}: {info.violation}')
+    for path in data['outliers']:
+        ExtLogger.warn(f'Unusual compression ratio: {LogTemplates.variable(path)}')
+    ExtLogger.info(f'Files: {LogTemplates.variable(data["files"])}, compressed: {LogTemplates.variable(data["compressed"])} B, '
+                   f'uncompressed: {LogTemplates.variable(data["uncompressed"])} B, ratio: {LogTemplates.variable(data["ratio"])}')
+
+
+def save(data: dict, file: Path):
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
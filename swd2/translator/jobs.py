@@ -0,0 +1,157 @@
+import json
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+from swd2.translator import batch, compressor, charmap as charmaps
+
+OPERATIONS = {
+    'compress': compressor.compress,
+    'decompress': compressor.decompress,
+}
+# options accepted in job files, besides operation, src and dst
+OPTIONS = {
+    'compress': {'overwrite', 'profile', 'level', 'mem_level', 'strategy', 'charmap'},
+    'decompress': {'overwrite', 'reverse_charmap'},
+}
+
+
+class Job(ExtObject):
+    def __init__(self, index: int, operation: str, source: Path, target: Path, options: dict):
+        self.index = index
+        self.operation = operation
+        self.source = source
+        self.target = target
+        self.options = options
+
+
+def load(file: Path) -> dict:
+    '''
+    Reads jobs file: *.toml or *.json with optional 'defaults' table and list of 'jobs'.
+    '''
+    if file.suffix == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError('*.toml jobs files need Python 3.11 or newer, use *.json') from None
+        with open(file, 'rb') as f:
+            return tomllib.load(f)
+    with open(file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse(data: dict, base_dir: Path) -> tuple[list[Job], list[str]]:
+    '''
+    Returns jobs with resolved options and violations of all invalid ones. Paths are relative to base_dir.
+    '''
+    if not isinstance(data, dict):
+        return [], [f'Jobs file must be a table with a list of jobs, got {type(data).__name__}']
+    defaults = data.get('defaults', {})
+    entries = data.get('jobs', [])
+    if not isinstance(defaults, dict):
+        return [], [f'defaults must be a table, got {type(defaults).__name__}']
+    if not isinstance(entries, list):
+        return [], [f'jobs must be a list of tables, got {type(entries).__name__}']
+    jobs = []
+    violations = []
+    for index, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            violations.append(f'Job {index}: must be a table, got {type(entry).__name__}')
+            continue
+        entry = {**defaults, **entry}
+        operation = entry.pop('operation', None)
+        source = entry.pop('src', None)
+        target = entry.pop('dst', None)
+        if operation not in OPERATIONS:
+            violations.append(f'Job {index}: unknown operation {LogTemplates.variable(operation)} (available: {", ".join(OPERATIONS)})')
+            continue
+        if not source or not target:
+            violations.append(f'Job {index}: both src and dst are required')
+            continue
+        unknown = set(entry) - OPTIONS[operation]
+        if unknown:
+            violations.append(f'Job {index}: unknown options of {operation}: {LogTemplates.variable(", ".join(sorted(unknown)))}')
+            continue
+        try:
+            jobs.append(Job(index, operation, base_dir / source, base_dir / target, _options(operation, entry, base_dir)))
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            violations.append(f'Job {index}: invalid options: {err}')
+    return jobs, violations
+
+
+def _options(operation: str, entry: dict, base_dir: Path) -> dict:
+    overwrite = entry.get('overwrite', False)
+    # 'overwrite = "false"' must not turn overwriting on
+    if not isinstance(overwrite, bool):
+        raise ValueError(f'overwrite must be true or false, got {overwrite!r}')
+    options = {'overwrite': overwrite}
+    if operation == 'compress':
+        # profiles and charmaps are resolved once and shared by all jobs with the same settings
+        options['profile'] = _profile(entry.get('profile', compressor.RELEASE.name), entry.get('level'), entry.get('mem_level'), entry.get('strategy'))
+        options['charmap'] = charmaps.load(charmaps.resolve(entry.get('charmap', charmaps.DEFAULT_LOCALE), base_dir))
+    elif entry.get('reverse_charmap'):
+        options['charmap'] = charmaps.load(charmaps.resolve(entry['reverse_charmap'], base_dir))
+    return options
+
+
+_profiles = {}
+
+
+def _check_range(option: str, value, minimum: int, maximum: int):
+    # bool is an int subclass, 'level = true' must not pass as level 1
+    if value is None:
+        return
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f'{option} must be an integer, got {value!r}')
+    if not minimum <= value <= maximum:
+        raise ValueError(f'{option} must be between {minimum} and {maximum}, got {value}')
+
+
+def _profile(name: str, level: int, mem_level: int, strategy: str) -> compressor.CompressionProfile:
+    _check_range('level', level, 0, 9)
+    _check_range('mem_level', mem_level, 1, 9)
+    key = (name, level, mem_level, strategy)
+    if key not in _profiles:
+        if name not in compressor.PROFILES:
+            raise ValueError(f'unknown profile {name}')
+        if strategy is not None and strategy not in compressor.STRATEGIES:
+            raise ValueError(f'unknown strategy {strategy}')
+        _profiles[key] = compressor.resolve_profile(name, level, mem_level, strategy)
+    return _profiles[key]
+
+
+def validate(jobs: list[Job]) -> list[str]:
+    '''
+    Checks all jobs before anything runs, every path is stat-ed once.
+    '''
+    stats = {}
+
+    def stat(file: Path):
+        if file not in stats:
+            stats[file] = compressor.stat(file)
+        return stats[file]
+
+    violations = []
+    targets = {}
+    for job in jobs:
+        violation = compressor.check_source_stat(job.source, stat(job.source))
+        if violation is None:
+            violation = compressor.check_target_stat(job.target, stat(job.target), job.options['overwrite'])
+        if violation is None and job.target in targets:
+            violation = f'Target {LogTemplates.variable(job.target)} is also written by job {targets[job.target]}'
+        targets.setdefault(job.target, job.index)
+        if violation is not None:
+            violations.append(f'Job {job.index} ({job.operation}): {violation}')
+    return violations
+
+
+def execute(source: Path, target: Path, operation: str, **options) -> bool:
+    return OPERATIONS[operation](source, target, **options)
+
+
+def run(jobs: list[Job], jobs_count: int = 1) -> list[batch.BatchResult]:
+    for directory in {job.target.parent for job in jobs}:
+        directory.mkdir(parents=True, exist_ok=True)
+    tasks = [batch.BatchTask(job.source, job.target, {'operation': job.operation, **job.options}) for job in jobs]
+    ExtLogger.info(f'Running {LogTemplates.variable(len(tasks))} jobs')
+    return batch.run('run-jobs', execute, tasks, jobs_count)
@@ -0,0 +1,263 @@
+import csv
+import io
+import time
+from pathlib import Path
+
+from swd2.core import profiling
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+from swd2.translator import batch, compressor
+from swd2.translator.charmap import Charmap
+from swd2.translator.codec import CHUNK_SIZE, CompressionProfile, CsvZWriter, SourceEncodingError
+from swd2.translator.manifest import BuildManifest, Fingerprint, MANIFEST_NAME, fingerprint
+
+
+class LocaleTarget(ExtObject):
+    '''
+    Output of one locale: charmap, compression profile and optionally columns (in order) kept in its files.
+    '''
+
+    def __init__(self, locale: str, out_dir: Path, charmap: Charmap, profile: CompressionProfile, columns: list = None):
+        self.locale = locale
+        self.out_dir = out_dir
+        self.charmap = charmap
+        self.profile = profile
+        self.columns = columns
+
+    def settings(self) -> dict:
+        settings = self.profile.settings()
+        return {**settings, 'columns': self.columns} if self.columns else settings
+
+    def target(self, source: Path) -> Path:
+        return (self.out_dir / source.stem).with_suffix('.z')
+
+
+class LocaleResults(ExtObject):
+    '''
+    Locales a source was compressed for; true when none failed.
+    '''
+
+    def __init__(self, written: list = None, failed: list = None, fingerprint: Fingerprint = None):
+        self.written = written if written is not None else []
+        self.failed = failed if failed is not None else []
+        # of the source before it was read
+        self.fingerprint = fingerprint
+
+    def __bool__(self) -> bool:
+        return not self.failed
+
+
+def parse_assignments(values, option: str) -> dict:
+    '''
+    Parses LOCALE=VALUE items of a per-locale option.
+    '''
+    assignments = {}
+    for value in values:
+        locale, _, assigned = value.partition('=')
+        if not locale or not assigned:
+            raise ValueError(f'{option} must be LOCALE=VALUE: {value}')
+        assignments[locale] = assigned
+    return assignments
+
+
+class LocaleOutput:
+    '''
+    Temporary target of one locale written while the source is read. Rows of a locale selecting columns are
+    written by csv.writer to this object, which buffers them for the compressed writer.
+    '''
+
+    def __init__(self, locale: LocaleTarget, source: Path):
+        self.locale = locale
+        self.target = locale.target(source)
+        self.temp_file = self.target.with_name(f'{self.target.name}.tmp')
+        self.characters = set()
+        self.file = open(self.temp_file, 'wb', buffering=0)
+        self.writer = CsvZWriter(self.file, locale.charmap, locale.profile, self.characters)
+        self.indexes = None
+        self.rows = None
+        self.pending = []
+        self.pending_size = 0
+
+    def write_text(self, text: str):
+        self.writer.write_text(text)
+
+    def write_row(self, row: list, line_terminator: str):
+        if self.indexes is None:
+            missing = [column for column in self.locale.columns if column not in row]
+            if missing:
+                raise ValueError(f'Columns not found: {", ".join(missing)}')
+            self.indexes = [row.index(column) for column in self.locale.columns]
+            self.rows = csv.writer(self, lineterminator=line_terminator)
+        self.rows.writerow([row[index] if index < len(row) else '' for index in self.indexes])
+
+    def write(self, text: str):
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.writer.write_text(''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def close(self):
+        if self.locale.columns and self.indexes is None:
+            raise ValueError(f'Columns not found: {", ".join(self.locale.columns)}')
+        self.flush()
+        self.writer.close()
+        self.file.close()
+
+    def commit(self, source: Path):
+        unrenderable = self.locale.charmap.unrenderable(self.characters)
+        if unrenderable:
+            ExtLogger.warn(f'Characters not available in game font (charmap {LogTemplates.variable(self.locale.charmap)}): '
+                           f'{LogTemplates.variable("".join(sorted(unrenderable)))} in {LogTemplates.variable(source)}')
+        if not compressor.replace_if_changed(self.temp_file, self.target):
+            ExtLogger.info(f'Target content unchanged, write skipped: {LogTemplates.variable(self.target)}')
+
+    def discard(self):
+        self.file.close()
+        self.temp_file.unlink(missing_ok=True)
+
+
+def _lines(text, outputs: list[LocaleOutput], terminators: list):
+    '''
+    Yields lines of text for csv.reader and writes them in blocks to outputs keeping the whole text.
+    The line terminator of the first line is appended to terminators.
+    '''
+    block = []
+    size = 0
+    for line in text:
+        if not terminators:
+            terminators.append('\r\n' if line.endswith('\r\n') else '\n')
+        block.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            _write_text(outputs, ''.join(block))
+            block = []
+            size = 0
+        yield line
+    if block:
+        _write_text(outputs, ''.join(block))
+
+
+def _write_text(outputs: list[LocaleOutput], text: str):
+    for output in outputs:
+        output.write_text(text)
+
+
+def compress_locales(source: Path, out_dir: Path, locales: list[LocaleTarget], overwrite: bool = False) -> LocaleResults:
+    '''
+    Reads and decodes source once (and parses it once when any locale selects columns), chunks are translated
+    and compressed for every locale while reading. Outputs of all locales are written at the same time.
+    '''
+    results = LocaleResults()
+    violation = compressor.check_source_file(source)
+    if violation is not None:
+        ExtLogger.error(violation)
+        results.failed = [locale.locale for locale in locales]
+        return results
+
+    def fail(output: LocaleOutput, err):
+        ExtLogger.error(f'Compression of file {LogTemplates.variable(source)} for locale {LogTemplates.variable(output.locale.locale)} failed! {err}')
+        results.failed.append(output.locale.locale)
+        output.discard()
+
+    outputs = []
+    for locale in locales:
+        violation = compressor.check_target_file(locale.target(source), overwrite)
+        try:
+            if violation is not None:
+                raise ValueError(violation)
+            outputs.append(LocaleOutput(locale, source))
+            ExtLogger.info(f'Writing target file: {LogTemplates.variable(outputs[-1].target)} using profile {LogTemplates.variable(locale.profile)}')
+        except (OSError, ValueError) as err:
+            ExtLogger.error(f'Compression of file {LogTemplates.variable(source)} for locale {LogTemplates.variable(locale.locale)} failed! {err}')
+            results.failed.append(locale.locale)
+
+    started = time.perf_counter()
+    size = 0
+    try:
+        # fingerprint for the build manifest is taken before reading, a change saved meanwhile is compressed next time
+        results.fingerprint = fingerprint(source)
+        ExtLogger.info(f'Reading source file: {LogTemplates.variable(source)}')
+        with open(source, 'rb') as f, io.TextIOWrapper(f, encoding='utf-8', newline='') as text:
+            plain = [output for output in outputs if not output.locale.columns]
+            selecting = [output for output in outputs if output.locale.columns]
+            if not selecting:
+                for chunk in iter(lambda: text.read(CHUNK_SIZE), ''):
+                    _write_text(plain, chunk)
+            else:
+                terminators = []
+                for row in csv.reader(_lines(text, plain, terminators)):
+                    for output in list(selecting):
+                        try:
+                            output.write_row(row, terminators[0])
+                        except ValueError as err:
+                            selecting.remove(output)
+                            outputs.remove(output)
+                            fail(output, err)
+            size = f.tell()
+    except (OSError, csv.Error, UnicodeDecodeError) as err:
+        if isinstance(err, UnicodeDecodeError):
+            err = SourceEncodingError(f'Content is not valid utf-8: {err}')
+        ExtLogger.error(f'Compression failed! Source file {LogTemplates.variable(source)}: {err} !')
+        for output in outputs:
+            output.discard()
+        results.failed = [locale.locale for locale in locales]
+        return results
+
+    for output in outputs:
+        try:
+            output.close()
+            output.commit(source)
+            results.written.append(output.locale.locale)
+        except (OSError, ValueError) as err:
+            fail(output, err)
+        finally:
+            output.temp_file.unlink(missing_ok=True)
+
+    duration = time.perf_counter() - started
+    if profiling.ACTIVE is not None:
+        profiling.ACTIVE.file(duration, size)
+    ExtLogger.info(f'Compression completed for locales: {LogTemplates.variable(", ".join(results.written))}',
+                   fields={'stage': 'compress', 'file': source.name, 'path': str(out_dir), 'locales': results.written,
+                           'duration': round(duration, 4)})
+    return results
+
+
+def build(sources: list[Path], out_dir: Path, locales: list[LocaleTarget], force: bool, jobs: int, no_cache: bool = False,
+          manifest_name: str = MANIFEST_NAME) -> list:
+    '''
+    Compresses sources for all locales, each into its own dir with its own manifest. A source is read only by the task
+    of locales whose outputs are not up to date.
+    '''
+    manifests = {}
+    for locale in locales:
+        locale.out_dir.mkdir(parents=True, exist_ok=True)
+        manifests[locale.locale] = BuildManifest(locale.out_dir / manifest_name) if no_cache else BuildManifest.load(locale.out_dir, manifest_name)
+
+    tasks = []
+    for file in sources:
+        stale = [locale for locale in locales
+                 if not manifests[locale.locale].is_up_to_date(file, locale.target(file), locale.charmap.id, locale.settings())]
+        if stale:
+            tasks.append(batch.BatchTask(file, out_dir, {'locales': stale, 'overwrite': force}))
+        else:
+            ExtLogger.debug(f'Unchanged, skipped: {LogTemplates.variable(file.name)}')
+    if len(tasks) < len(sources):
+        ExtLogger.info(f'Skipped unchanged files: {LogTemplates.variable(len(sources) - len(tasks))}')
+
+    results = batch.run('compress', compress_locales, tasks, jobs)
+    for result in results:
+        written = result.value.written if isinstance(result.value, LocaleResults) else []
+        for locale in result.task.options['locales']:
+            if locale.locale in written:
+                manifests[locale.locale].update(result.task.source, locale.target(result.task.source), locale.charmap.id, locale.settings(),
+                                                result.value.fingerprint)
+    for manifest in manifests.values():
+        manifest.retain(sources)
+        manifest.save()
+    return results
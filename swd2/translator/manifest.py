@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+
+MANIFEST_NAME = '.swd2-manifest.json'
+MANIFEST_VERSION = 2
+# manifest written by one shard of a sharded build, combined by merge
+PARTIAL_NAME = '.swd2-manifest-{index}-of-{count}.json'
+
+
+def content_hash(file: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Fingerprint(ExtObject):
+    def __init__(self, size: int, mtime_ns: int, hash: str):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.hash = hash
+
+
+def fingerprint(source: Path) -> Fingerprint:
+    stat = source.stat()
+    return Fingerprint(stat.st_size, stat.st_mtime_ns, content_hash(source))
+
+
+class ManifestEntry(ExtObject):
+    def __init__(self, size: int, mtime_ns: int, hash: str, charmap_version: str, settings: dict, target: str):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.hash = hash
+        self.charmap_version = charmap_version
+        self.settings = settings
+        self.target = target
+
+
+class BuildManifest:
+    '''
+    Remembers fingerprints of already compressed sources, stored in the output dir.
+    A source is up to date when its size, mtime (or content hash) and the build settings did not change
+    and its target still exists.
+    '''
+
+    def __init__(self, path: Path, entries: dict = None, tuned: dict = None, measurements: dict = None):
+        self.path = path
+        self.entries = entries if entries is not None else {}
+        # best compression settings per source found by autotune, '*' holds the best overall
+        self.tuned = tuned if tuned is not None else {}
+        # size and seconds of every autotune candidate per source, the tuned settings were picked from them
+        self.measurements = measurements if measurements is not None else {}
+
+    @staticmethod
+    def load(out_dir: Path, name: str = MANIFEST_NAME) -> 'BuildManifest':
+        path = out_dir / name
+        if not path.is_file():
+            return BuildManifest(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                ExtLogger.warn(f'Build manifest version changed, cache discarded: {LogTemplates.variable(path)}')
+                return BuildManifest(path)
+            entries = {name: ManifestEntry(**entry) for name, entry in data['entries'].items()}
+            return BuildManifest(path, entries, data.get('tuned', {}), data.get('measurements', {}))
+        except (ValueError, KeyError, TypeError) as err:
+            ExtLogger.warn(f'Build manifest is corrupted, cache discarded: {LogTemplates.variable(path)} ({err})')
+            return BuildManifest(path)
+
+    @staticmethod
+    def merge(out_dir: Path) -> 'BuildManifest':
+        '''
+        Combines manifests written by shards of a build into the manifest of out_dir (not saved).
+        '''
+        merged = BuildManifest.load(out_dir)
+        for path in sorted(out_dir.glob(PARTIAL_NAME.format(index='*', count='*'))):
+            partial = BuildManifest.load(out_dir, path.name)
+            merged.entries.update(partial.entries)
+            merged.tuned.update(partial.tuned)
+            merged.measurements.update(partial.measurements)
+        return merged
+
+    def save(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'entries': {name: vars(entry) for name, entry in sorted(self.entries.items())},
+            'tuned': dict(sorted(self.tuned.items())),
+            'measurements': dict(sorted(self.measurements.items()))
+        }
+        temp_path = self.path.with_name(f'{self.path.name}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(temp_path, self.path)
+
+    def is_up_to_date(self, source: Path, target: Path, charmap_version: str, settings: dict) -> bool:
+        entry = self.entries.get(source.name)
+        if entry is None or entry.target != target.name:
+            return False
+        if entry.charmap_version != charmap_version or entry.settings != settings:
+            return False
+        if not target.is_file():
+            return False
+
+        stat = source.stat()
+        if stat.st_size != entry.size:
+            return False
+        if stat.st_mtime_ns == entry.mtime_ns:
+            return True
+
+        # touched but maybe not modified
+        if content_hash(source) != entry.hash:
+            return False
+        entry.mtime_ns = stat.st_mtime_ns
+        return True
+
+    def update(self, source: Path, target: Path, charmap_version: str, settings: dict, source_fingerprint: Fingerprint = None):
+        '''
+        Records source as compressed. source_fingerprint should be taken before the source was read, otherwise
+        a change saved during compression would be recorded as already compressed.
+        '''
+        if source_fingerprint is None:
+            source_fingerprint = fingerprint(source)
+        self.entries[source.name] = ManifestEntry(
+            size=source_fingerprint.size,
+            mtime_ns=source_fingerprint.mtime_ns,
+            hash=source_fingerprint.hash,
+            charmap_version=charmap_version,
+            settings=settings,
+            target=target.name
+        )
+
+    def tuned_settings(self, source: Path) -> dict:
+        return self.tuned.get(source.name, self.tuned.get('*'))
+
+    def retain(self, sources: list[Path]):
+        names = {source.name for source in sources}
+        for name in [name for name in self.entries if name not in names]:
+            del self.entries[name]
+        for name in [name for name in self.tuned if name != '*' and name not in names]:
+            del self.tuned[name]
+        for name in [name for name in self.measurements if name not in names]:
+            del self.measurements[name]
@@ -0,0 +1,190 @@
+import collections
+import contextlib
+import csv
+import heapq
+import json
+import math
+import os
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+from swd2.translator import differ
+
+MEMORY_NAME = '.swd2-memory.json'
+MEMORY_VERSION = 2
+GRAM_SIZE = 3
+# posting entries counted per query and best counted candidates scored exactly
+CANDIDATE_BUDGET = 2048
+VERIFIED_CANDIDATES = 64
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.lower().split())
+
+
+def grams(text: str) -> frozenset:
+    padded = f' {normalize(text)} '
+    return frozenset(padded[index:index + GRAM_SIZE] for index in range(max(1, len(padded) - GRAM_SIZE + 1)))
+
+
+class Suggestion(ExtObject):
+    def __init__(self, score: float, source: str, target: str):
+        self.score = score
+        self.source = source
+        self.target = target
+
+
+class TranslationMemory:
+    '''
+    Pairs (source text, translation) of translated files, stored in a json file with per-file fingerprints,
+    so only changed files are read again. Trigram inverted index is saved along, it is rebuilt only when files changed.
+    '''
+
+    def __init__(self, path: Path, source_column: str, target_column: str, files: dict = None, index: dict = None):
+        self.path = path
+        self.source_column = source_column
+        self.target_column = target_column
+        self.files = files if files is not None else {}
+        self._postings = None
+        self._grams = {}
+        if index is not None:
+            self._sources = index['sources']
+            self._targets = index['targets']
+            self._postings = index['postings']
+
+    @staticmethod
+    def load(path: Path, source_column: str, target_column: str) -> 'TranslationMemory':
+        if not path.is_file():
+            return TranslationMemory(path, source_column, target_column)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != MEMORY_VERSION or data['columns'] != [source_column, target_column]:
+                ExtLogger.warn(f'Translation memory version or columns changed, rebuilding: {LogTemplates.variable(path)}')
+                return TranslationMemory(path, source_column, target_column)
+            return TranslationMemory(path, source_column, target_column, data['files'], data['index'])
+        except (ValueError, KeyError, TypeError) as err:
+            ExtLogger.warn(f'Translation memory is corrupted, rebuilding: {LogTemplates.variable(path)} ({err})')
+            return TranslationMemory(path, source_column, target_column)
+
+    def save(self):
+        if self._postings is None:
+            self._build()
+        index = {'sources': self._sources, 'targets': self._targets, 'postings': self._postings}
+        temp = self.path.with_name(f'{self.path.name}.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'version': MEMORY_VERSION, 'columns': [self.source_column, self.target_column], 'files': self.files,
+                       'index': index}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp, self.path)
+
+    def update(self, directory: Path) -> int:
+        '''
+        Reads translated files of directory changed since the last update, entries of removed files are dropped.
+        Returns number of changed files.
+        '''
+        sources = differ.source_files(directory)
+        updated = 0
+        for name, file in sources.items():
+            stat = file.stat()
+            known = self.files.get(name)
+            if known is not None and (known['size'], known['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            try:
+                _, rows = differ.index_rows(file, [self.source_column, self.target_column])
+            except differ.READ_ERRORS as err:
+                ExtLogger.warn(f'Skipped {LogTemplates.variable(name)}, read failed: {err}')
+                continue
+            except ValueError as err:
+                ExtLogger.warn(f'Skipped {LogTemplates.variable(name)}, missing column: {err}')
+                continue
+            entries = [[source, target] for source, target in rows.values() if source and target]
+            self.files[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'entries': entries}
+            ExtLogger.debug(f'Translation memory updated with {LogTemplates.variable(len(entries))} entries of {LogTemplates.variable(name)}')
+            updated += 1
+        for name in set(self.files) - set(sources):
+            del self.files[name]
+            updated += 1
+        if updated:
+            self._postings = None
+        return updated
+
+    def _build(self):
+        translations = {}
+        for data in self.files.values():
+            for source, target in data['entries']:
+                translations.setdefault(source, target)
+        self._sources = list(translations)
+        self._targets = list(translations.values())
+        self._grams = {}
+        self._postings = {}
+        for entry, source in enumerate(self._sources):
+            for gram in grams(source):
+                self._postings.setdefault(gram, []).append(entry)
+
+    def _entry_grams(self, entry: int) -> frozenset:
+        if entry not in self._grams:
+            self._grams[entry] = grams(self._sources[entry])
+        return self._grams[entry]
+
+    def __len__(self) -> int:
+        if self._postings is None:
+            self._build()
+        return len(self._sources)
+
+    def suggest(self, text: str, top: int = 3, min_score: float = 0.5) -> list[Suggestion]:
+        '''
+        Returns top translations of sources most similar to text (Dice coefficient of character trigrams).
+        Candidates sharing the rarest trigrams are counted (prefix filtering: a match with min_score must share
+        at least one of them) within CANDIDATE_BUDGET postings, the best counted ones are scored exactly.
+        '''
+        if self._postings is None:
+            self._build()
+        query = grams(text)
+        required = math.ceil(min_score * len(query) / (2 - min_score)) if min_score > 0 else 1
+        postings = sorted((self._postings[gram] for gram in query if gram in self._postings), key=len)
+        counts = collections.Counter()
+        counted = 0
+        for entries in postings[:max(1, len(query) - required + 1)]:
+            if counted and counted + len(entries) > CANDIDATE_BUDGET:
+                break
+            counts.update(entries)
+            counted += len(entries)
+        scored = []
+        for entry, _ in counts.most_common(VERIFIED_CANDIDATES):
+            entry_grams = self._entry_grams(entry)
+            score = 2 * len(query & entry_grams) / (len(query) + len(entry_grams))
+            if score >= min_score:
+                scored.append((score, entry))
+        return [Suggestion(round(score, 3), self._sources[entry], self._targets[entry]) for score, entry in heapq.nlargest(top, scored)]
+
+    def suggest_file(self, file: Path, top: int = 3, min_score: float = 0.5, output_file: Path = None) -> tuple[int, dict]:
+        '''
+        Suggests translations for rows with empty target column. When output_file is given, rows are also written there
+        with the best suggestion filled in. Returns (number of untranslated rows, key -> suggestions).
+        '''
+        rows = differ.read_rows(file)
+        header = next(rows, [])
+        if self.source_column not in header or self.target_column not in header:
+            ExtLogger.warn(f'Skipped {LogTemplates.variable(file.name)}, missing {LogTemplates.variable(self.source_column)} '
+                           f'or {LogTemplates.variable(self.target_column)} column')
+            return 0, {}
+        source_index = header.index(self.source_column)
+        target_index = header.index(self.target_column)
+        queries = 0
+        suggestions = {}
+        with open(output_file, 'w', encoding='utf-8', newline='') if output_file else contextlib.nullcontext() as f:
+            writer = csv.writer(f) if f else None
+            if writer:
+                writer.writerow(header)
+            for row in rows:
+                row += [''] * (len(header) - len(row))
+                if row[source_index] and not row[target_index]:
+                    queries += 1
+                    found = self.suggest(row[source_index], top, min_score)
+                    if found:
+                        suggestions[row[0]] = found
+                        row[target_index] = found[0].target
+                if writer:
+                    writer.writerow(row)
+        return queries, suggestions
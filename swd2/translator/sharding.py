@@ -0,0 +1,183 @@
+import hashlib
+import heapq
+import json
+import socket
+import time
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+
+SHARD_REPORT = '.swd2-shard-{command}-{index}-of-{count}.json'
+REPORT_VERSION = 2
+# per-file cost (opening, logging, replacing) expressed in bytes of content, so shards of tiny files stay balanced too
+FILE_WEIGHT = 8 * 1024
+MB = 1024 * 1024
+
+
+class Shard(ExtObject):
+    def __init__(self, index: int, count: int):
+        self.index = index
+        self.count = count
+
+    def __str__(self) -> str:
+        return f'{self.index}/{self.count}'
+
+
+def parse(value: str) -> Shard:
+    '''
+    Parses K/N, shards are numbered from 1.
+    '''
+    index, _, count = value.partition('/')
+    if not index.isdigit() or not count.isdigit() or not 1 <= int(index) <= int(count):
+        raise ValueError(f'Shard must be K/N with 1 <= K <= N: {value}')
+    return Shard(int(index), int(count))
+
+
+def relative(file: Path, root: Path) -> str:
+    try:
+        return file.relative_to(root).as_posix()
+    except ValueError:
+        return file.as_posix()
+
+
+def _size(file: Path) -> int:
+    try:
+        return file.stat().st_size
+    except OSError:
+        return 0
+
+
+def partition(files: list[Path], root: Path, count: int) -> list[list[Path]]:
+    '''
+    Splits files into count shards of about the same total size: the largest files are placed first, each into
+    the least loaded shard, equal sizes are ordered by hash of the relative path. The split depends only on
+    relative paths and sizes, so every machine seeing the same tree computes the same one.
+    '''
+    weighted = sorted(((_size(file) + FILE_WEIGHT, hashlib.blake2b(relative(file, root).encode('utf-8'), digest_size=8).digest(), file)
+                       for file in files), key=lambda item: (-item[0], item[1]))
+    loads = [(0, index) for index in range(count)]
+    shards = [[] for _ in range(count)]
+    for weight, _, file in weighted:
+        load, index = heapq.heappop(loads)
+        shards[index].append(file)
+        heapq.heappush(loads, (load + weight, index))
+    return [sorted(shard) for shard in shards]
+
+
+def select(files: list[Path], root: Path, shard: Shard) -> list[Path]:
+    selected = partition(files, root, shard.count)[shard.index - 1]
+    size = sum(_size(file) for file in selected)
+    total = sum(_size(file) for file in files)
+    ExtLogger.info(f'Shard {LogTemplates.variable(shard)}: {LogTemplates.variable(len(selected))} of {LogTemplates.variable(len(files))} files, '
+                   f'{LogTemplates.variable(f"{size / MB:.1f}")} of {LogTemplates.variable(f"{total / MB:.1f}")} MB',
+                   fields={'stage': 'shard', 'shard': shard.index, 'shards': shard.count, 'files': len(selected), 'bytes': size})
+    return selected
+
+
+def save_report(directory: Path, command: str, shard: Shard, sources: list[Path], results: list, root: Path, started: float,
+                all_files: list[Path]) -> Path:
+    '''
+    Writes partial report of one shard: status of every file of the shard (ok, failed or unchanged when skipped)
+    and all files the split was computed from, so merge can tell files processed by no shard.
+    '''
+    statuses = {relative(source, root): 'unchanged' for source in sources}
+    for result in results:
+        statuses[relative(result.task.source, root)] = 'ok' if result.ok else 'failed'
+    data = {
+        'version': REPORT_VERSION,
+        'command': command,
+        'shard': shard.index,
+        'shards': shard.count,
+        'host': socket.gethostname(),
+        'elapsed_s': round(time.perf_counter() - started, 3),
+        'bytes': sum(_size(source) for source in sources),
+        'files': dict(sorted(statuses.items())),
+        'all_files': sorted(relative(file, root) for file in all_files),
+    }
+    file = directory / SHARD_REPORT.format(command=command, index=shard.index, count=shard.count)
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1)
+    ExtLogger.info(f'Shard report saved to {LogTemplates.variable(file)}')
+    return file
+
+
+def merge(directory: Path) -> dict:
+    '''
+    Combines partial reports of all shards found in directory into one build report, per command.
+    '''
+    partials = {}
+    for file in sorted(directory.glob(SHARD_REPORT.format(command='*', index='*', count='*'))):
+        try:
+            with open(file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != REPORT_VERSION:
+                raise ValueError(f'unsupported version {data.get("version")}')
+            partials.setdefault(data['command'], []).append(data)
+        except (ValueError, KeyError, TypeError, OSError) as err:
+            ExtLogger.warn(f'Skipped shard report {LogTemplates.variable(file.name)}: {err}')
+
+    commands = {}
+    for command, reports in sorted(partials.items()):
+        count = max(report['shards'] for report in reports)
+        # reports of an older split with a different number of shards are ignored
+        stale = [report for report in reports if report['shards'] != count]
+        reports = sorted((report for report in reports if report['shards'] == count), key=lambda report: report['shard'])
+        files = {}
+        duplicates = set()
+        for report in reports:
+            for path, status in report['files'].items():
+                if path in files:
+                    duplicates.add(path)
+                files[path] = status
+        completed = [report['shard'] for report in reports]
+        missing = [index for index in range(1, count + 1) if index not in completed]
+        failed = sorted(path for path, status in files.items() if status == 'failed')
+        # files seen by any shard when splitting; differing lists mean the tree changed between shard runs
+        expected = set().union(*(report['all_files'] for report in reports))
+        unprocessed = sorted(expected - set(files))
+        commands[command] = {
+            'ok': not missing and not failed and not duplicates and not unprocessed,
+            'shards': count,
+            'completed': completed,
+            'missing': missing,
+            'stale_reports': len(stale),
+            'files': len(files),
+            'succeeded': sum(1 for status in files.values() if status == 'ok'),
+            'unchanged': sum(1 for status in files.values() if status == 'unchanged'),
+            'failed': failed,
+            'duplicates': sorted(duplicates),
+            'unprocessed': unprocessed,
+            'split_changed': any(report['all_files'] != reports[0]['all_files'] for report in reports),
+            'bytes': sum(report['bytes'] for report in reports),
+            'elapsed_s': max((report['elapsed_s'] for report in reports), default=0),
+            'shard_elapsed_s': {report['shard']: report['elapsed_s'] for report in reports},
+            'hosts': {report['shard']: report['host'] for report in reports},
+        }
+    return {'version': REPORT_VERSION, 'ok': all(data['ok'] for data in commands.values()) and bool(commands), 'commands': commands}
+
+
+def log_report(report: dict):
+    for command, data in report['commands'].items():
+        ExtLogger.info(f'{command}: {LogTemplates.variable(len(data["completed"]))} of {LogTemplates.variable(data["shards"])} shards, '
+                       f'files: {LogTemplates.variable(data["files"])}, succeeded: {LogTemplates.variable(data["succeeded"])}, '
+                       f'unchanged: {LogTemplates.variable(data["unchanged"])}, failed: {LogTemplates.variable(len(data["failed"]))}, '
+                       f'slowest shard: {LogTemplates.variable(data["elapsed_s"])}s',
+                       fields={'stage': 'merge-shards', 'command': command, 'files': data['files'], 'failed': len(data['failed'])})
+        if data['missing']:
+            ExtLogger.error(f'{command}: missing shards {LogTemplates.variable(", ".join(map(str, data["missing"])))}')
+        for path in data['failed']:
+            ExtLogger.error(f'{command}: failed {LogTemplates.variable(path)}')
+        for path in data['duplicates']:
+            ExtLogger.error(f'{command}: processed by more than one shard {LogTemplates.variable(path)}')
+        for path in data['unprocessed']:
+            ExtLogger.error(f'{command}: processed by no shard {LogTemplates.variable(path)}')
+        if data['split_changed']:
+            ExtLogger.warn(f'{command}: files changed between shard runs, shards were split differently')
+    if not report['commands']:
+        ExtLogger.error('No shard reports found')
+
+
+def save(report: dict, file: Path):
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
@@ -1,7 +1,68 @@
+import time
+
 import click
 from swd2.swd2_cli import cli, stored_config, Swd2Config
 from swd2.core.extlogging import ExtLogger, LogTemplates, LogLevel
-from swd2.translator import compressor
+from swd2.translator import compressor, batch, charmap as charmaps
+from swd2.translator import manifest as manifests
+from swd2.translator.manifest import BuildManifest, MANIFEST_NAME, PARTIAL_NAME
+
+TUNED_PROFILE = 'tuned'
+
+
+def compression_options(profiles: list[str]):
+    def decorator(f):
+        f = click.option('--strategy', type=click.Choice(list(compressor.STRATEGIES)), help="Deflate strategy (custom profile)")(f)
+        f = click.option('--mem-level', type=click.IntRange(1, 9), help="Deflate memory level (custom profile)")(f)
+        f = click.option('--level', type=click.IntRange(0, 9), help="Deflate level (custom profile)")(f)
+        f = click.option('--profile', type=click.Choice(profiles), default=compressor.RELEASE.name, show_default=True, help="Compression profile")(f)
+        return f
+    return decorator
+
+
+def load_charmap(ctx, param, value):
+    if value is None:
+        return None
+    config = ctx.find_object(Swd2Config) if ctx is not None else None
+    try:
+        return charmaps.load(charmaps.resolve(value, config.working_dir if config is not None else None))
+    except (OSError, ValueError, KeyError) as err:
+        raise click.BadParameter(f'Cannot load charmap {value} (available: {", ".join(charmaps.available())}): {err}')
+
+
+def charmap_option(name: str, default: str = None, help: str = "Charmap locale or path to *.json file"):
+    return click.option(name, 'charmap', help=help, default=default, show_default=default is not None, callback=load_charmap)
+
+
+def load_shard(ctx, param, value):
+    if value is None:
+        return None
+    from swd2.translator import sharding
+    try:
+        return sharding.parse(value)
+    except ValueError as err:
+        raise click.BadParameter(str(err))
+
+
+def shard_option(f):
+    return click.option('--shard',
+                        help="Process only shard K of N (e.g. 2/4), files are split by size, the same way on every machine",
+                        callback=load_shard
+                        )(f)
+
+
+def select_shard(sources: list, config: Swd2Config, shard) -> list:
+    if shard is None:
+        return sources
+    from swd2.translator import sharding
+    return sharding.select(sources, config.working_dir, shard)
+
+
+def save_shard_report(directory, command: str, shard, sources: list, results: list, config: Swd2Config, started: float,
+                      all_files: list):
+    if shard is not None:
+        from swd2.translator import sharding
+        sharding.save_report(directory, command, shard, sources, results, config.working_dir, started, all_files)
 
 
 @cli.group()
@@ -27,12 +88,13 @@ def translator(config):
               is_flag=True,
               help="Force overwrite file"
               )
+@charmap_option('--reverse-charmap', help="Apply reverse mapping of charmap (locale or *.json file) to output")
 @stored_config
-def decompress(config: Swd2Config, src: str, dst: str, force: bool):
+def decompress(config: Swd2Config, src: str, dst: str, force: bool, charmap: charmaps.Charmap):
     '''
     Decompress *.csv.z to *.csv
     '''
-    compressor.decompress(config.working_dir / src, config.working_dir / dst, force)
+    compressor.decompress(config.working_dir / src, config.working_dir / dst, force, charmap)
 
 
 @translator.command()
@@ -49,12 +111,16 @@ def decompress(config: Swd2Config, src: str, dst: str, force: bool):
               is_flag=True,
               help="Force overwrite file"
               )
+@compression_options(list(compressor.PROFILES))
+@charmap_option('--charmap', default=charmaps.DEFAULT_LOCALE)
 @stored_config
-def compress(config: Swd2Config, src: str, dst: str, force: bool):
+def compress(config: Swd2Config, src: str, dst: str, force: bool, profile: str, level: int, mem_level: int, strategy: str,
+             charmap: charmaps.Charmap):
     '''
     Compress *.csv to *.csv.z
     '''
-    compressor.compress(config.working_dir / src, config.working_dir / dst, force)
+    compressor.compress(config.working_dir / src, config.working_dir / dst, force,
+                        compressor.resolve_profile(profile, level, mem_level, strategy), charmap)
 
 
 @translator.command()
@@ -72,16 +138,29 @@ def compress(config: Swd2Config, src: str, dst: str, force: bool):
               is_flag=True,
               help="Force overwrite file"
               )
+@click.option('--jobs',
+              type=click.IntRange(min=1),
+              help="Number of parallel jobs (default: CPU count)",
+              default=batch.default_jobs
+              )
+@charmap_option('--reverse-charmap', help="Apply reverse mapping of charmap (locale or *.json file) to output")
+@shard_option
 @stored_config
-def decompress_all(config: Swd2Config, ext:str, dst: str, force: bool):
+@click.pass_context
+def decompress_all(ctx, config: Swd2Config, ext:str, dst: str, force: bool, jobs: int, charmap: charmaps.Charmap, shard):
     '''
     Decompress all files *.csv.z to *.csv
     '''
+    started = time.perf_counter()
     outDir = config.working_dir / dst
     outDir.mkdir(parents=True, exist_ok=True)
-    for file in config.working_dir.glob(f"*{ext}"):
-        ExtLogger.info(f'File: {LogTemplates.variable(file.name)}')
-        compressor.decompress(file, outDir / file.stem, force)
+    all_sources = sorted(config.working_dir.glob(f"*{ext}"))
+    sources = select_shard(all_sources, config, shard)
+    tasks = [batch.BatchTask(file, outDir / file.stem, {'overwrite': force, 'charmap': charmap}) for file in sources]
+    results = batch.run('decompress', compressor.decompress, tasks, jobs)
+    save_shard_report(outDir, 'decompress', shard, sources, results, config, started, all_sources)
+    if any(not result.ok for result in results):
+        ctx.exit(1)
 
 
 @translator.command()
@@ -99,13 +178,677 @@ def decompress_all(config: Swd2Config, ext:str, dst: str, force: bool):
               is_flag=True,
               help="Force overwrite file"
               )
+@click.option('--jobs',
+              type=click.IntRange(min=1),
+              help="Number of parallel jobs (default: CPU count)",
+              default=batch.default_jobs
+              )
+@click.option('--no-cache',
+              is_flag=True,
+              help="Ignore build manifest and compress all files"
+              )
+@compression_options(list(compressor.PROFILES) + [TUNED_PROFILE])
+@click.option('--autotune', 'run_autotune',
+              is_flag=True,
+              help="Find the best compression settings per file, store them in the build manifest and use them"
+              )
+@click.option('--autotune-sample',
+              type=click.IntRange(min=1),
+              help="Number of (largest) files tuned, others use the best overall settings",
+              default=8
+              )
+@charmap_option('--charmap', default=charmaps.DEFAULT_LOCALE)
+@click.option('--validate', 'run_validation',
+              is_flag=True,
+              help="Validate all sources first (see validate-all) and compress nothing when any is invalid"
+              )
+@click.option('--budget',
+              multiple=True,
+              help="Maximal length of column as COLUMN=LENGTH checked with --validate, can be repeated"
+              )
+@click.option('--locales',
+              help="Comma separated locales built in one pass into DST/<locale> (charmap of the same name by default)"
+              )
+@click.option('--locale-charmap',
+              multiple=True,
+              help="Charmap of a locale as LOCALE=CHARMAP (locale or *.json file), can be repeated"
+              )
+@click.option('--locale-profile',
+              multiple=True,
+              help=f"Compression profile of a locale as LOCALE=PROFILE ({', '.join(compressor.PROFILES)}), can be repeated"
+              )
+@click.option('--locale-columns',
+              multiple=True,
+              help="Columns kept in files of a locale as LOCALE=COLUMN,COLUMN,..., can be repeated"
+              )
+@shard_option
 @stored_config
-def compress_all(config: Swd2Config, ext:str, dst: str, force: bool):
+@click.pass_context
+def compress_all(ctx, config: Swd2Config, ext:str, dst: str, force: bool, jobs: int, no_cache: bool,
+                 profile: str, level: int, mem_level: int, strategy: str, run_autotune: bool, autotune_sample: int,
+                 charmap: charmaps.Charmap, run_validation: bool, budget: tuple, locales: str, locale_charmap: tuple,
+                 locale_profile: tuple, locale_columns: tuple, shard):
     '''
     Compress all files *.csv to *.csv.z
     '''
+    started = time.perf_counter()
+    all_sources = sorted(config.working_dir.glob(f"*{ext}"))
+    sources = select_shard(all_sources, config, shard)
+    # every shard keeps its own manifest, merge-shards combines them
+    manifest_name = PARTIAL_NAME.format(index=shard.index, count=shard.count) if shard else MANIFEST_NAME
+    if locales and (run_autotune or profile == TUNED_PROFILE):
+        raise click.UsageError('--locales cannot be combined with tuned profiles, use --locale-profile')
+    if run_validation:
+        reports = validate_files(sources, None, charmap, parse_budgets(budget), jobs)
+        if not all(reports):
+            ExtLogger.error(f'Invalid files: {LogTemplates.variable(sum(1 for report in reports if not report))}, nothing was compressed')
+            ctx.exit(1)
+
+    outDir = config.working_dir / dst
+    outDir.mkdir(parents=True, exist_ok=True)
+    if locales:
+        from swd2.translator import locales as builds
+        targets = locale_targets(outDir, locales, locale_charmap, locale_profile, locale_columns,
+                                 compressor.resolve_profile(profile, level, mem_level, strategy))
+        results = builds.build(sources, outDir, targets, force, jobs, no_cache, manifest_name)
+    else:
+        manifest = BuildManifest(outDir / manifest_name) if no_cache else BuildManifest.load(outDir, manifest_name)
+        if run_autotune:
+            from swd2.translator import autotune
+            manifest.measurements = {}
+            manifest.tuned = autotune.tune(autotune.sample(sources, autotune_sample), charmap, measured=manifest.measurements)
+            profile = TUNED_PROFILE
+        selected = compressor.resolve_profile(profile, level, mem_level, strategy)
+        results = compress_files(sources, outDir, manifest, selected, charmap, force, jobs, profile == TUNED_PROFILE)
+        manifest.retain(sources)
+        manifest.save()
+    save_shard_report(outDir, 'compress', shard, sources, results, config, started, all_sources)
+    if any(not result.ok for result in results):
+        ctx.exit(1)
+
+
+def locale_targets(out_dir, locales: str, charmap_values: tuple, profile_values: tuple, columns_values: tuple,
+                   default_profile: compressor.CompressionProfile) -> list:
+    from swd2.translator import locales as builds
+
+    names = [name.strip() for name in locales.split(',') if name.strip()]
+    assignments = {}
+    for option, values in (('--locale-charmap', charmap_values), ('--locale-profile', profile_values), ('--locale-columns', columns_values)):
+        try:
+            assignments[option] = builds.parse_assignments(values, option)
+        except ValueError as err:
+            raise click.BadParameter(str(err), param_hint=option)
+        unknown = set(assignments[option]) - set(names)
+        if unknown:
+            raise click.BadParameter(f'Locales not listed in --locales: {", ".join(sorted(unknown))}', param_hint=option)
+
+    targets = []
+    for name in names:
+        profile_name = assignments['--locale-profile'].get(name)
+        if profile_name is not None and profile_name not in compressor.PROFILES:
+            raise click.BadParameter(f'Unknown profile {profile_name} of locale {name}', param_hint='--locale-profile')
+        columns = assignments['--locale-columns'].get(name)
+        try:
+            charmap = load_charmap(click.get_current_context(), None, assignments['--locale-charmap'].get(name, name))
+        except click.BadParameter as err:
+            err.param_hint = '--locale-charmap' if name in assignments['--locale-charmap'] else '--locales'
+            raise
+        targets.append(builds.LocaleTarget(
+            name,
+            out_dir / name,
+            charmap,
+            compressor.PROFILES[profile_name] if profile_name is not None else default_profile,
+            [column.strip() for column in columns.split(',')] if columns else None
+        ))
+    return targets
+
+
+def compress_files(sources: list, outDir, manifest: BuildManifest, profile: compressor.CompressionProfile,
+                   charmap: charmaps.Charmap, force: bool, jobs: int, tuned: bool = False) -> list:
+    '''
+    Compresses sources not up to date according to manifest, the manifest is updated (not saved).
+    '''
+    tasks = []
+    for file in sources:
+        target = (outDir / file.stem).with_suffix(".z")
+        file_profile = profile
+        if tuned and manifest.tuned_settings(file) is not None:
+            file_profile = compressor.CompressionProfile.of_settings(manifest.tuned_settings(file), TUNED_PROFILE)
+        if manifest.is_up_to_date(file, target, charmap.id, file_profile.settings()):
+            ExtLogger.debug(f'Unchanged, skipped: {LogTemplates.variable(file.name)}')
+        else:
+            tasks.append(batch.BatchTask(file, target, {'overwrite': force, 'profile': file_profile, 'charmap': charmap}))
+    if len(tasks) < len(sources):
+        ExtLogger.info(f'Skipped unchanged files: {LogTemplates.variable(len(sources) - len(tasks))}')
+
+    results = batch.run('compress', compress_tracked, tasks, jobs)
+    for result in results:
+        if result.ok:
+            manifest.update(result.task.source, result.task.target, charmap.id, result.task.options['profile'].settings(),
+                            result.value)
+    return results
+
+
+def compress_tracked(source, target, **options):
+    '''
+    Compresses source, returns its fingerprint taken before it was read (false on failure).
+    '''
+    try:
+        fingerprint = manifests.fingerprint(source)
+    except OSError:
+        # reported by compress
+        fingerprint = None
+    if not compressor.compress(source, target, **options):
+        return False
+    return fingerprint or True
+
+
+@translator.command()
+@click.option('--ext',
+              type=str,
+              help="Extension",
+              default=".csv"
+              )
+@click.option('--dst',
+              type=click.types.Path(),
+              help="Target dir",
+              default="out"
+              )
+@compression_options(list(compressor.PROFILES) + [TUNED_PROFILE])
+@charmap_option('--charmap', default=charmaps.DEFAULT_LOCALE)
+@click.option('--debounce',
+              type=click.FloatRange(min=0),
+              help="Seconds without changes before recompressing",
+              default=0.2
+              )
+@click.option('--polling',
+              is_flag=True,
+              help="Poll files instead of using inotify"
+              )
+@stored_config
+def watch(config: Swd2Config, ext: str, dst: str, profile: str, level: int, mem_level: int, strategy: str,
+          charmap: charmaps.Charmap, debounce: float, polling: bool):
+    '''
+    Watch *.csv files and compress them on every save
+    '''
+    from swd2.translator import watcher
+
+    # files are edited while this runs, a mapped file truncated by the editor would kill the process
+    compressor.USE_MMAP = False
+    outDir = config.working_dir / dst
+    outDir.mkdir(parents=True, exist_ok=True)
+    manifest = BuildManifest.load(outDir)
+    selected = compressor.resolve_profile(profile, level, mem_level, strategy)
+    tuned = profile == TUNED_PROFILE
+
+    # bring outputs up to date first, then only edited files are compressed
+    sources = sorted(config.working_dir.glob(f"*{ext}"))
+    compress_files(sources, outDir, manifest, selected, charmap, True, batch.default_jobs(), tuned)
+    manifest.save()
+
+    def on_change(files: list):
+        started = time.perf_counter()
+        compress_files(files, outDir, manifest, selected, charmap, True, 1, tuned)
+        manifest.save()
+        ExtLogger.info(f'Recompressed in {LogTemplates.variable(f"{(time.perf_counter() - started) * 1000:.0f}ms")}')
+
+    watcher.watch(config.working_dir, ext, on_change, debounce, polling)
+
+
+@translator.command()
+@click.option('--src',
+              type=click.types.Path(),
+              help="Dir with compressed files",
+              default="out"
+              )
+@click.option('--ext',
+              type=str,
+              help="Extension",
+              default=".z"
+              )
+@click.option('--round-trip',
+              is_flag=True,
+              help="Also compare content with source *.csv files in working dir (after charmap)"
+              )
+@charmap_option('--charmap', default=charmaps.DEFAULT_LOCALE)
+@click.option('--jobs',
+              type=click.IntRange(min=1),
+              help="Number of parallel jobs (default: CPU count)",
+              default=batch.default_jobs
+              )
+@shard_option
+@stored_config
+@click.pass_context
+def verify_all(ctx, config: Swd2Config, src: str, ext: str, round_trip: bool, charmap: charmaps.Charmap, jobs: int, shard):
+    '''
+    Verify integrity of all compressed files without writing anything
+    '''
+    from swd2.translator import verifier
+
+    started = time.perf_counter()
+    all_files = sorted((config.working_dir / src).glob(f"*{ext}"))
+    files = select_shard(all_files, config, shard)
+    tasks = []
+    for file in files:
+        source = config.working_dir / verifier.source_name(file) if round_trip else None
+        tasks.append(batch.BatchTask(file, source, {'charmap': charmap}))
+    results = batch.run('verify', verifier.verify, tasks, jobs)
+    save_shard_report(config.working_dir / src, 'verify', shard, files, results, config, started, all_files)
+    if any(not result.ok for result in results):
+        ctx.exit(1)
+
+
+@translator.command()
+@click.option('--ext',
+              type=str,
+              help="Extension",
+              default=".csv"
+              )
+@charmap_option('--charmap', default=charmaps.DEFAULT_LOCALE)
+@stored_config
+def scan(config: Swd2Config, ext: str, charmap: charmaps.Charmap):
+    '''
+    Reports characters of *.csv files the game font cannot render after charmap
+    '''
+    failed = 0
+    for file in sorted(config.working_dir.glob(f"*{ext}")):
+        characters = set()
+        translator = compressor.TextTranslator(charmap.table, characters)
+        with compressor.open_view(file) as view:
+            for chunk in compressor.iter_view(view):
+                translator.feed(chunk)
+        translator.finish()
+        unrenderable = charmap.unrenderable(characters)
+        if unrenderable:
+            failed += 1
+            ExtLogger.warn(f'{LogTemplates.variable(file.name)} : {LogTemplates.variable("".join(sorted(unrenderable)))} '
+                           f'({", ".join(f"U+{ord(char):04X}" for char in sorted(unrenderable))})')
+    ExtLogger.info(f'Files with characters missing in game font: {LogTemplates.variable(failed)}')
+
+
+@translator.command()
+@click.option('--ext',
+              type=str,
+              help="Extension",
+              default=".csv.z"
+              )
+@click.option('--db',
+              type=click.types.Path(),
+              help="Database file",
+              default="translations.db"
+              )
+@charmap_option('--reverse-charmap', help="Apply reverse mapping of charmap (locale or *.json file) to exported text")
+@stored_config
+def export_db(config: Swd2Config, ext: str, db: str, charmap: charmaps.Charmap):
+    '''
+    Export texts of all files to SQLite database with full-text index, only changed files are re-imported
+    '''
+    from swd2.translator import database
+
+    started = time.perf_counter()
+    imported, skipped = database.export(config.working_dir / db, sorted(config.working_dir.glob(f"*{ext}")), charmap)
+    ExtLogger.info(f'Imported files: {LogTemplates.variable(imported)}, unchanged: {LogTemplates.variable(skipped)} '
+                   f'in {LogTemplates.variable(f"{time.perf_counter() - started:.2f}s")}')
+
+
+@translator.command()
+@click.argument('query')
+@click.option('--db',
+              type=click.types.Path(),
+              help="Database file",
+              default="translations.db"
+              )
+@click.option('--column',
+              type=str,
+              help="Search only in column (header name)"
+              )
+@click.option('--limit',
+              type=click.IntRange(min=1),
+              help="Maximum number of matches",
+              default=50
+              )
+@click.option('--raw',
+              is_flag=True,
+              help="Pass query as FTS5 expression (AND, OR, NEAR, prefix*) instead of a phrase"
+              )
+@stored_config
+@click.pass_context
+def search(ctx, config: Swd2Config, query: str, db: str, column: str, limit: int, raw: bool):
+    '''
+    Search texts exported with export-db
+    '''
+    import sqlite3
+    from swd2.translator import database
+
+    db_file = config.working_dir / db
+    if not db_file.is_file():
+        ExtLogger.error(f'Database not exists: {LogTemplates.variable(db_file)}, run export-db first')
+        ctx.exit(1)
+    try:
+        matches = database.search(db_file, query, limit, column, raw)
+    except sqlite3.OperationalError as err:
+        ExtLogger.error(f'Invalid query {LogTemplates.variable(query)}: {err}')
+        ctx.exit(1)
+    for match in matches:
+        ExtLogger.info(f'{LogTemplates.variable(match.file)} {LogTemplates.variable(match.key)} [{match.column}]: {match.text}')
+    ExtLogger.info(f'Matches: {LogTemplates.variable(len(matches))}')
+
+
+@translator.command()
+@click.argument('old_dir', type=click.types.Path(file_okay=False))
+@click.argument('new_dir', type=click.types.Path(file_okay=False))
+@click.option('--output',
+              type=click.types.Path(),
+              help="Delta file (json)",
+              default="delta.json"
+              )
+@stored_config
+def diff(config: Swd2Config, old_dir: str, new_dir: str, output: str):
+    '''
+    Compare language files (*.csv or *.csv.z) of two game versions by key
+    '''
+    from swd2.translator import differ
+
+    started = time.perf_counter()
+    deltas = differ.diff(config.working_dir / old_dir, config.working_dir / new_dir)
+    differ.save(deltas, config.working_dir / old_dir, config.working_dir / new_dir, config.working_dir / output)
+    ExtLogger.info(f'Files compared: {LogTemplates.variable(len(deltas))}, modified: {LogTemplates.variable(sum(delta.modified for delta in deltas))} '
+                   f'in {LogTemplates.variable(f"{time.perf_counter() - started:.2f}s")}, delta saved to {LogTemplates.variable(output)}')
+
+
+@translator.command()
+@click.argument('translated_dir', type=click.types.Path(file_okay=False))
+@click.argument('new_dir', type=click.types.Path(file_okay=False))
+@click.option('--dst',
+              type=click.types.Path(),
+              help="Target dir for merged *.csv files",
+              default="merged"
+              )
+@click.option('--column',
+              type=str,
+              multiple=True,
+              required=True,
+              help="Translated column (header name) copied to new files, can be repeated"
+              )
+@click.option('--source-column',
+              type=str,
+              help="Column with original text; translations are not applied when it changed in new files"
+              )
+@stored_config
+def merge(config: Swd2Config, translated_dir: str, new_dir: str, dst: str, column: tuple, source_column: str):
+    '''
+    Apply translations onto language files of a new game version
+    '''
+    from swd2.translator import differ
+
     outDir = config.working_dir / dst
     outDir.mkdir(parents=True, exist_ok=True)
-    for file in config.working_dir.glob(f"*{ext}"):
-        ExtLogger.info(f'File: {LogTemplates.variable(file.name)}')
-        compressor.compress(file, (outDir / file.stem).with_suffix(".z"), force)
+    results = differ.merge(config.working_dir / translated_dir, config.working_dir / new_dir, outDir, list(column), source_column)
+    ExtLogger.info(f'Merged files: {LogTemplates.variable(len(results))}, applied translations: {LogTemplates.variable(sum(result.applied for result in results))}, '
+                   f'stale: {LogTemplates.variable(sum(result.stale for result in results))}')
+
+
+@translator.command()
+@click.argument('src', type=click.types.Path(file_okay=False))
+@click.option('--memory-dir',
+              type=click.types.Path(file_okay=False),
+              help="Dir with translated files the translation memory is built of",
+              default="."
+              )
+@click.option('--source-column',
+              type=str,
+              help="Column with original text",
+              default="English"
+              )
+@click.option('--target-column',
+              type=str,
+              help="Column with translation",
+              default="Polish"
+              )
+@click.option('--top',
+              type=click.IntRange(min=1),
+              help="Number of suggestions per row",
+              default=3
+              )
+@click.option('--min-score',
+              type=click.FloatRange(0, 1),
+              help="Minimal similarity of suggested source text",
+              default=0.5
+              )
+@click.option('--output',
+              type=click.types.Path(),
+              help="Suggestions file (json)",
+              default="suggestions.json"
+              )
+@click.option('--dst',
+              type=click.types.Path(),
+              help="Also write *.csv files pre-filled with the best suggestions to this dir"
+              )
+@stored_config
+def suggest(config: Swd2Config, src: str, memory_dir: str, source_column: str, target_column: str,
+            top: int, min_score: float, output: str, dst: str):
+    '''
+    Suggest translations of untranslated rows from the translation memory
+    '''
+    import json
+    from swd2.translator import differ, memory
+
+    tm = memory.TranslationMemory.load(config.working_dir / memory.MEMORY_NAME, source_column, target_column)
+    if tm.update(config.working_dir / memory_dir):
+        tm.save()
+    ExtLogger.info(f'Translation memory entries: {LogTemplates.variable(len(tm))}')
+
+    outDir = None
+    if dst is not None:
+        outDir = config.working_dir / dst
+        outDir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    queries = 0
+    suggestions = {}
+    for name, file in differ.source_files(config.working_dir / src).items():
+        file_queries, file_suggestions = tm.suggest_file(file, top, min_score, outDir / name if outDir else None)
+        queries += file_queries
+        if file_suggestions:
+            suggestions[name] = file_suggestions
+            ExtLogger.info(f'{LogTemplates.variable(name)}: rows with suggestions {LogTemplates.variable(len(file_suggestions))}')
+
+    elapsed = time.perf_counter() - started
+    with open(config.working_dir / output, 'w', encoding='utf-8') as f:
+        json.dump(suggestions, f, ensure_ascii=False, indent=1, default=lambda o: o.__dict__)
+    ExtLogger.info(f'Untranslated rows: {LogTemplates.variable(queries)}, with suggestions: {LogTemplates.variable(sum(len(rows) for rows in suggestions.values()))} '
+                   f'in {LogTemplates.variable(f"{elapsed:.2f}s")} ({LogTemplates.variable(f"{elapsed * 1000 / max(queries, 1):.3f}ms")} per row), '
+                   f'saved to {LogTemplates.variable(output)}')
+
+
+@translator.command()
+@click.argument('jobs_file', type=click.types.Path(dir_okay=False))
+@click.option('--jobs',
+              type=click.IntRange(min=1),
+              help="Number of parallel jobs",
+              default=1
+              )
+@click.option('--dry-run',
+              is_flag=True,
+              help="Only validate the jobs"
+              )
+@stored_config
+@click.pass_context
+def run_jobs(ctx, config: Swd2Config, jobs_file: str, jobs: int, dry_run: bool):
+    '''
+    Run compress/decompress operations listed in *.toml or *.json file
+    '''
+    from swd2.translator import jobs as batch_jobs
+
+    try:
+        data = batch_jobs.load(config.working_dir / jobs_file)
+    except (OSError, ValueError) as err:
+        ExtLogger.error(f'Cannot read jobs file {LogTemplates.variable(jobs_file)}: {err}')
+        ctx.exit(1)
+    parsed, violations = batch_jobs.parse(data, config.working_dir)
+    violations += batch_jobs.validate(parsed)
+    for violation in violations:
+        ExtLogger.error(violation)
+    if violations:
+        ExtLogger.error(f'Invalid jobs: {LogTemplates.variable(len(violations))}, nothing was run')
+        ctx.exit(1)
+    ExtLogger.info(f'Validated jobs: {LogTemplates.variable(len(parsed))}')
+    if dry_run:
+        return
+    results = batch_jobs.run(parsed, jobs)
+    if any(not result.ok for result in results):
+        ctx.exit(1)
+
+
+@translator.command()
+@click.option('--src',
+              type=click.types.Path(file_okay=False),
+              help="Dir with compressed files",
+              default="."
+              )
+@click.option('--ext',
+              type=str,
+              help="Extension",
+              default=".csv.z"
+              )
+@click.option('--recursive',
+              is_flag=True,
+              help="Also scan subdirectories"
+              )
+@click.option('--jobs',
+              type=click.IntRange(min=1),
+              help="Number of threads reading headers",
+              default=1
+              )
+@click.option('--output',
+              type=click.types.Path(dir_okay=False),
+              help="Also write the inventory to json file"
+              )
+@click.option('--summary',
+              is_flag=True,
+              help="Print only totals, outliers and invalid files"
+              )
+@stored_config
+@click.pass_context
+def info(ctx, config: Swd2Config, src: str, ext: str, recursive: bool, jobs: int, output: str, summary: bool):
+    '''
+    Report uncompressed sizes and ratios of compressed files from their headers only
+    '''
+    from swd2.translator import inventory
+
+    directory = config.working_dir / src
+    if not directory.is_dir():
+        ExtLogger.error(f'Dir not exists: {LogTemplates.variable(directory)}')
+        ctx.exit(1)
+    started = time.perf_counter()
+    infos = inventory.scan(directory, ext, recursive, jobs)
+    data = inventory.report(infos)
+    inventory.log_report(infos, data, not summary)
+    if output:
+        inventory.save(data, config.working_dir / output)
+    ExtLogger.debug(f'Inventory took {LogTemplates.variable(f"{(time.perf_counter() - started) * 1000:.1f}ms")}')
+    if data['invalid']:
+        ctx.exit(1)
+
+
+def parse_budgets(values: tuple) -> dict:
+    from swd2.translator import validator
+    try:
+        return validator.parse_budgets(values)
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint='--budget')
+
+
+def validate_files(sources: list, original_dir, charmap: charmaps.Charmap, budgets: dict, jobs: int) -> list:
+    '''
+    Validates sources in parallel, returns report of every file.
+    '''
+    from swd2.translator import differ, validator
+
+    originals = differ.source_files(original_dir) if original_dir is not None else {}
+    tasks = []
+    for file in sources:
+        original = originals.get(file.name)
+        if original_dir is not None and original is None:
+            ExtLogger.warn(f'Original of {LogTemplates.variable(file.name)} not found, its own header is used')
+        tasks.append(batch.BatchTask(file, original, {'charmap': charmap, 'budgets': budgets}))
+    results = batch.run('validate', validator.validate, tasks, jobs)
+    return [result.value if result.value is not None else validator.ValidationReport(result.task.source.name, count=1)
+            for result in sorted(results, key=lambda result: result.task.source.name)]
+
+
+@translator.command()
+@click.option('--ext',
+              type=str,
+              help="Extension",
+              default=".csv"
+              )
+@click.option('--original',
+              type=click.types.Path(file_okay=False),
+              help="Dir with original game files (*.csv or *.csv.z) whose headers are expected"
+              )
+@charmap_option('--charmap', default=charmaps.DEFAULT_LOCALE)
+@click.option('--budget',
+              multiple=True,
+              help="Maximal length of column as COLUMN=LENGTH, can be repeated"
+              )
+@click.option('--jobs',
+              type=click.IntRange(min=1),
+              help="Number of parallel jobs (default: CPU count)",
+              default=batch.default_jobs
+              )
+@click.option('--output',
+              type=click.types.Path(dir_okay=False),
+              help="Also write combined report to json file"
+              )
+@stored_config
+@click.pass_context
+def validate_all(ctx, config: Swd2Config, ext: str, original: str, charmap: charmaps.Charmap, budget: tuple, jobs: int, output: str):
+    '''
+    Validate *.csv files before compression: quoting, columns, characters and lengths
+    '''
+    from swd2.translator import validator
+
+    budgets = parse_budgets(budget)
+    sources = sorted(config.working_dir.glob(f"*{ext}"))
+    reports = validate_files(sources, config.working_dir / original if original else None, charmap, budgets, jobs)
+    if output:
+        validator.save(reports, config.working_dir / output)
+    ExtLogger.info(f'Invalid files: {LogTemplates.variable(sum(1 for report in reports if not report))}, '
+                   f'violations: {LogTemplates.variable(sum(report.count for report in reports))}')
+    if not all(reports):
+        ctx.exit(1)
+
+
+@translator.command()
+@click.option('--dir', 'directory',
+              type=click.types.Path(file_okay=False),
+              help="Dir with shard reports (output dir of compress-all/decompress-all, input dir of verify-all)",
+              default="out"
+              )
+@click.option('--output',
+              type=click.types.Path(dir_okay=False),
+              help="Build report file",
+              default="build-report.json"
+              )
+@stored_config
+@click.pass_context
+def merge_shards(ctx, config: Swd2Config, directory: str, output: str):
+    '''
+    Combine reports and build manifests of all --shard runs into one build report
+    '''
+    from swd2.translator import sharding
+
+    root = config.working_dir / directory
+    if not root.is_dir():
+        ExtLogger.error(f'Dir not exists: {LogTemplates.variable(root)}')
+        ctx.exit(1)
+    for out_dir in [root] + sorted(path for path in root.iterdir() if path.is_dir()):
+        if any(out_dir.glob(PARTIAL_NAME.format(index='*', count='*'))):
+            BuildManifest.merge(out_dir).save()
+            ExtLogger.info(f'Build manifests of shards merged into {LogTemplates.variable(out_dir / MANIFEST_NAME)}')
+    report = sharding.merge(root)
+    sharding.log_report(report)
+    sharding.save(report, config.working_dir / output)
+    ExtLogger.info(f'Build report saved to {LogTemplates.variable(config.working_dir / output)}')
+    if not report['ok']:
+        ctx.exit(1)
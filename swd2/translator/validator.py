@@ -0,0 +1,121 @@
+import csv
+import json
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.core.exttypes import ExtObject
+from swd2.translator import compressor, differ
+from swd2.translator.charmap import Charmap
+
+# violations kept per file, the rest is only counted
+MAX_VIOLATIONS = 100
+
+
+class Violation(ExtObject):
+    def __init__(self, line: int, key: str, check: str, message: str):
+        self.line = line
+        self.key = key
+        self.check = check
+        self.message = message
+
+
+class ValidationReport(ExtObject):
+    '''
+    Violations of one file; true when the file is valid.
+    '''
+
+    def __init__(self, file: str, rows: int = 0, count: int = 0, violations: list = None):
+        self.file = file
+        self.rows = rows
+        self.count = count
+        self.violations = violations if violations is not None else []
+
+    def add(self, line: int, key: str, check: str, message: str):
+        self.count += 1
+        if len(self.violations) < MAX_VIOLATIONS:
+            self.violations.append(Violation(line, key, check, message))
+
+    def __bool__(self) -> bool:
+        return self.count == 0
+
+
+def parse_budgets(values) -> dict:
+    '''
+    Parses COLUMN=LENGTH items to column -> maximal number of characters.
+    '''
+    budgets = {}
+    for value in values:
+        column, _, length = value.rpartition('=')
+        if not column or not length.isdigit():
+            raise ValueError(f'Length budget must be COLUMN=LENGTH: {value}')
+        budgets[column] = int(length)
+    return budgets
+
+
+def read_header(file: Path) -> list:
+    return next(differ.read_rows(file), [])
+
+
+def validate(source: Path, original: Path = None, charmap: Charmap = None, budgets: dict = None) -> ValidationReport:
+    '''
+    Scans csv file once: quoting, column count of every row against the header of original file (or its own),
+    characters the game font cannot render after charmap and maximal lengths of columns.
+    '''
+    report = ValidationReport(source.name)
+    budgets = budgets or {}
+    renderable = set()
+    line = 0
+    try:
+        with compressor.open_text(source) as text:
+            reader = csv.reader(text, strict=True)
+            header = next(reader, [])
+            expected = read_header(original) if original is not None else header
+            if original is not None and header != expected:
+                report.add(1, None, 'header', f'Header {header} differs from original {expected}')
+            limits = [(index, column, budgets[column]) for index, column in enumerate(expected) if column in budgets]
+            for column in set(budgets) - set(expected):
+                report.add(1, None, 'budget', f'Column with length budget not found: {column}')
+
+            line = reader.line_num
+            for row in reader:
+                report.rows += 1
+                key = row[0] if row else None
+                if len(row) != len(expected):
+                    report.add(line + 1, key, 'columns', f'Expected {len(expected)} columns, found {len(row)}')
+                for index, column, limit in limits:
+                    if index < len(row) and len(row[index]) > limit:
+                        report.add(line + 1, key, 'length', f'{column} has {len(row[index])} characters, budget is {limit}')
+                if charmap is not None:
+                    characters = set(''.join(row).translate(charmap.table))
+                    if not characters <= renderable:
+                        unrenderable = charmap.unrenderable(characters - renderable)
+                        renderable.update(characters - unrenderable)
+                        if unrenderable:
+                            report.add(line + 1, key, 'charmap', f'Characters missing in game font: {"".join(sorted(unrenderable))}')
+                line = reader.line_num
+    except csv.Error as err:
+        # quoting is broken, the rest of the file cannot be parsed reliably
+        report.add(line + 1, None, 'quotes', str(err))
+    except (compressor.CompressedFileError, UnicodeDecodeError, OSError) as err:
+        report.add(0, None, 'read', str(err))
+
+    for violation in report.violations:
+        ExtLogger.error(f'{LogTemplates.variable(source.name)}:{violation.line} {violation.key or ""} [{violation.check}] {violation.message}')
+    if report.count > len(report.violations):
+        ExtLogger.error(f'... and {LogTemplates.variable(report.count - len(report.violations))} more violations in {LogTemplates.variable(source.name)}')
+    if report:
+        ExtLogger.info(f'Valid: {LogTemplates.variable(source.name)} ({report.rows} rows)')
+    return report
+
+
+def save(reports: list[ValidationReport], file: Path):
+    data = {
+        'files': len(reports),
+        'invalid': sum(1 for report in reports if not report),
+        'violations': sum(report.count for report in reports),
+        'reports': {report.file: {'rows': report.rows, 'count': report.count,
+                                  'violations': [violation.__dict__ for violation in report.violations]}
+                    for report in reports},
+    }
+    with open(file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
@@ -0,0 +1,90 @@
+import hashlib
+import zlib
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+from swd2.translator import compressor
+from swd2.translator.charmap import Charmap
+from swd2.translator.compressor import HEADER_SIZE, StreamDecoder, TextTranslator
+
+TRAILER_SIZE = 4
+
+
+def source_name(compressed_file: Path) -> str:
+    '''
+    Name of *.csv a compressed file was made of: lang.csv.z (game files) or lang.z (compress-all output).
+    '''
+    name = compressed_file.name[:-len('.z')] if compressed_file.name.endswith('.z') else compressed_file.stem
+    return name if name.endswith('.csv') else f'{name}.csv'
+
+
+def _digest():
+    return hashlib.blake2b(digest_size=16)
+
+
+def source_digest(source_file: Path, charmap: Charmap) -> str:
+    '''
+    Digest of source csv after charmap, as it should be found inside the compressed file.
+    '''
+    digest = _digest()
+    translator = TextTranslator(charmap.table)
+    with compressor.open_view(source_file) as view:
+        for chunk in compressor.iter_view(view):
+            digest.update(translator.feed(chunk))
+    digest.update(translator.finish())
+    return digest.hexdigest()
+
+
+def check(input_file: Path) -> tuple[str, str]:
+    '''
+    Streams file through zlib without writing anything. Checks size header, stream end, Adler-32 trailer
+    and trailing garbage. Returns (violation or None, digest of content).
+    '''
+    digest = _digest()
+    adler = zlib.adler32(b'')
+    with compressor.open_view(input_file) as view:
+        if len(view) < HEADER_SIZE + TRAILER_SIZE:
+            return 'File too short', None
+        decoder = StreamDecoder(int.from_bytes(view[:HEADER_SIZE], 'little'))
+        trailer = int.from_bytes(view[-TRAILER_SIZE:], 'big')
+        for chunk in compressor.iter_view(view[HEADER_SIZE:]):
+            for data in decoder.feed(chunk):
+                adler = zlib.adler32(data, adler)
+                digest.update(data)
+        data = decoder.finish()
+        adler = zlib.adler32(data, adler)
+        digest.update(data)
+
+    violation = decoder.violation()
+    if violation is not None:
+        return violation, None
+    if adler != trailer:
+        return f'Adler-32 mismatch: trailer {LogTemplates.variable(f"{trailer:08x}")} computed {LogTemplates.variable(f"{adler:08x}")}', None
+    return None, digest.hexdigest()
+
+
+def verify(input_file: Path, source_file: Path = None, charmap: Charmap = None) -> bool:
+    '''
+    Verifies integrity of compressed file; when source_file is given, also that it contains the source after charmap.
+    '''
+    try:
+        violation, digest = check(input_file)
+        if violation is None and source_file is not None:
+            if not source_file.is_file():
+                violation = f'Source file not exists: {LogTemplates.variable(source_file)}'
+            elif source_digest(source_file, charmap) != digest:
+                violation = f'Content differs from source {LogTemplates.variable(source_file)}'
+    except zlib.error as err:
+        violation = f'Corrupted stream: {err}'
+    except UnicodeDecodeError as err:
+        violation = f'Source is not valid utf-8: {err}'
+    except OSError as err:
+        violation = f'Cannot read file: {err}'
+
+    if violation is not None:
+        ExtLogger.error(f'Verification failed! {LogTemplates.variable(input_file.name)}: {violation}',
+                        fields={'stage': 'verify', 'file': input_file.name, 'path': str(input_file), 'ok': False})
+        return False
+    ExtLogger.info(f'Verified: {LogTemplates.variable(input_file.name)}',
+                   fields={'stage': 'verify', 'file': input_file.name, 'path': str(input_file), 'ok': True})
+    return True
@@ -0,0 +1,118 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+from swd2.core.extlogging import ExtLogger, LogTemplates
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingWatcher:
+    '''
+    Portable fallback: compares size and mtime of matching files on every poll.
+    '''
+
+    def __init__(self, directory: Path, ext: str, interval: float = 0.25):
+        self.directory = directory
+        self.ext = ext
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(self.ext) and entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout: float) -> set[str]:
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {name for name, state in snapshot.items() if self.snapshot.get(name) != state}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    '''
+    Linux inotify through libc, reports files closed after writing or moved in (editors saving via rename).
+    '''
+
+    def __init__(self, directory: Path, ext: str):
+        self.ext = ext
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f'inotify_add_watch failed for {directory}')
+
+    def poll(self, timeout: float) -> set[str]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        buffer = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            _, _, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if name.endswith(self.ext):
+                changed.add(name)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create(directory: Path, ext: str, polling: bool = False):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory, ext)
+        except (OSError, AttributeError) as err:
+            ExtLogger.warn(f'inotify not available, polling used instead: {err}')
+    return PollingWatcher(directory, ext)
+
+
+def watch(directory: Path, ext: str, on_change: callable, debounce: float = 0.2, polling: bool = False):
+    '''
+    Calls on_change(paths) for files changed in directory. Bursts of events (several saves, editor temp files)
+    are merged until nothing changed for debounce seconds. Runs until interrupted.
+    '''
+    watcher = create(directory, ext, polling)
+    ExtLogger.info(f'Watching {LogTemplates.variable(directory)} for {LogTemplates.variable(f"*{ext}")} using {LogTemplates.variable(type(watcher).__name__)}')
+    try:
+        while True:
+            changed = watcher.poll(1.0)
+            if not changed:
+                continue
+            while True:
+                more = watcher.poll(debounce)
+                if not more:
+                    break
+                changed |= more
+            paths = [directory / name for name in sorted(changed) if (directory / name).is_file()]
+            if paths:
+                on_change(paths)
+    except KeyboardInterrupt:
+        ExtLogger.info('Watching stopped')
+    finally:
+        watcher.close()
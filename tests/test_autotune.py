@@ -0,0 +1,34 @@
+import pytest
+
+from swd2.translator import autotune, compressor
+from swd2.translator.autotune import Measurement
+from swd2.translator.compressor import CompressionProfile
+
+SMALL = CompressionProfile('small', level=9)
+FAST = CompressionProfile('fast', level=1)
+
+
+@pytest.mark.parametrize('small_size, winner', [(995, FAST), (900, SMALL)])
+def test_fastest_of_nearly_smallest_wins(small_size, winner):
+    measurements = [Measurement(SMALL, small_size, 1.0), Measurement(FAST, 1000, 0.1)]
+
+    assert autotune.best(measurements).profile is winner
+
+
+def test_rejected_candidate_never_wins():
+    measurements = [Measurement(SMALL, 10, 0.01, 'Corrupted stream'), Measurement(FAST, 1000, 0.1)]
+
+    assert autotune.best(measurements).profile is FAST
+    assert autotune.best(measurements[:1]) is None
+
+
+def test_measurements_of_every_candidate(tmp_path):
+    source = tmp_path / 'lang.csv'
+    source.write_text('ID,English\n' + ''.join(f'KEY_{index},Dig {index}\n' for index in range(1000)), encoding='utf-8')
+    measured = {}
+
+    tuned = autotune.tune([source], candidates=[compressor.FAST, compressor.RELEASE], measured=measured)
+
+    assert set(tuned) == {'lang.csv', '*'}
+    assert set(measured['lang.csv']) == {compressor.FAST.name, compressor.RELEASE.name}
+    assert all(value['size'] > compressor.HEADER_SIZE and value['seconds'] >= 0 for value in measured['lang.csv'].values())
@@ -0,0 +1,118 @@
+import json
+import logging
+
+import pytest
+from click.testing import CliRunner
+
+from swd2.core.extlogging import ExtLogger, LogCapture, LogConfig
+from swd2.swd2_cli import cli
+from swd2.translator import batch, codec, compressor
+from swd2.translator import charmap as charmaps
+
+
+def convert(source, target, fail: bool = False):
+    '''
+    Operation of the tests: logs steps of the file, upper-cases it into target; fails or raises when asked.
+    '''
+    ExtLogger.info(f'step 1 {source.name}')
+    if 'raise' in source.name:
+        raise ValueError('broken file')
+    ExtLogger.info(f'step 2 {source.name}')
+    if fail or 'fail' in source.name:
+        ExtLogger.error(f'failed {source.name}')
+        return False
+    target.write_bytes(source.read_bytes().upper())
+    ExtLogger.info(f'step 3 {source.name}')
+    return True
+
+
+@pytest.fixture
+def records():
+    LogConfig.cfg()
+    capture = LogCapture(logging.INFO)
+    previous = LogConfig.use(capture)
+    yield capture.records
+    LogConfig.use(previous)
+
+
+def tasks(tmp_path, names: list) -> list[batch.BatchTask]:
+    (tmp_path / 'out').mkdir()
+    result = []
+    for name in names:
+        (tmp_path / name).write_text(f'content of {name}\n', encoding='utf-8')
+        result.append(batch.BatchTask(tmp_path / name, tmp_path / 'out' / name))
+    return result
+
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_failed_files_are_counted_in_summary(tmp_path, records, jobs):
+    results = batch.run('convert', convert, tasks(tmp_path, ['a.txt', 'fail.txt', 'raise.txt', 'b.txt']), jobs)
+
+    assert sorted((result.task.source.name, result.ok) for result in results) == [
+        ('a.txt', True), ('b.txt', True), ('fail.txt', False), ('raise.txt', False)]
+    summary = [record for record in records if getattr(record, 'fields', {}).get('stage') == 'convert']
+    assert len(summary) == 1
+    assert summary[0].fields == {'stage': 'convert', 'files': 4, 'failed': 2}
+
+
+def test_worker_records_are_replayed_per_file_in_order(tmp_path, records):
+    names = [f'{index}.txt' for index in range(6)]
+
+    batch.run('convert', convert, tasks(tmp_path, names), 3)
+
+    logged = [record.getMessage() for record in records]
+    for name in names:
+        start = logged.index(next(message for message in logged if message.startswith('File') and name in message))
+        assert logged[start + 1:start + 4] == [f'step 1 {name}', f'step 2 {name}', f'step 3 {name}']
+
+
+def test_results_keep_operation_values(tmp_path, records):
+    results = batch.run('fingerprint', lambda source, target: source.stat().st_size, tasks(tmp_path, ['a.txt']), 1)
+
+    assert results[0].ok and results[0].value == len('content of a.txt\n')
+
+
+def test_same_output_with_one_and_more_jobs(tmp_path, records):
+    sources = []
+    for index in range(5):
+        source = tmp_path / f'lang{index}.csv'
+        source.write_text('ID,English,Polish\n' + f'KEY_{index},Dig,Zażółć gęślą jaźń {index}\n' * (index * 1000 + 1), encoding='utf-8')
+        sources.append(source)
+    outputs = {}
+    for jobs in (1, 4):
+        out = tmp_path / f'out{jobs}'
+        out.mkdir()
+        results = batch.run('compress', compressor.compress,
+                            [batch.BatchTask(source, out / f'{source.stem}.z', {'profile': codec.FAST}) for source in sources], jobs)
+        assert all(result.ok for result in results)
+        outputs[jobs] = {file.name: file.read_bytes() for file in out.iterdir()}
+
+    assert len(outputs[1]) == len(sources)
+    assert outputs[1] == outputs[4]
+
+
+@pytest.mark.parametrize('command, ext, content', [
+    ('compress-all', '.csv', b'ID,\xff\n'),
+    ('decompress-all', '.csv.z', b'\x05\x00\x00\x00broken'),
+])
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_commands_fail_when_any_file_failed(tmp_path, records, command, ext, content, jobs):
+    (tmp_path / f'broken{ext}').write_bytes(content)
+    (tmp_path / f'good{ext}').write_bytes(codec.encode_csv_z(b'ID,English\n') if ext == '.csv.z' else b'ID,English\n')
+
+    result = CliRunner().invoke(cli, ['--no-banner', '--working-dir', str(tmp_path), 'translator', command, '--jobs', jobs])
+
+    assert result.exit_code == 1
+    assert (tmp_path / 'out' / ('good.z' if ext == '.csv' else 'good.csv')).is_file()
+
+
+def test_charmap_file_relative_to_working_dir(tmp_path, records):
+    data = json.loads((charmaps.CHARMAPS_DIR / 'pl.json').read_text(encoding='utf-8'))
+    (tmp_path / 'custom.json').write_text(json.dumps({**data, 'mapping': {'ą': '#'}}), encoding='utf-8')
+    (tmp_path / 'lang.csv').write_text('ID,Polish\nKEY_0,ąę\n', encoding='utf-8')
+
+    result = CliRunner().invoke(cli, ['--no-banner', '--working-dir', str(tmp_path), 'translator', 'compress-all',
+                                      '--charmap', 'custom.json'])
+
+    assert result.exit_code == 0
+    assert codec.decode_csv_z((tmp_path / 'out' / 'lang.z').read_bytes()) == 'ID,Polish\nKEY_0,#ę\n'.encode('utf-8')
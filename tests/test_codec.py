@@ -0,0 +1,146 @@
+import io
+import zlib
+
+import pytest
+
+from swd2.translator import charmap as charmaps
+from swd2.translator import codec
+
+POLISH = 'ID,English,Polish\r\nKEY_0,"Dig, dig",Zażółć gęślą jaźń ŁÓDŹ Ćma\r\n'.encode('utf-8')
+
+
+class NonSeekable(io.RawIOBase):
+    def __init__(self):
+        self.output = io.BytesIO()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self.output.write(data)
+
+
+@pytest.mark.parametrize('data', [b'', b'ID,English\n', POLISH, POLISH * 20000])
+def test_round_trip_with_reverse_charmap(data):
+    encoded = codec.encode_csv_z(data, charmaps.load('pl'))
+
+    assert codec.decode_csv_z(encoded, charmaps.load('pl')) == data
+
+
+def test_charmap_is_applied_and_header_holds_translated_size():
+    encoded = codec.encode_csv_z(POLISH, charmaps.load('pl'))
+    translated = charmaps.load('pl').translate(POLISH.decode('utf-8')).encode('utf-8')
+
+    assert codec.decode_csv_z(encoded) == translated
+    assert int.from_bytes(encoded[:codec.HEADER_SIZE], 'little') == len(translated)
+
+
+def test_default_charmap_is_the_one_used_by_compress():
+    assert codec.encode_csv_z(POLISH) == codec.encode_csv_z(POLISH, charmaps.load(charmaps.DEFAULT_LOCALE))
+
+
+@pytest.mark.parametrize('profile', [codec.FAST, codec.RELEASE, codec.resolve_profile(level=0, strategy='rle')])
+def test_profiles_produce_zlib_stream(profile):
+    encoded = codec.encode_csv_z(b'ID,English\n' * 1000, profile=profile)
+
+    assert zlib.decompress(encoded[codec.HEADER_SIZE:]) == b'ID,English\n' * 1000
+
+
+def test_character_split_between_chunks():
+    data = b'a' * (codec.CHUNK_SIZE - 1) + 'ą'.encode('utf-8') + b'\n'
+    characters = set()
+
+    encoded = codec.encode_csv_z(data, charmaps.load('pl'), characters=characters)
+
+    assert codec.decode_csv_z(encoded, charmaps.load('pl')) == data
+    assert characters == {'a', 'à', '\n'}
+
+
+def test_invalid_utf8_source():
+    with pytest.raises(codec.SourceEncodingError):
+        codec.encode_csv_z(b'ID,\xff\xfe\n')
+
+
+@pytest.mark.parametrize('data', [b'', b'\x01\x00'])
+def test_missing_header(data):
+    with pytest.raises(codec.CompressedFileError, match='Missing header'):
+        codec.decode_csv_z(data)
+
+
+def test_truncated_stream():
+    encoded = codec.encode_csv_z(POLISH * 100)
+
+    with pytest.raises(codec.CompressedFileError, match='truncated'):
+        codec.decode_csv_z(encoded[:-10])
+
+
+def test_size_not_matching_header():
+    encoded = codec.encode_csv_z(POLISH)
+    wrong_header = (len(POLISH) + 1).to_bytes(codec.HEADER_SIZE, 'little')
+
+    with pytest.raises(codec.CompressedFileError, match='Header declares'):
+        codec.decode_csv_z(wrong_header + encoded[codec.HEADER_SIZE:])
+
+
+def test_corrupted_stream():
+    encoded = bytearray(codec.encode_csv_z(POLISH))
+    encoded[codec.HEADER_SIZE] ^= 0xff
+
+    with pytest.raises(codec.CompressedFileError, match='Corrupted stream'):
+        codec.decode_csv_z(bytes(encoded))
+
+
+def test_trailing_data():
+    encoded = codec.encode_csv_z(POLISH)
+
+    with pytest.raises(codec.CompressedFileError, match='after compressed stream'):
+        codec.decode_csv_z(encoded + b'junk')
+    with pytest.raises(codec.CompressedFileError, match='after compressed stream'):
+        codec.CsvZReader(encoded + b'junk').readall()
+
+
+def test_decoded_chunks_of_any_size():
+    encoded = codec.encode_csv_z(POLISH * 10)
+    chunks = (encoded[offset:offset + 3] for offset in range(0, len(encoded), 3))
+
+    assert b''.join(codec.iter_decoded_chunks(chunks)) == codec.decode_csv_z(encoded)
+
+
+def test_writer_to_non_seekable_file():
+    f = NonSeekable()
+    with codec.CsvZWriter(f) as writer:
+        writer.write(POLISH[:10])
+        writer.write(POLISH[10:])
+
+    assert f.output.getvalue() == codec.encode_csv_z(POLISH)
+
+
+def test_writer_text_and_bytes_give_same_output():
+    f = io.BytesIO()
+    with codec.CsvZWriter(f) as writer:
+        writer.write_text(POLISH.decode('utf-8'))
+
+    assert f.getvalue() == codec.encode_csv_z(POLISH)
+
+
+def test_writer_after_existing_content():
+    f = io.BytesIO()
+    f.write(b'prefix')
+    with codec.CsvZWriter(f) as writer:
+        writer.write(POLISH)
+
+    assert f.getvalue() == b'prefix' + codec.encode_csv_z(POLISH)
+
+
+def test_reader_of_bytes_and_file():
+    encoded = codec.encode_csv_z(POLISH)
+    expected = codec.decode_csv_z(encoded)
+
+    assert codec.CsvZReader(encoded).readall() == expected
+    with io.TextIOWrapper(codec.CsvZReader(io.BytesIO(encoded)), encoding='utf-8', newline='') as text:
+        assert text.read() == expected.decode('utf-8')
+
+
+def test_reader_missing_header():
+    with pytest.raises(codec.CompressedFileError, match='Missing header'):
+        codec.CsvZReader(b'\x00')
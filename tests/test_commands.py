@@ -0,0 +1,83 @@
+import sys
+import time
+
+import pytest
+
+from swd2.core import commands
+from swd2.core.commands import CmdStatus
+
+PYTHON = sys.executable
+
+
+def python(code: str) -> list:
+    return [PYTHON, '-c', code]
+
+
+def test_all_succeeded():
+    results = commands.execute_many([python('print("a")'), python('print("b")')], jobs=2, name='ok')
+
+    assert results.isOk
+    assert results.status == CmdStatus.SUCCESS
+    assert sorted(result.output for result in results.results) == ['a', 'b']
+
+
+def test_one_failed():
+    results = commands.execute_many([python('print("a")'), python('import sys; sys.exit(3)')], jobs=2)
+
+    assert not results.isOk
+    assert results.status == CmdStatus.ERROR
+    assert [result.result_code for result in results.results] == [0, 3]
+
+
+def test_missing_program():
+    results = commands.execute_many([['swd2-missing-program']])
+
+    assert not results.isOk
+    assert results.results[0].status == CmdStatus.ERROR
+
+
+@pytest.mark.parametrize('jobs, minimum, maximum', [(1, 1.2, 3.0), (2, 0.6, 1.15), (4, 0.3, 0.6)])
+def test_concurrency_limit(jobs, minimum, maximum):
+    started = time.perf_counter()
+
+    results = commands.execute_many([python('import time; time.sleep(0.3)')] * 4, jobs=jobs)
+
+    elapsed = time.perf_counter() - started
+    assert results.isOk
+    assert minimum <= elapsed < maximum + 0.5
+
+
+def test_timeout_kills_command():
+    started = time.perf_counter()
+
+    results = commands.execute_many([python('import time; print("started", flush=True); time.sleep(10)'), python('print("done")')],
+                                    timeout=0.5)
+
+    assert time.perf_counter() - started < 5
+    assert not results.isOk
+    slow, fast = results.results
+    assert slow.status == CmdStatus.ERROR and slow.output.splitlines() == ['started', 'Timed out after 0.5s']
+    assert fast.status == CmdStatus.SUCCESS
+
+
+def test_long_lines_are_not_dropped(monkeypatch):
+    monkeypatch.setattr(commands, 'STREAM_LIMIT', 1024)
+
+    results = commands.execute_many([python('print("a" * 5000); print("b" * 2048); print("next")')])
+
+    lines = results.results[0].output.split('\n')
+    assert lines[-1] == 'next'
+    assert ''.join(lines[:-1]) == 'a' * 5000 + 'b' * 2048
+    assert all(set(line) in ({'a'}, {'b'}) for line in lines[:-1])
+
+
+def test_strings_are_split_with_shell_quoting():
+    results = commands.execute_many([f'{PYTHON} -c "print(1 + 1)"'])
+
+    assert results.results[0].output == '2'
+
+
+def test_execute_splits_on_spaces():
+    result = commands.execute(f'{PYTHON} -c print(1+1)')
+
+    assert result.is_ok and result.output.strip() == '2'
@@ -0,0 +1,32 @@
+from click.testing import CliRunner
+
+from swd2.swd2_cli import cli
+from swd2.translator import codec, inventory
+
+
+def info(tmp_path, *args):
+    return CliRunner().invoke(cli, ['--no-banner', '--working-dir', str(tmp_path), 'translator', 'info', *args])
+
+
+def test_sizes_from_headers(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'lang0.csv.z').write_bytes(codec.encode_csv_z(b'ID,English\n' * 100))
+    (tmp_path / 'sub' / 'lang1.csv.z').write_bytes(b'\x01')
+
+    infos = inventory.scan(tmp_path, recursive=True, jobs=2)
+
+    assert [(entry.path, entry.uncompressed, entry.violation) for entry in infos] == [
+        ('lang0.csv.z', 1100, None), ('sub/lang1.csv.z', 0, 'Missing header')]
+
+
+def test_invalid_file_fails(tmp_path):
+    (tmp_path / 'lang0.csv.z').write_bytes(b'\x01')
+
+    assert info(tmp_path).exit_code == 1
+
+
+def test_missing_dir_fails(tmp_path):
+    result = info(tmp_path, '--src', 'missing')
+
+    assert result.exit_code == 1
+    assert not isinstance(result.exception, FileNotFoundError)
@@ -0,0 +1,135 @@
+import json
+
+import pytest
+
+from swd2.translator import charmap as charmaps
+from swd2.translator import codec, jobs
+
+
+def parse(tmp_path, *entries, defaults: dict = None):
+    data = {'jobs': list(entries)}
+    if defaults is not None:
+        data['defaults'] = defaults
+    return jobs.parse(data, tmp_path)
+
+
+@pytest.fixture
+def sources(tmp_path):
+    for name in ('lang0.csv', 'lang1.csv'):
+        (tmp_path / name).write_bytes(b'ID,English\n')
+    return tmp_path
+
+
+def test_parsed_with_defaults(tmp_path):
+    parsed, violations = parse(tmp_path, {'operation': 'compress', 'src': 'lang0.csv', 'dst': 'out/lang0.z', 'level': 6},
+                               {'operation': 'decompress', 'src': 'lang1.csv.z', 'dst': 'lang1.csv', 'overwrite': False},
+                               defaults={'overwrite': True})
+
+    assert violations == []
+    assert [(job.index, job.operation, job.source, job.target) for job in parsed] == [
+        (1, 'compress', tmp_path / 'lang0.csv', tmp_path / 'out/lang0.z'),
+        (2, 'decompress', tmp_path / 'lang1.csv.z', tmp_path / 'lang1.csv')]
+    assert parsed[0].options['overwrite'] and not parsed[1].options['overwrite']
+    assert parsed[0].options['profile'].settings() == {'level': 6, 'mem_level': codec.RELEASE.mem_level, 'strategy': 'default', 'wbits': 15}
+
+
+@pytest.mark.parametrize('entry, violation', [
+    ({'operation': 'copy', 'src': 'a', 'dst': 'b'}, 'unknown operation'),
+    ({'operation': 'compress', 'src': 'a'}, 'both src and dst are required'),
+    ({'operation': 'decompress', 'src': 'a', 'dst': 'b', 'level': 1}, 'unknown options'),
+    ({'operation': 'compress', 'src': 'a', 'dst': 'b', 'profile': 'best'}, 'unknown profile'),
+    ({'operation': 'compress', 'src': 'a', 'dst': 'b', 'strategy': 'greedy'}, 'unknown strategy'),
+    ({'operation': 'compress', 'src': 'a', 'dst': 'b', 'charmap': 'xx'}, 'invalid options'),
+])
+def test_invalid_jobs(tmp_path, entry, violation):
+    parsed, violations = parse(tmp_path, entry)
+
+    assert parsed == []
+    assert len(violations) == 1 and violations[0].startswith('Job 1') and violation in violations[0]
+
+
+@pytest.mark.parametrize('data, violation', [
+    ([{'operation': 'compress'}], 'Jobs file must be a table'),
+    ({'jobs': {'operation': 'compress'}}, 'jobs must be a list'),
+    ({'defaults': [], 'jobs': []}, 'defaults must be a table'),
+    ({'jobs': ['compress']}, 'Job 1: must be a table'),
+])
+def test_malformed_jobs_file(tmp_path, data, violation):
+    parsed, violations = jobs.parse(data, tmp_path)
+
+    assert parsed == []
+    assert len(violations) == 1 and violation in violations[0]
+
+
+@pytest.mark.parametrize('value', ['false', 'true', 1, 0])
+def test_overwrite_must_be_bool(tmp_path, value):
+    parsed, violations = parse(tmp_path, {'operation': 'decompress', 'src': 'a', 'dst': 'b', 'overwrite': value})
+
+    assert parsed == []
+    assert len(violations) == 1 and 'overwrite must be true or false' in violations[0]
+
+
+@pytest.mark.parametrize('option, value', [
+    ('level', 10), ('level', -1), ('level', True), ('level', '9'), ('level', 6.0),
+    ('mem_level', 0), ('mem_level', 10), ('mem_level', False),
+])
+def test_invalid_deflate_parameters(tmp_path, option, value):
+    parsed, violations = parse(tmp_path, {'operation': 'compress', 'src': 'a', 'dst': 'b', option: value})
+
+    assert parsed == []
+    assert len(violations) == 1 and option in violations[0]
+
+
+@pytest.mark.parametrize('level, mem_level', [(0, 1), (9, 9)])
+def test_deflate_parameter_limits(tmp_path, level, mem_level):
+    parsed, violations = parse(tmp_path, {'operation': 'compress', 'src': 'a', 'dst': 'b', 'level': level, 'mem_level': mem_level})
+
+    assert violations == []
+    assert (parsed[0].options['profile'].level, parsed[0].options['profile'].mem_level) == (level, mem_level)
+
+
+def test_valid_jobs(sources):
+    parsed, _ = parse(sources, {'operation': 'compress', 'src': 'lang0.csv', 'dst': 'out/lang0.z'},
+                      {'operation': 'compress', 'src': 'lang1.csv', 'dst': 'out/lang1.z'})
+
+    assert jobs.validate(parsed) == []
+
+
+def test_missing_source(sources):
+    parsed, _ = parse(sources, {'operation': 'compress', 'src': 'lang0.csv', 'dst': 'lang0.z'},
+                      {'operation': 'compress', 'src': 'lang2.csv', 'dst': 'lang2.z'})
+
+    violations = jobs.validate(parsed)
+
+    assert len(violations) == 1 and violations[0].startswith('Job 2') and 'Source not exists' in violations[0]
+
+
+def test_existing_target_without_overwrite(sources):
+    (sources / 'lang0.z').write_bytes(b'')
+    parsed, _ = parse(sources, {'operation': 'compress', 'src': 'lang0.csv', 'dst': 'lang0.z'},
+                      {'operation': 'compress', 'src': 'lang1.csv', 'dst': 'lang0.z', 'overwrite': True})
+
+    violations = jobs.validate(parsed)
+
+    assert len(violations) == 2
+    assert violations[0].startswith('Job 1') and 'cannot be overwritten' in violations[0]
+    assert violations[1].startswith('Job 2') and 'also written by job 1' in violations[1]
+
+
+def test_target_written_twice(sources):
+    parsed, _ = parse(sources, {'operation': 'compress', 'src': 'lang0.csv', 'dst': 'out.z'},
+                      {'operation': 'compress', 'src': 'lang1.csv', 'dst': 'out.z'})
+
+    violations = jobs.validate(parsed)
+
+    assert len(violations) == 1 and violations[0].startswith('Job 2') and 'also written by job 1' in violations[0]
+
+
+def test_charmap_file_relative_to_base_dir(tmp_path):
+    data = json.loads((charmaps.CHARMAPS_DIR / 'pl.json').read_text(encoding='utf-8'))
+    (tmp_path / 'custom.json').write_text(json.dumps({**data, 'locale': 'custom'}), encoding='utf-8')
+
+    parsed, violations = parse(tmp_path, {'operation': 'compress', 'src': 'a', 'dst': 'b', 'charmap': 'custom.json'})
+
+    assert violations == []
+    assert parsed[0].options['charmap'].locale == 'custom'
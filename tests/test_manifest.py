@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from swd2.translator.manifest import BuildManifest, MANIFEST_NAME, fingerprint
+
+SETTINGS = {'level': 9, 'mem_level': 8, 'strategy': 'default', 'wbits': 15}
+CHARMAP = 'pl@1'
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / 'lang.csv'
+    source.write_bytes(b'ID,English\nKEY_0,Dig\n')
+    target = tmp_path / 'out' / 'lang.z'
+    target.parent.mkdir()
+    target.write_bytes(b'compressed')
+    return source, target
+
+
+@pytest.fixture
+def manifest(tmp_path, files):
+    manifest = BuildManifest(tmp_path / 'out' / MANIFEST_NAME)
+    manifest.update(*files, CHARMAP, SETTINGS)
+    return manifest
+
+
+def touch(file, offset_ns: int = 10 ** 9):
+    stat = file.stat()
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + offset_ns))
+
+
+def test_new_source_is_not_up_to_date(tmp_path, files):
+    assert not BuildManifest(tmp_path / MANIFEST_NAME).is_up_to_date(*files, CHARMAP, SETTINGS)
+
+
+def test_unchanged_source_is_up_to_date(manifest, files):
+    assert manifest.is_up_to_date(*files, CHARMAP, SETTINGS)
+
+
+def test_changed_size(manifest, files):
+    source, target = files
+    source.write_bytes(b'ID,English\nKEY_0,Dig deeper\n')
+
+    assert not manifest.is_up_to_date(source, target, CHARMAP, SETTINGS)
+
+
+def test_changed_content_of_same_size(manifest, files):
+    source, target = files
+    source.write_bytes(b'ID,English\nKEY_0,Gid\n')
+    touch(source)
+
+    assert not manifest.is_up_to_date(source, target, CHARMAP, SETTINGS)
+
+
+def test_touched_with_same_content(manifest, files):
+    source, target = files
+    touch(source)
+
+    assert manifest.is_up_to_date(source, target, CHARMAP, SETTINGS)
+    assert manifest.entries[source.name].mtime_ns == source.stat().st_mtime_ns
+
+
+@pytest.mark.parametrize('charmap, settings', [('pl@2', SETTINGS), (CHARMAP, {**SETTINGS, 'level': 1})])
+def test_changed_build_settings(manifest, files, charmap, settings):
+    assert not manifest.is_up_to_date(*files, charmap, settings)
+
+
+def test_missing_target(manifest, files):
+    source, target = files
+    target.unlink()
+
+    assert not manifest.is_up_to_date(source, target, CHARMAP, SETTINGS)
+
+
+def test_other_target(manifest, files):
+    source, target = files
+
+    assert not manifest.is_up_to_date(source, target.with_name('other.z'), CHARMAP, SETTINGS)
+
+
+def test_change_saved_during_compression(tmp_path, files):
+    source, target = files
+    before = fingerprint(source)
+    source.write_bytes(b'ID,English\nKEY_0,Gid\n')
+    touch(source)
+    manifest = BuildManifest(tmp_path / MANIFEST_NAME)
+    manifest.update(source, target, CHARMAP, SETTINGS, before)
+
+    assert not manifest.is_up_to_date(source, target, CHARMAP, SETTINGS)
+
+
+def test_saved_and_loaded(manifest, files):
+    manifest.save()
+    loaded = BuildManifest.load(manifest.path.parent)
+
+    assert loaded.is_up_to_date(*files, CHARMAP, SETTINGS)
+
+
+def test_corrupted_manifest_is_discarded(tmp_path, files):
+    (tmp_path / MANIFEST_NAME).write_text('{"version": 2, "entries": {"lang.csv": {}}}', encoding='utf-8')
+
+    assert BuildManifest.load(tmp_path).entries == {}
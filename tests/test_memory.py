@@ -0,0 +1,60 @@
+import pytest
+
+from swd2.translator import codec, memory
+
+
+@pytest.fixture
+def translated(tmp_path):
+    directory = tmp_path / 'translated'
+    directory.mkdir()
+    (directory / 'lang0.csv').write_text('ID,English,Polish\nKEY_0,Dig deeper,Kop głębiej\nKEY_1,Build a wall,Zbuduj mur\n',
+                                         encoding='utf-8')
+    (directory / 'lang1.csv.z').write_bytes(codec.encode_csv_z('ID,English,Polish\nKEY_2,Mine the gold,Wydobadz zloto\n'.encode('utf-8')))
+    return directory
+
+
+def load(tmp_path) -> memory.TranslationMemory:
+    return memory.TranslationMemory.load(tmp_path / memory.MEMORY_NAME, 'English', 'Polish')
+
+
+def test_suggestions_of_similar_sources(tmp_path, translated):
+    tm = load(tmp_path)
+    tm.update(translated)
+
+    assert len(tm) == 3
+    assert [(found.source, found.target) for found in tm.suggest('dig deeper!')] == [('Dig deeper', 'Kop głębiej')]
+    assert tm.suggest('Completely different text') == []
+
+
+def test_corrupted_file_is_skipped(tmp_path, translated):
+    (translated / 'lang2.csv.z').write_bytes(codec.encode_csv_z(b'ID,English,Polish\nKEY_3,a,b\n')[:-5])
+    tm = load(tmp_path)
+
+    assert tm.update(translated) == 2
+    assert sorted(tm.files) == ['lang0.csv', 'lang1.csv']
+
+
+def test_index_is_saved_and_loaded(tmp_path, translated):
+    tm = load(tmp_path)
+    tm.update(translated)
+    tm.save()
+
+    loaded = load(tmp_path)
+
+    assert loaded.update(translated) == 0
+    assert loaded._postings == tm._postings
+    assert loaded.suggest('Mine gold', min_score=0.3)[0].target == 'Wydobadz zloto'
+
+
+def test_index_is_rebuilt_when_file_changed(tmp_path, translated):
+    tm = load(tmp_path)
+    tm.update(translated)
+    tm.save()
+    (translated / 'lang0.csv').write_text('ID,English,Polish\nKEY_0,Dig deeper,Kop głębiej\nKEY_4,Raise the flag,Podnieś flagę\n',
+                                          encoding='utf-8')
+
+    loaded = load(tmp_path)
+
+    assert loaded.update(translated) == 1
+    assert len(loaded) == 3
+    assert loaded.suggest('Raise the flag')[0].target == 'Podnieś flagę'
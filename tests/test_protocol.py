@@ -0,0 +1,54 @@
+import os
+import socket
+
+import pytest
+
+from swd2.daemon import protocol
+
+
+def test_default_socket_in_runtime_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+
+    assert protocol.default_socket() == tmp_path / 'swd2.sock'
+
+
+def test_default_socket_in_private_dir(monkeypatch):
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+
+    assert protocol.default_socket().parent.name == f'swd2-{os.getuid()}'
+
+
+def test_private_dir(tmp_path):
+    directory = tmp_path / 'swd2'
+    protocol.private_dir(directory)
+
+    assert directory.stat().st_mode & 0o777 == 0o700
+
+
+def test_private_dir_accessible_by_others(tmp_path):
+    directory = tmp_path / 'swd2'
+    directory.mkdir()
+    directory.chmod(0o777)
+
+    with pytest.raises(PermissionError):
+        protocol.private_dir(directory)
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason='changing owner needs root')
+def test_socket_of_another_user_is_refused(tmp_path):
+    path = tmp_path / 'other.sock'
+    with socket.socket(socket.AF_UNIX) as server:
+        server.bind(str(path))
+        server.listen()
+        os.chown(path, os.getuid() + 1000, -1)
+
+        with pytest.raises(PermissionError):
+            protocol.Client(path).connect()
+
+
+def test_frames_round_trip():
+    message = {'operation': 'compress', 'src': '/tmp/zażółć.csv'}
+    frame = protocol.encode(message)
+
+    assert protocol.frame_size(frame[:protocol.FRAME_HEADER.size]) == len(frame) - protocol.FRAME_HEADER.size
+    assert protocol.decode(frame[protocol.FRAME_HEADER.size:]) == message
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from swd2.swd2_cli import cli
+from swd2.translator import batch, sharding
+
+
+@pytest.fixture
+def files(tmp_path):
+    result = []
+    for index in range(7):
+        file = tmp_path / f'lang{index}.csv'
+        file.write_bytes(b'x' * (index * 10000))
+        result.append(file)
+    return result
+
+
+def save(tmp_path, shard: sharding.Shard, all_files: list, failed: tuple = ()):
+    selected = sharding.partition(all_files, tmp_path, shard.count)[shard.index - 1]
+    results = [batch.BatchResult(batch.BatchTask(file, None), file.name not in failed) for file in selected]
+    sharding.save_report(tmp_path, 'compress', shard, selected, results, tmp_path, time.perf_counter(), all_files)
+
+
+def test_partition_covers_every_file_once(tmp_path, files):
+    shards = sharding.partition(files, tmp_path, 3)
+
+    assert sorted(file for shard in shards for file in shard) == sorted(files)
+    assert shards == sharding.partition(list(reversed(files)), tmp_path, 3)
+
+
+@pytest.mark.parametrize('value', ['0/2', '3/2', '1', 'a/b'])
+def test_invalid_shard(value):
+    with pytest.raises(ValueError):
+        sharding.parse(value)
+
+
+def test_complete_build(tmp_path, files):
+    for index in (1, 2, 3):
+        save(tmp_path, sharding.Shard(index, 3), files)
+
+    report = sharding.merge(tmp_path)
+
+    assert report['ok']
+    assert report['commands']['compress']['succeeded'] == len(files)
+
+
+def test_missing_shard(tmp_path, files):
+    save(tmp_path, sharding.Shard(1, 2), files)
+
+    report = sharding.merge(tmp_path)
+
+    assert not report['ok']
+    assert report['commands']['compress']['missing'] == [2]
+
+
+def test_failed_file(tmp_path, files):
+    for index in (1, 2):
+        save(tmp_path, sharding.Shard(index, 2), files, failed=('lang3.csv',))
+
+    report = sharding.merge(tmp_path)
+
+    assert not report['ok']
+    assert report['commands']['compress']['failed'] == ['lang3.csv']
+
+
+def test_file_processed_by_no_shard(tmp_path, files):
+    # the largest file, added after shard 1 ran, is placed into shard 1 by the split of shard 2
+    save(tmp_path, sharding.Shard(1, 2), files[:-1])
+    save(tmp_path, sharding.Shard(2, 2), files)
+
+    report = sharding.merge(tmp_path)
+
+    assert not report['ok']
+    assert files[-1].name in report['commands']['compress']['unprocessed']
+    assert report['commands']['compress']['split_changed']
+
+
+def test_merge_shards_of_missing_dir(tmp_path):
+    result = CliRunner().invoke(cli, ['--no-banner', '--working-dir', str(tmp_path), 'translator', 'merge-shards', '--dir', 'missing'])
+
+    assert result.exit_code == 1
+    assert result.exception is None or isinstance(result.exception, SystemExit)